@@ -1,25 +1,40 @@
 import os
 import json
-from typing import Any, Dict, Optional, Callable
+import asyncio
+import inspect
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Dict, List, Optional, Callable
 from dotenv import load_dotenv
-import google.generativeai as genai
 
-# ── Load .env and configure Gemini ──────────────────────────────
+# ── Load .env ───────────────────────────────────────────────────
+# The model provider (Gemini, or the offline stub) is picked by LLM_PROVIDER and
+# configured on first use, so importing this module never needs an API key.
 load_dotenv()
-API_KEY = os.getenv("GEMINI_API_KEY")
-if not API_KEY:
-    raise RuntimeError("❌ GEMINI_API_KEY missing. Add it to your .env file.")
 
-genai.configure(api_key=API_KEY)
-MODEL_NAME = os.getenv("GEMINI_MODEL", "gemini-2.0-flash-exp")
-model = genai.GenerativeModel(MODEL_NAME)
+# ── Async client: concurrency cap, deadlines, retry and circuit breaker ──
+from Functions.LLMClient import MODEL_NAME, LLM_TIMEOUT_S, generate, generate_stream
+from Functions.SingleFlight import SingleFlight
+from Functions.AnalysisCache import analysis_key, analysis_generation, get_cached_analysis, store_analysis
+from Functions.ChatSessions import estimate_tokens
 
 # ── Import function utilities ───────────────────────────────────
 from Functions.GetDatabaseInfo import get_database_info
+from Functions.ChatTools import (
+    TOOL_DECLARATIONS,
+    get_recent_transactions,
+    get_category_breakdown,
+    get_savings_challenges,
+    get_credit_score_history,
+)
 
 # ── TOOL REGISTRY ────────────────────────────────────────────────
+# Every tool takes the user's email first; TOOL_DECLARATIONS describes the rest to the model.
 TOOLS: Dict[str, Callable[..., Any]] = {
     "get_database_info": get_database_info,
+    "get_recent_transactions": get_recent_transactions,
+    "get_category_breakdown": get_category_breakdown,
+    "get_savings_challenges": get_savings_challenges,
+    "get_credit_score_history": get_credit_score_history,
 }
 
 def list_available_tools() -> Dict[str, Any]:
@@ -27,7 +42,7 @@ def list_available_tools() -> Dict[str, Any]:
     return {"tools": list(TOOLS.keys())}
 
 # ── TEXT GENERATION ─────────────────────────────────────────────
-def generate_text(
+async def generate_text(
     prompt: str,
     *,
     temperature: float = 0.2,
@@ -35,34 +50,59 @@ def generate_text(
     top_p: float = 0.95,
     top_k: int = 40,
     system_instruction: Optional[str] = None,
+    timeout: Optional[float] = None,
 ) -> str:
     """Simple text generation helper."""
-    generation_config = genai.types.GenerationConfig(
-        temperature=temperature,
-        top_p=top_p,
-        top_k=top_k,
-        max_output_tokens=max_output_tokens,
-    )
-
-    _model = model
-    if system_instruction:
-        _model = genai.GenerativeModel(
-            model_name=MODEL_NAME,
-            system_instruction=system_instruction,
-        )
+    generation_config = {
+        "temperature": temperature,
+        "top_p": top_p,
+        "top_k": top_k,
+        "max_output_tokens": max_output_tokens,
+    }
 
-    resp = _model.generate_content(prompt, generation_config=generation_config)
+    resp = await generate(
+        prompt,
+        generation_config=generation_config,
+        system_instruction=system_instruction,
+        timeout=timeout,
+    )
     return getattr(resp, "text", "") or ""
 
+# ── STREAMING TEXT GENERATION ───────────────────────────────────
+def stream_text(
+    prompt: str,
+    *,
+    temperature: float = 0.2,
+    max_output_tokens: int = 1024,
+    top_p: float = 0.95,
+    top_k: int = 40,
+    system_instruction: Optional[str] = None,
+    timeout: Optional[float] = None,
+) -> AsyncIterator[str]:
+    """Like generate_text, but yields text chunks as the model produces them."""
+    generation_config = {
+        "temperature": temperature,
+        "top_p": top_p,
+        "top_k": top_k,
+        "max_output_tokens": max_output_tokens,
+    }
+    return generate_stream(
+        prompt,
+        generation_config=generation_config,
+        system_instruction=system_instruction,
+        timeout=timeout,
+    )
+
 # ── JSON GENERATION ─────────────────────────────────────────────
-def generate_json(
+async def generate_json(
     prompt: str,
     *,
     schema_hint: Optional[Dict[str, Any]] = None,
     temperature: float = 0.1,
     max_output_tokens: int = 1024,
+    timeout: Optional[float] = None,
 ) -> Dict[str, Any]:
-    """Ask Gemini to return valid JSON."""
+    """Ask the model to return valid JSON."""
     if schema_hint:
         prompt = (
             f"Return ONLY valid JSON matching this structure (no code fences):\n"
@@ -70,13 +110,13 @@ def generate_json(
             f"Task:\n{prompt}"
         )
 
-    generation_config = genai.types.GenerationConfig(
-        temperature=temperature,
-        max_output_tokens=max_output_tokens,
-        response_mime_type="application/json",
-    )
+    generation_config = {
+        "temperature": temperature,
+        "max_output_tokens": max_output_tokens,
+        "response_mime_type": "application/json",
+    }
 
-    resp = model.generate_content(prompt, generation_config=generation_config)
+    resp = await generate(prompt, generation_config=generation_config, timeout=timeout)
     text = getattr(resp, "text", "") or "{}"
 
     try:
@@ -88,32 +128,236 @@ def generate_json(
         raise
 
 # ── FUNCTION CALLING INTERFACE ──────────────────────────────────
-def run_ai_tool(tool_name: str, *args, **kwargs) -> Any:
+async def run_ai_tool(tool_name: str, *args, **kwargs) -> Any:
     """ Executes a tool (function) from the TOOLS registry dynamically. """
     if tool_name not in TOOLS:
         return {"error": f"Tool '{tool_name}' not found.", "available": list(TOOLS.keys())}
     try:
         result = TOOLS[tool_name](*args, **kwargs)
+        if inspect.isawaitable(result):
+            result = await result
         return {"tool": tool_name, "result": result}
     except Exception as e:
         return {"error": str(e), "tool": tool_name}
 
+# ── CHAT WITH TOOL CALLING (Used by /ai/chat) ───────────────────
+# The model gets the question plus tool declarations, not the user's data:
+# it asks for exactly the data it needs, so generic questions cost no DB reads
+# and no context tokens. Tool calls from one model turn run concurrently, and
+# a repeated call within the same chat request is served from memory.
+CHAT_SYSTEM_INSTRUCTION = (
+    "You are CrediWise AI — a smart, friendly credit and finance assistant. "
+    "You give short, clear, and personalized financial advice based on the user's data. "
+    "When an answer depends on the user's own numbers (income, expenses, balance, credit "
+    "utilization, credit score, transactions, spending categories or savings challenges), "
+    "call the matching tool first; otherwise answer directly without calling tools. "
+    "Reply in 1–3 short sentences, directly and to the point. "
+    "Avoid long explanations, introductions, or generic information. "
+    "Keep it friendly, clear, and practical."
+)
+CHAT_TOOLS = [{"function_declarations": TOOL_DECLARATIONS}]
+CHAT_MAX_TOOL_ROUNDS = int(os.getenv("CHAT_MAX_TOOL_ROUNDS", "3"))
+# Used on the last round so the model must answer with what it already has.
+_NO_MORE_TOOLS = {"function_calling_config": {"mode": "NONE"}}
+
+_tool_stats = {"chats": 0, "chats_with_tools": 0, "rounds": 0, "tool_calls": 0, "memo_hits": 0}
+
+
+class ToolSession:
+    """Runs the model's tool calls for one chat request: concurrently, and each distinct call once."""
+
+    def __init__(self, email: str):
+        self.email = email
+        self._results: Dict[str, asyncio.Future] = {}
+
+    async def run(self, calls: List[Any]) -> Dict[str, Any]:
+        parts = await asyncio.gather(*(self._run_one(call) for call in calls))
+        return {"role": "user", "parts": list(parts)}
+
+    async def _run_one(self, call) -> Dict[str, Any]:
+        args = dict(call.args)
+        key = f"{call.name}:{json.dumps(args, sort_keys=True, default=str)}"
+        result = self._results.get(key)
+        if result is None:
+            _tool_stats["tool_calls"] += 1
+            result = self._results[key] = asyncio.ensure_future(run_ai_tool(call.name, self.email, **args))
+        else:
+            _tool_stats["memo_hits"] += 1
+        # Round-trip through JSON so dates and Decimals become plain values.
+        response = json.loads(json.dumps(await result, default=str))
+        return {"function_response": {"name": call.name, "response": response}}
+
+
+def _chat_setup(message: str, email: Optional[str], history, temperature: float, max_output_tokens: int):
+    generation_config = {"temperature": temperature, "max_output_tokens": max_output_tokens}
+    contents = list(history or []) + [{"role": "user", "parts": [message]}]
+    _tool_stats["chats"] += 1
+    # Without a signed-in user there is no data to look up, so no tools are offered.
+    return generation_config, contents, (ToolSession(email) if email else None)
+
+
+def _tool_kwargs(session: Optional[ToolSession], round_no: int) -> Dict[str, Any]:
+    if session is None:
+        return {}
+    if round_no == CHAT_MAX_TOOL_ROUNDS:
+        return {"tools": CHAT_TOOLS, "tool_config": _NO_MORE_TOOLS}
+    return {"tools": CHAT_TOOLS}
+
+
+def _parts(response) -> List[Any]:
+    candidates = getattr(response, "candidates", None) or []
+    return list(candidates[0].content.parts) if candidates else []
+
+
+def _calls_content(calls: List[Any]) -> Dict[str, Any]:
+    """The model's function-call turn, echoed back into the conversation."""
+    return {"role": "model", "parts": [{"function_call": {"name": c.name, "args": dict(c.args)}} for c in calls]}
+
+
+def _record_tool_round(round_no: int, trace: Optional[Dict[str, Any]]):
+    _tool_stats["rounds"] += 1
+    if round_no == 0:
+        _tool_stats["chats_with_tools"] += 1
+    if trace is not None:
+        trace["used_tools"] = True
+
+
+def _trace_tokens(trace: Optional[Dict[str, Any]], contents: List[Any] = None, output: str = ""):
+    if trace is None:
+        return
+    if contents is not None:
+        sent = CHAT_SYSTEM_INSTRUCTION + json.dumps(contents, default=str)
+        trace["prompt_tokens"] = trace.get("prompt_tokens", 0) + estimate_tokens(sent)
+    if output:
+        trace["output_tokens"] = trace.get("output_tokens", 0) + estimate_tokens(output)
+
+
+async def chat_reply(
+    message: str,
+    email: Optional[str] = None,
+    *,
+    history: Optional[List[Dict[str, Any]]] = None,
+    trace: Optional[Dict[str, Any]] = None,
+    temperature: float = 0.4,
+    max_output_tokens: int = 150,
+    timeout: Optional[float] = None,
+) -> str:
+    """
+    Answers one chat message, letting the model look up the user's data through TOOLS.
+    `history` is earlier conversation as Gemini contents (see ChatSessions.history_contents).
+    Pass a dict as `trace` to learn whether tools were used and the estimated tokens spent.
+    """
+    generation_config, contents, session = _chat_setup(message, email, history, temperature, max_output_tokens)
+    for round_no in range(CHAT_MAX_TOOL_ROUNDS + 1):
+        _trace_tokens(trace, contents)
+        resp = await generate(
+            contents,
+            generation_config=generation_config,
+            system_instruction=CHAT_SYSTEM_INSTRUCTION,
+            timeout=timeout,
+            **_tool_kwargs(session, round_no),
+        )
+        parts = _parts(resp)
+        calls = [p.function_call for p in parts if p.function_call.name]
+        if not calls:
+            text = "".join(p.text for p in parts if p.text)
+            _trace_tokens(trace, output=text)
+            return text
+        _record_tool_round(round_no, trace)
+        contents.append(_calls_content(calls))
+        contents.append(await session.run(calls))
+    return ""
+
+
+async def stream_chat(
+    message: str,
+    email: Optional[str] = None,
+    *,
+    history: Optional[List[Dict[str, Any]]] = None,
+    trace: Optional[Dict[str, Any]] = None,
+    temperature: float = 0.4,
+    max_output_tokens: int = 150,
+    timeout: Optional[float] = None,
+) -> AsyncIterator[str]:
+    """Like chat_reply, but yields the answer's text as it streams in."""
+    generation_config, contents, session = _chat_setup(message, email, history, temperature, max_output_tokens)
+    for round_no in range(CHAT_MAX_TOOL_ROUNDS + 1):
+        calls = []
+        _trace_tokens(trace, contents)
+        stream = generate_stream(
+            contents,
+            generation_config=generation_config,
+            system_instruction=CHAT_SYSTEM_INSTRUCTION,
+            timeout=timeout,
+            raw=True,
+            **_tool_kwargs(session, round_no),
+        )
+        async with aclosing(stream) as chunks:
+            async for chunk in chunks:
+                for part in _parts(chunk):
+                    if part.function_call.name:
+                        calls.append(part.function_call)
+                    elif part.text:
+                        _trace_tokens(trace, output=part.text)
+                        yield part.text
+        if not calls:
+            return
+        _record_tool_round(round_no, trace)
+        contents.append(_calls_content(calls))
+        contents.append(await session.run(calls))
+
+
+def get_chat_tool_stats() -> Dict[str, Any]:
+    return dict(_tool_stats)
+
+async def summarize_conversation(summary: str, messages: List[Dict[str, Any]], max_output_tokens: int = 250) -> str:
+    """Folds `messages` into the running `summary` of a chat session."""
+    transcript = "\n".join(f"{m['role']}: {m['text']}" for m in messages)
+    prompt = (
+        "Update the running summary of a conversation between a user and a finance assistant.\n"
+        f"Current summary:\n{summary or '(none)'}\n\n"
+        f"New messages:\n{transcript}\n\n"
+        "Return only the updated summary in a few short bullet points. Keep facts the user "
+        "shared, their goals and any advice already given; drop small talk."
+    )
+    return (await generate_text(prompt, temperature=0.1, max_output_tokens=max_output_tokens)).strip()
+
 # ── AI ANALYSIS (Used by /ai/credit_analysis) ───────────────────
-def ai_analyze_user(email: str) -> Dict[str, Any]:
-    """Uses Gemini to analyze user financial data."""
-    db_info = get_database_info(email)
+ANALYSIS_PROMPT_TEMPLATE = (
+    "Here is a user's financial data:\n{db_info}\n\n"
+    "Analyze this and return JSON with three personalized financial improvement tips. "
+    "Each tip should have a 'title' and 'advice' field."
+)
+ANALYSIS_SCHEMA = {"tips": [{"title": "string", "advice": "string"}]}
+# Room for the data lookup on top of the model call's own deadline.
+ANALYSIS_TIMEOUT_S = float(os.getenv("ANALYSIS_TIMEOUT_S", str(LLM_TIMEOUT_S + 10)))
+
+_analysis_flight = SingleFlight("ai_analysis", timeout=ANALYSIS_TIMEOUT_S)
+
+async def ai_analyze_user(email: str) -> Dict[str, Any]:
+    """
+    Uses the model to analyze user financial data. Results are cached per input
+    snapshot, so an unchanged user is answered without a model call, and
+    concurrent requests for the same user share one in-flight analysis.
+    """
+    generation = analysis_generation(email)
+    return await _analysis_flight.do((email, generation), _analyze_user, email, generation)
+
+async def _analyze_user(email: str, generation: int) -> Dict[str, Any]:
+    db_info = await get_database_info(email)
     if "error" in db_info:
         return db_info
 
-    prompt = (
-        f"Here is a user's financial data:\n{json.dumps(db_info, indent=2)}\n\n"
-        "Analyze this and return JSON with three personalized financial improvement tips. "
-        "Each tip should have a 'title' and 'advice' field."
-    )
+    key = analysis_key(db_info, ANALYSIS_PROMPT_TEMPLATE + json.dumps(ANALYSIS_SCHEMA), MODEL_NAME)
+    cached = get_cached_analysis(key)
+    if cached is not None:
+        return cached
 
-    schema = {"tips": [{"title": "string", "advice": "string"}]}
-    ai_response = generate_json(prompt, schema_hint=schema)
-    return {"analysis": ai_response, "raw_data": db_info}
+    prompt = ANALYSIS_PROMPT_TEMPLATE.format(db_info=json.dumps(db_info, indent=2))
+    ai_response = await generate_json(prompt, schema_hint=ANALYSIS_SCHEMA)
+    result = {"analysis": ai_response, "raw_data": db_info}
+    store_analysis(email, key, result, generation)
+    return result
 
 # ─── Optional: Direct test ──────────────────────────────────────
 if __name__ == "__main__":
@@ -0,0 +1,147 @@
+"""
+Load test for the AI endpoints against a running server.
+
+Start the backend on the offline stub provider, so no API key or network is
+needed and model latency/errors are whatever you configure:
+
+    LLM_PROVIDER=stub LLM_STUB_LATENCY_MS=lognormal:800:0.5 LLM_STUB_ERROR_RATE=0.05 \\
+        uvicorn main:app --port 8000
+
+then drive it:
+
+    python -m Benchmarks.AIEndpointLoadBench --endpoint chat --concurrency 50 --requests 500
+    python -m Benchmarks.AIEndpointLoadBench --endpoint chat --stream
+    python -m Benchmarks.AIEndpointLoadBench --endpoint analysis --email you@example.com
+
+While the load runs, a probe hits a cheap non-AI endpoint to show whether AI
+traffic slows the rest of the API. Reports latency percentiles (and time to
+first token with --stream), error counts and the server's /metrics/llm.
+Without --email a throwaway user is signed up first.
+"""
+import argparse
+import asyncio
+import json
+import time
+from urllib.parse import urlsplit
+from uuid import uuid4
+
+_QUESTIONS = (
+    "What is a good credit utilization?",
+    "How am I doing with my spending this month?",
+    "Should I pay off my card in full?",
+    "What's my latest credit score?",
+)
+
+
+async def http(url: str, method: str = "GET", body=None, first_marker: bytes = b""):
+    """Minimal HTTP/1.1 client: returns (status, body bytes, seconds until `first_marker` was seen)."""
+    parts = urlsplit(url)
+    reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+    payload = json.dumps(body).encode("utf-8") if body is not None else b""
+    path = parts.path + (f"?{parts.query}" if parts.query else "")
+    started = time.perf_counter()
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: {parts.netloc}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode("ascii") + payload
+    )
+    await writer.drain()
+    data, first_at = b"", None
+    while chunk := await reader.read(65536):
+        data += chunk
+        if first_marker and first_at is None and first_marker in data:
+            first_at = time.perf_counter() - started
+    writer.close()
+    head, _, content = data.partition(b"\r\n\r\n")
+    return int(head.split(b" ", 2)[1]), content, first_at
+
+
+def _percentiles(values):
+    if not values:
+        return "n/a"
+    ordered = sorted(values)
+    pick = lambda pct: ordered[min(len(ordered) - 1, int(len(ordered) * pct))] * 1000
+    return f"p50 {pick(0.5):7.0f} ms   p95 {pick(0.95):7.0f} ms   p99 {pick(0.99):7.0f} ms"
+
+
+async def run(args):
+    base = args.url.rstrip("/")
+    email = args.email
+    if not email:
+        email = f"loadtest_{uuid4().hex[:8]}@bench.local"
+        status, _, _ = await http(f"{base}/signup", "POST", {"name": email, "email": email, "password": "bench"})
+        print(f"👤 Signed up throwaway user {email} ({status})")
+
+    latencies, ttfts, probe = [], [], []
+    errors = {"http": 0, "app": 0}
+    queue = asyncio.Queue()
+    for i in range(args.requests):
+        queue.put_nowait(i)
+
+    async def one(i: int):
+        if args.endpoint == "analysis" or (args.endpoint == "mixed" and i % 2):
+            return await http(f"{base}/ai/credit_analysis/{email}")
+        body = {"message": _QUESTIONS[i % len(_QUESTIONS)], "email": email, "stream": args.stream}
+        return await http(f"{base}/ai/chat", "POST", body, first_marker=b"event: token" if args.stream else b"")
+
+    async def worker():
+        while not queue.empty():
+            i = queue.get_nowait()
+            started = time.perf_counter()
+            try:
+                status, content, first_at = await one(i)
+            except OSError:
+                errors["http"] += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+            if first_at is not None:
+                ttfts.append(first_at)
+            if status != 200:
+                errors["http"] += 1
+            elif b'"error"' in content or b"event: error" in content:
+                errors["app"] += 1
+
+    async def prober(stop: asyncio.Event):
+        while not stop.is_set():
+            started = time.perf_counter()
+            await http(f"{base}/metrics/db")
+            probe.append(time.perf_counter() - started)
+            await asyncio.sleep(0.1)
+
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(prober(stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe_task
+
+    label = f"{args.endpoint}{' (stream)' if args.stream else ''}"
+    print(f"\n🚦 {label}: {args.requests} requests, concurrency {args.concurrency}, {elapsed:.1f} s "
+          f"({args.requests / elapsed:.1f} req/s)")
+    print(f"   latency      {_percentiles(latencies)}")
+    if ttfts:
+        print(f"   first token  {_percentiles(ttfts)}")
+    print(f"   errors       http {errors['http']}   app {errors['app']}")
+    print(f"   /metrics/db  {_percentiles(probe)}   (non-AI probe during load)")
+
+    _, content, _ = await http(f"{base}/metrics/llm")
+    llm = json.loads(content)["llm"]
+    keys = ("provider", "calls", "succeeded", "failed", "retries", "timeouts", "rejected_open_circuit", "breaker_state")
+    print("   llm          " + "   ".join(f"{k} {llm.get(k)}" for k in keys))
+    if "provider_stats" in llm:
+        print(f"   provider     {llm['provider_stats']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--email", help="existing user to query as (default: sign up a throwaway user)")
+    parser.add_argument("--endpoint", choices=("chat", "analysis", "mixed"), default="chat")
+    parser.add_argument("--stream", action="store_true", help="use SSE chat and report time to first token")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=500)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
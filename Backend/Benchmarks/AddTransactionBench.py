@@ -0,0 +1,159 @@
+"""
+Before/after benchmark for POST /transactions/add.
+
+Compares the original step-by-step write path (user lookup, account lookup,
+category check, insert, balance update, two SUM queries, score check + update)
+against the single-statement insert_transaction(). Reports round trips per call
+and p50/p99 latency. Runs against the database configured in .env and cleans
+up the synthetic user it creates.
+
+    python -m Benchmarks.AddTransactionBench --iterations 500 --history 5000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import date
+from uuid import uuid4
+
+from Functions.Database import async_transaction, async_autocommit, open_pool, close_pool
+from Functions.AddTransaction import insert_transaction
+from Functions.Aggregates import rebuild_user_aggregates
+
+
+class CountingCursor:
+    """Counts every execute() — each one is a network round trip."""
+
+    def __init__(self, cur):
+        self._cur = cur
+        self.round_trips = 0
+
+    async def execute(self, *args, **kwargs):
+        self.round_trips += 1
+        return await self._cur.execute(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._cur, name)
+
+
+async def legacy_add_transaction(cur, email: str, amount: float, description: str, transaction_date: date):
+    """The pre-CTE add_transaction body, kept verbatim for comparison."""
+    await cur.execute("SELECT id, username, email FROM Users WHERE email = %s;", (email,))
+    user_id = (await cur.fetchone())[0]
+    await cur.execute("SELECT id FROM Accounts WHERE user_id = %s ORDER BY id LIMIT 1;", (user_id,))
+    account_id = (await cur.fetchone())[0]
+
+    kind = "income" if amount >= 0 else "expense"
+    coerced_amount = abs(amount) if kind == "income" else -abs(amount)
+    category_id = "cat_001" if kind == "income" else "cat_011"
+
+    await cur.execute("SELECT 1 FROM Categories WHERE id = %s;", (category_id,))
+    if not await cur.fetchone():
+        await cur.execute("INSERT INTO Categories (id, name) VALUES (%s, %s);",
+                          (category_id, "Salary" if kind == "income" else "Other Expense"))
+
+    await cur.execute("""
+        INSERT INTO Transactions (id, user_id, account_id, category_id, amount, description, transaction_date)
+        VALUES (%s, %s, %s, %s, %s, %s, %s);
+    """, (f"tx_{uuid4().hex[:8]}", user_id, account_id, category_id, coerced_amount, description, transaction_date))
+    await cur.execute("UPDATE Accounts SET balance = balance + %s WHERE id = %s;", (coerced_amount, account_id))
+
+    await cur.execute("""
+        SELECT
+            COALESCE(SUM(CASE WHEN amount > 0 THEN amount ELSE 0 END), 0),
+            COALESCE(SUM(CASE WHEN amount < 0 THEN ABS(amount) ELSE 0 END), 0)
+        FROM Transactions WHERE user_id = %s;
+    """, (user_id,))
+    income, expenses = await cur.fetchone()
+    await cur.execute("SELECT SUM(balance), SUM(credit_limit) FROM Accounts WHERE user_id = %s;", (user_id,))
+    balance, limit = await cur.fetchone()
+    income, expenses, balance, limit = float(income), float(expenses), float(balance or 0), float(limit or 0)
+
+    utilization = (expenses / limit * 100) if limit > 0 else 0
+    new_score = 700 + (-20 if utilization >= 80 else -10 if utilization >= 40 else 10)
+    if expenses > income:
+        new_score -= 10
+    elif income > 0 and expenses < income * 0.5:
+        new_score += 10
+    if balance > 0:
+        new_score += 5
+    new_score = max(300, min(850, int(new_score)))
+
+    await cur.execute("SELECT 1 FROM CreditScores WHERE user_id = %s;", (user_id,))
+    if await cur.fetchone():
+        await cur.execute("UPDATE CreditScores SET score = %s, report_date = %s WHERE user_id = %s;",
+                          (new_score, date.today(), user_id))
+    return new_score
+
+
+async def new_add_transaction(cur, email: str, amount: float, description: str, transaction_date: date):
+    _, _, new_score = await insert_transaction(
+        cur, email=email, amount=amount, description=description, transaction_date=transaction_date,
+    )
+    return new_score
+
+
+async def create_user(history: int) -> tuple:
+    user_id = f"usr_bench_{uuid4().hex[:8]}"
+    email = f"{user_id}@bench.local"
+    async with async_transaction() as cur:
+        await cur.execute("INSERT INTO Users (id, username, email, password_hash) VALUES (%s, %s, %s, %s);",
+                          (user_id, user_id, email, "bench"))
+        await cur.execute("""
+            INSERT INTO Accounts (id, user_id, account_name, account_type, balance, credit_limit)
+            VALUES (%s, %s, 'Main Account', 'checking', 0, 1000);
+        """, (f"acc_{uuid4().hex[:8]}", user_id))
+        await cur.execute("""
+            INSERT INTO CreditScores (id, user_id, score, report_date, provider)
+            VALUES (%s, %s, 700, %s, 'Experian');
+        """, (f"cs_{uuid4().hex[:8]}", user_id, date.today()))
+        # Pre-existing history makes the legacy full-history SUM as expensive as for a real user.
+        await cur.execute("""
+            INSERT INTO Transactions (id, user_id, account_id, category_id, amount, description, transaction_date)
+            SELECT 'tx_bench_' || %s || '_' || g, %s, NULL, 'cat_011', -(g %% 50 + 1), 'history', CURRENT_DATE - (g %% 700)
+            FROM generate_series(1, %s) g;
+        """, (user_id, user_id, history))
+        await rebuild_user_aggregates(cur, [user_id])
+    return user_id, email
+
+
+async def drop_user(user_id: str):
+    async with async_transaction() as cur:
+        for table in ("TransactionHashes", "Transactions", "CreditScores", "UserAggregates", "Accounts"):
+            await cur.execute(f"DELETE FROM {table} WHERE user_id = %s;", (user_id,))
+        await cur.execute("DELETE FROM Users WHERE id = %s;", (user_id,))
+
+
+async def measure(label: str, fn, scope, email: str, iterations: int):
+    latencies, trips = [], []
+    for i in range(iterations):
+        started = time.perf_counter()
+        async with scope() as cur:
+            counting = CountingCursor(cur)
+            await fn(counting, email, -5.0 if i % 3 else 40.0, "bench", date.today())
+        latencies.append((time.perf_counter() - started) * 1000)
+        # BEGIN and COMMIT are round trips too.
+        trips.append(counting.round_trips + (2 if scope is async_transaction else 0))
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{label:<8} round trips/call: {statistics.mean(trips):.1f}   "
+          f"p50: {statistics.median(latencies):.2f} ms   p99: {p99:.2f} ms")
+
+
+async def main(iterations: int, history: int):
+    await open_pool()
+    user_id, email = await create_user(history)
+    try:
+        await measure("before", legacy_add_transaction, async_transaction, email, iterations)
+        await measure("after", new_add_transaction, async_autocommit, email, iterations)
+    finally:
+        await drop_user(user_id)
+        await close_pool()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=300)
+    parser.add_argument("--history", type=int, default=5000, help="pre-existing transactions for the test user")
+    args = parser.parse_args()
+    asyncio.run(main(args.iterations, args.history))
@@ -0,0 +1,79 @@
+"""
+Benchmark for the local transaction categorizer.
+
+Times single-row prediction (the POST /transactions/add path) and batch
+prediction over --rows synthetic statement lines, drawn from --merchants
+distinct merchants with varying reference numbers, as real statements are.
+With --db, also runs recategorize_transactions() over the database configured
+in .env (this rewrites categories of eligible rows, as the endpoint does).
+
+    python -m Benchmarks.CategorizerBench --rows 100000
+    python -m Benchmarks.CategorizerBench --rows 100000 --db
+"""
+import argparse
+import asyncio
+import time
+
+import numpy as np
+
+from Functions.Categorizer import CATEGORIES, SEED_EXAMPLES, predict_categories, predict_category, recategorize_transactions
+from Functions.Database import open_pool, close_pool
+
+
+def synthetic_rows(rows: int, merchants: int, seed: int = 21):
+    rng = np.random.default_rng(seed)
+    phrases = [text for texts in SEED_EXAMPLES.values() for text in texts]
+    names = [f"{phrases[i % len(phrases)]} {'store' if i % 3 else 'inc'} {i}" for i in range(merchants)]
+    picks = rng.integers(0, merchants, rows)
+    refs = rng.integers(1000, 99999, rows)
+    descriptions = [f"{names[m].upper()} #{r}" for m, r in zip(picks.tolist(), refs.tolist())]
+    amounts = np.round(-rng.gamma(2.0, 30.0, rows), 2)
+    return descriptions, amounts
+
+
+def bench_in_memory(rows: int, merchants: int, single: int):
+    descriptions, amounts = synthetic_rows(rows, merchants)
+    single = min(single, rows)
+    started = time.perf_counter()
+    for i in range(single):
+        predict_category(descriptions[i], float(amounts[i]))
+    single_us = (time.perf_counter() - started) * 1e6 / single
+
+    started = time.perf_counter()
+    predicted, confidence = predict_categories(descriptions, amounts)
+    batch_s = time.perf_counter() - started
+
+    counts = {cid: 0 for cid in CATEGORIES}
+    for cid in predicted:
+        counts[cid] += 1
+    print(f"🏷️ {rows:,} rows from {merchants:,} merchants")
+    print(f"   single row      {single_us:9.1f} µs per call  ({single:,} calls)")
+    print(f"   batch           {batch_s * 1000:9.1f} ms  ({batch_s * 1e6 / rows:.2f} µs per row)")
+    print(f"   median confidence {float(np.median(confidence)):.2f}")
+    print("   " + ", ".join(f"{CATEGORIES[cid][0]} {n:,}" for cid, n in counts.items() if n))
+
+
+async def bench_db():
+    await open_pool()
+    try:
+        for label in ("first", "repeat"):
+            print(f"   {label:<6} {await recategorize_transactions()}")
+    finally:
+        await close_pool()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--merchants", type=int, default=2_000)
+    parser.add_argument("--single", type=int, default=2_000, help="rows predicted one call at a time")
+    parser.add_argument("--db", action="store_true", help="also run recategorize_transactions() against the database")
+    args = parser.parse_args()
+    bench_in_memory(args.rows, args.merchants, args.single)
+    if args.db:
+        print("\n🗄️  Re-categorizing stored transactions")
+        asyncio.run(bench_db())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Prompt-size benchmark for chat sessions.
+
+Plays a --turns conversation through the same history assembly and compaction
+as POST /ai/chat (Functions.ChatSessions) and prints, per turn, the estimated
+prompt tokens for the session prompt next to a naive prompt that resends the
+whole transcript. By default replies are synthetic and old turns are folded
+with the model-free digest, so no API key or database is needed. With --live,
+replies and summaries come from Gemini (GEMINI_API_KEY in .env) and per-turn
+latency is reported as well.
+
+    python -m Benchmarks.ChatSessionBench --turns 50
+    python -m Benchmarks.ChatSessionBench --turns 20 --live
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from Functions.ChatSessions import (
+    CHAT_HISTORY_TOKEN_BUDGET,
+    estimate_tokens,
+    fallback_summary,
+    history_contents,
+    plan_compaction,
+)
+
+_QUESTIONS = (
+    "How can I lower my credit utilization this month?",
+    "I just got a raise of about 300 a month, where should that money go?",
+    "Is it better to pay off my card in full or keep a small balance?",
+    "My rent went up, how should I adjust my budget?",
+    "What does a late payment do to my score and for how long?",
+    "Should I open a second card to raise my total limit?",
+    "I want to save 2000 for an emergency fund by summer, is that realistic?",
+    "Why did my score drop 15 points even though I paid on time?",
+)
+
+
+def _synthetic_reply(rng: random.Random) -> str:
+    words = rng.randint(35, 70)
+    return " ".join(rng.choice(("budget", "credit", "limit", "save", "pay", "balance", "score", "month", "plan", "spend"))
+                    for _ in range(words)) + "."
+
+
+async def _offline_summary(summary, folded):
+    return fallback_summary(summary, folded)
+
+
+def _prompt_tokens(system: str, history, message: str) -> int:
+    return estimate_tokens(system) + sum(estimate_tokens(c["parts"][0]) for c in history) + estimate_tokens(message)
+
+
+async def run(turns: int, live: bool, seed: int = 11):
+    rng = random.Random(seed)
+    if live:
+        from AI import CHAT_SYSTEM_INSTRUCTION, chat_reply, summarize_conversation
+        summarize = summarize_conversation
+    else:
+        from AI import CHAT_SYSTEM_INSTRUCTION
+        summarize = _offline_summary
+
+    session = {"id": "bench", "summary": "", "recent": [], "compacted": 0}
+    transcript = []
+    peak_session = peak_naive = 0
+    print(f"{'turn':>4} {'session_tokens':>15} {'naive_tokens':>13} {'recent_msgs':>12} {'summary_tokens':>15}" + ("  latency_ms" if live else ""))
+    for turn in range(1, turns + 1):
+        message = f"{rng.choice(_QUESTIONS)} (turn {turn})"
+        history, _ = history_contents(session)
+        session_tokens = _prompt_tokens(CHAT_SYSTEM_INSTRUCTION, history, message)
+        naive_tokens = _prompt_tokens(CHAT_SYSTEM_INSTRUCTION, [{"parts": [m["text"]]} for m in transcript], message)
+
+        started = time.perf_counter()
+        reply = await chat_reply(message, history=history) if live else _synthetic_reply(rng)
+        latency_ms = (time.perf_counter() - started) * 1000
+
+        exchange = [{"role": "user", "text": message}, {"role": "model", "text": reply}]
+        transcript += exchange
+        session["recent"] += exchange
+        fold = plan_compaction(session)
+        if fold:
+            session["summary"] = await summarize(session["summary"], session["recent"][:fold])
+            session["recent"] = session["recent"][fold:]
+            session["compacted"] += fold
+
+        peak_session, peak_naive = max(peak_session, session_tokens), max(peak_naive, naive_tokens)
+        if turn == 1 or turn % 5 == 0 or turn == turns:
+            print(f"{turn:>4} {session_tokens:>15} {naive_tokens:>13} {len(session['recent']):>12} "
+                  f"{estimate_tokens(session['summary']) if session['summary'] else 0:>15}"
+                  + (f"  {latency_ms:>10.0f}" if live else ""))
+
+    print(f"\n📏 Peak prompt tokens: session {peak_session} vs naive {peak_naive} "
+          f"(history budget {CHAT_HISTORY_TOKEN_BUDGET}, system prompt {estimate_tokens(CHAT_SYSTEM_INSTRUCTION)})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--live", action="store_true", help="use Gemini for replies and summaries")
+    args = parser.parse_args()
+    asyncio.run(run(args.turns, args.live))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Benchmark for batch credit re-scoring.
+
+Scores --users synthetic users with the NumPy engine (Functions.CreditScoring)
+and, for comparison, with the original per-user Python rule on a sample,
+checking both give the same scores. With --db, the same number of synthetic
+users are inserted into the database configured in .env, rescore_all_users()
+runs twice (a cold run from the signup score, then a run with nothing to
+change), the written scores are checked against the SQL rendering of the rule,
+and the synthetic users are deleted again.
+
+    python -m Benchmarks.CreditRescoreBench --users 1000000
+    python -m Benchmarks.CreditRescoreBench --users 1000000 --db
+"""
+import argparse
+import asyncio
+import time
+
+import numpy as np
+
+from Functions.CreditScoring import SCORE_SQL, score_batch
+from Functions.Database import async_transaction, open_pool, close_pool
+from Functions.NightlyRescore import init_credit_score_index, rescore_all_users
+
+_PREFIX = "usr_rescore_bench_"
+
+
+def legacy_score(income: float, expenses: float, balance: float, limit: float) -> int:
+    """The original inline add_transaction rule, one user at a time."""
+    utilization = (expenses / limit * 100) if limit > 0 else 0
+    new_score = 700 + (-20 if utilization >= 80 else -10 if utilization >= 40 else 10)
+    if expenses > income:
+        new_score -= 10
+    elif income > 0 and expenses < income * 0.5:
+        new_score += 10
+    if balance > 0:
+        new_score += 5
+    return max(300, min(850, int(new_score)))
+
+
+def synthetic_totals(users: int, seed: int = 18):
+    rng = np.random.default_rng(seed)
+    income = np.round(rng.gamma(2.0, 2500.0, users), 2)
+    expenses = np.round(income * rng.uniform(0.1, 1.4, users), 2)
+    limit = np.round(rng.choice([0, 500, 1000, 2500, 5000], users) * rng.integers(1, 3, users), 2)
+    balance = np.round(income - expenses + rng.normal(0, 200, users), 2)
+    return income, expenses, balance, limit
+
+
+def bench_in_memory(users: int, sample: int):
+    totals = synthetic_totals(users)
+    started = time.perf_counter()
+    scores = score_batch(*totals)
+    batch_s = time.perf_counter() - started
+
+    sample = min(sample, users)
+    started = time.perf_counter()
+    expected = [legacy_score(*(float(col[i]) for col in totals)) for i in range(sample)]
+    loop_s = (time.perf_counter() - started) * users / sample
+
+    mismatches = int(np.count_nonzero(scores[:sample] != np.array(expected)))
+    print(f"🧮 {users:,} users in memory")
+    print(f"   numpy batch     {batch_s * 1000:9.1f} ms")
+    print(f"   python loop     {loop_s * 1000:9.1f} ms  (extrapolated from {sample:,})")
+    print(f"   mismatches vs original rule on the sample: {mismatches}")
+    print(f"   score spread    min {scores.min()}  p50 {int(np.median(scores))}  max {scores.max()}")
+
+
+async def seed_users(cur, users: int):
+    await cur.execute("""
+        INSERT INTO Users (id, username, email, password_hash)
+        SELECT %(p)s || g, %(p)s || g, %(p)s || g || '@bench.local', 'bench'
+        FROM generate_series(1, %(n)s) g;
+    """, {"p": _PREFIX, "n": users})
+    await cur.execute("""
+        INSERT INTO UserAggregates (user_id, total_income, total_expenses, balance, credit_limit, transaction_count)
+        SELECT %(p)s || g, inc, exp, round((inc - exp + (random() - 0.5) * 400)::numeric, 2),
+               (ARRAY[0, 500, 1000, 2500, 5000])[1 + floor(random() * 5)::int], 1 + floor(random() * 200)::int
+        FROM generate_series(1, %(n)s) g
+        CROSS JOIN LATERAL (SELECT round((random() * 10000)::numeric, 2) AS inc) i
+        CROSS JOIN LATERAL (SELECT round((inc * (0.1 + random() * 1.3))::numeric, 2) AS exp) e;
+    """, {"p": _PREFIX, "n": users})
+    # Every user starts at 700, as /signup does.
+    await cur.execute("""
+        INSERT INTO CreditScores (id, user_id, score, report_date, provider)
+        SELECT 'cs_' || %(p)s || g, %(p)s || g, 700, CURRENT_DATE - 1, 'Experian'
+        FROM generate_series(1, %(n)s) g;
+    """, {"p": _PREFIX, "n": users})
+    await cur.execute("ANALYZE Users; ANALYZE UserAggregates; ANALYZE CreditScores;")
+
+
+async def count_sql_mismatches(cur) -> int:
+    await cur.execute(f"""
+        SELECT count(*)
+        FROM (
+            SELECT user_id, total_income AS inc, total_expenses AS exp, balance AS bal, credit_limit AS lim
+            FROM UserAggregates WHERE user_id LIKE %s
+        ) agg
+        JOIN CreditScores cs ON cs.user_id = agg.user_id
+        WHERE cs.score <> {SCORE_SQL};
+    """, (_PREFIX + "%",))
+    return (await cur.fetchone())[0]
+
+
+async def drop_users():
+    async with async_transaction() as cur:
+        for table in ("CreditScores", "UserAggregates"):
+            await cur.execute(f"DELETE FROM {table} WHERE user_id LIKE %s;", (_PREFIX + "%",))
+        await cur.execute("DELETE FROM Users WHERE id LIKE %s;", (_PREFIX + "%",))
+
+
+async def bench_db(users: int):
+    await open_pool()
+    try:
+        async with async_transaction() as cur:
+            await init_credit_score_index(cur)
+        await drop_users()
+        started = time.perf_counter()
+        async with async_transaction() as cur:
+            await seed_users(cur, users)
+        print(f"\n🗄️  Seeded {users:,} synthetic users in {time.perf_counter() - started:.1f} s")
+        for label in ("cold", "repeat"):
+            print(f"   {label:<6} {await rescore_all_users()}")
+        async with async_transaction() as cur:
+            print(f"   scores differing from SCORE_SQL: {await count_sql_mismatches(cur)}")
+    finally:
+        await drop_users()
+        await close_pool()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--sample", type=int, default=100_000, help="users scored by the Python loop")
+    parser.add_argument("--db", action="store_true", help="also run rescore_all_users() against the database")
+    args = parser.parse_args()
+    bench_in_memory(args.users, args.sample)
+    if args.db:
+        asyncio.run(bench_db(args.users))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""
+Query-plan check for the API routes.
+
+Seeds --users synthetic users with --transactions transactions between them
+into the database configured in .env (migrations must be applied), ANALYZEs,
+then calls every database-backed route for one synthetic user while recording
+each statement the routes execute. Every recorded statement is EXPLAINed with
+its real parameters, and the check fails (exit status 1) if any plan reads a
+table with a sequential scan, apart from the small catalogs in ALLOWED_SEQ_SCANS
+and empty relations (e.g. Transactions partitions for months not reached yet).
+The synthetic rows are deleted afterwards.
+
+    python -m Benchmarks.QueryPlanCheck
+    python -m Benchmarks.QueryPlanCheck --users 20000 --transactions 1000000
+"""
+import argparse
+import asyncio
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+
+import bcrypt
+import httpx
+import psycopg
+
+from Functions.Database import async_autocommit, async_transaction, open_pool, close_pool
+from Functions.Migrations import pending_migrations
+from Functions.MonthlyRollups import rebuild_monthly_rollups
+
+_PREFIX = "usr_plan_check_"
+_PASSWORD_HASH = bcrypt.hashpw(b"plan-check", bcrypt.gensalt(rounds=4)).decode("utf-8")
+# Catalogs small enough that a sequential scan is the right plan at any size.
+ALLOWED_SEQ_SCANS = {"categories", "financialtips"}
+_PLANNED = ("select", "with", "insert", "update", "delete")
+_TEMP_TABLES = ("tx_stage", "recategorized", "rescored")
+
+_recorded: List[Tuple[str, str, Any]] = []
+_route = {"label": None}
+
+
+class _RecordingCursor(psycopg.AsyncCursor):
+    async def execute(self, query, params=None, **kwargs):
+        if _route["label"]:
+            _recorded.append((_route["label"], query, params))
+        return await super().execute(query, params, **kwargs)
+
+
+class _RecordingServerCursor(psycopg.AsyncServerCursor):
+    async def execute(self, query, params=None, **kwargs):
+        if _route["label"]:
+            _recorded.append((_route["label"], query, params))
+        return await super().execute(query, params, **kwargs)
+
+
+async def _instrument(conn):
+    conn.cursor_factory = _RecordingCursor
+    conn.server_cursor_factory = _RecordingServerCursor
+
+
+_SEED_SQL = (
+    ("Users", """
+        INSERT INTO Users (id, username, email, password_hash)
+        SELECT %(p)s || g, %(p)s || g, %(p)s || g || '@plan.local', %(hash)s
+        FROM generate_series(1, %(u)s) g;
+    """),
+    ("Accounts", """
+        INSERT INTO Accounts (id, user_id, account_name, account_type, balance, credit_limit)
+        SELECT 'acc_' || %(p)s || g, %(p)s || g, 'Main Account', 'checking', 0, 1000
+        FROM generate_series(1, %(u)s) g;
+    """),
+    ("Transactions", """
+        INSERT INTO Transactions (id, user_id, account_id, category_id, category_source, amount, description, transaction_date)
+        SELECT 'tx_' || %(p)s || g, %(p)s || (1 + g %% %(u)s), 'acc_' || %(p)s || (1 + g %% %(u)s),
+               'cat_00' || (4 + g %% 6), 'model',
+               CASE WHEN g %% 10 = 0 THEN 2500 ELSE -(g %% 90 + 1) END, 'synthetic', CURRENT_DATE - (g %% 730)
+        FROM generate_series(1, %(t)s) g;
+    """),
+    ("UserAggregates", """
+        INSERT INTO UserAggregates (user_id, total_income, total_expenses, balance, credit_limit, transaction_count)
+        SELECT user_id, SUM(GREATEST(amount, 0)), SUM(GREATEST(-amount, 0)), SUM(amount), 1000, COUNT(*)
+        FROM Transactions WHERE user_id LIKE %(p)s || '%%'
+        GROUP BY user_id;
+    """),
+    ("CreditScores", """
+        INSERT INTO CreditScores (id, user_id, score, report_date, provider)
+        SELECT 'cs_' || %(p)s || g, %(p)s || g, 700, CURRENT_DATE, 'Experian'
+        FROM generate_series(1, %(u)s) g;
+    """),
+    ("CreditScoreHistory", """
+        INSERT INTO CreditScoreHistory (user_id, recorded_at, score, source)
+        SELECT %(p)s || g, now() - d * interval '30 days', 650 + d * 10, 'synthetic'
+        FROM generate_series(1, %(u)s) g CROSS JOIN generate_series(0, 4) d;
+    """),
+    ("savings_challenges", """
+        INSERT INTO savings_challenges (user_email, title, goal_amount, progress, completed)
+        SELECT %(p)s || g || '@plan.local', 'Save ' || d, 500, 0, false
+        FROM generate_series(1, %(u)s) g CROSS JOIN generate_series(1, 2) d;
+    """),
+)
+
+
+async def seed(cur, users: int, transactions: int):
+    """Inserts the synthetic rows, ANALYZEing each table as it fills so later FK checks plan sensibly."""
+    params = {"p": _PREFIX, "u": users, "t": transactions, "hash": _PASSWORD_HASH}
+    for table, sql in _SEED_SQL:
+        await cur.execute(sql, params)
+        await cur.execute(f"ANALYZE {table};")
+    await cur.execute("SELECT id FROM Users WHERE email LIKE %s;", (_PREFIX + "%",))
+    await rebuild_monthly_rollups(cur, [r[0] for r in await cur.fetchall()])
+    await cur.execute("ANALYZE MonthlyRollups;")
+
+
+async def drop_synthetic():
+    """
+    Deletes the synthetic users (matched by email, as /signup picks its own ids)
+    and their rows. Transactions.account_id has no index, so the FK check behind
+    each Accounts delete scans Transactions; vacuuming away the deleted
+    transactions first keeps that scan short. Safe to re-run if interrupted.
+    """
+    like = _PREFIX + "%"
+    async with async_transaction() as cur:
+        await cur.execute("SELECT id FROM Users WHERE email LIKE %s;", (like,))
+        ids = [r[0] for r in await cur.fetchall()]
+        for table in ("CategoryLabels", "MonthlyRollups", "CreditScoreHistory", "CreditScores",
+                      "UserAggregates", "TransactionHashes", "Transactions"):
+            await cur.execute(f"DELETE FROM {table} WHERE user_id = ANY(%s);", (ids,))
+        for table in ("savings_challenges", "AnalysisJobs", "ChatSessions"):
+            await cur.execute(f"DELETE FROM {table} WHERE user_email LIKE %s;", (like,))
+    async with async_autocommit() as cur:
+        await cur.execute("VACUUM Transactions;")
+    async with async_transaction() as cur:
+        await cur.execute("DELETE FROM Accounts WHERE user_id = ANY(%s);", (ids,))
+        await cur.execute("DELETE FROM Users WHERE id = ANY(%s);", (ids,))
+
+
+async def exercise_routes(app) -> Dict[str, int]:
+    """Calls each database-backed route once (or per variant) for synthetic user 1."""
+    email = f"{_PREFIX}1@plan.local"
+    statuses: Dict[str, int] = {}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://check") as client:
+        async def call(label: str, method: str, url: str, **kwargs) -> httpx.Response:
+            _route["label"] = label
+            try:
+                response = await client.request(method, url, **kwargs)
+            finally:
+                _route["label"] = None
+            statuses[label] = response.status_code
+            return response
+
+        page = (await call("GET /transactions (first page)", "GET", f"/transactions/{email}", params={"limit": 20})).json()
+        await call("GET /transactions (next page)", "GET", f"/transactions/{email}",
+                   params={"limit": 20, "cursor": page["next_cursor"]})
+        await call("GET /transactions (filtered)", "GET", f"/transactions/{email}",
+                   params={"category_id": "cat_004", "start_date": "2026-01-01"})
+        await call("GET /transactions (stream)", "GET", f"/transactions/{email}", params={"stream": "true", "limit": 500})
+        await call("POST /signup", "POST", "/signup",
+                   json={"name": f"{_PREFIX}new", "email": f"{_PREFIX}new@plan.local", "password": "pw"})
+        await call("POST /login", "POST", "/login", json={"email": email, "password": "wrong"})
+        await call("GET /user", "GET", f"/user/{email}")
+        await call("PUT /update_user", "PUT", "/update_user", json={"email": email, "username": f"{_PREFIX}1"})
+        await call("POST /transactions/add", "POST", "/transactions/add",
+                   json={"email": email, "amount": 12.5, "kind": "expense", "description": "coffee", "transaction_date": "2026-10-01"})
+        await call("POST /transactions/bulk", "POST", "/transactions/bulk", json=[
+            {"email": email, "amount": 40, "kind": "expense", "description": "groceries", "transaction_date": "2026-10-02"},
+            {"email": email, "amount": 900, "kind": "income", "description": "salary", "transaction_date": "2026-10-03"},
+        ])
+        tx_id = page["transactions"][0]["id"]
+        await call("PUT /transactions/{id}/category", "PUT", f"/transactions/{tx_id}/category",
+                   json={"email": email, "category_id": "cat_010"})
+        await call("POST /transactions/recategorize (one user)", "POST", "/transactions/recategorize", params={"email": email})
+        await call("GET /dashboard", "GET", f"/dashboard/{email}")
+        await call("GET /credit", "GET", f"/credit/{email}")
+        await call("GET /credit/history", "GET", f"/credit/history/{email}")
+        await call("POST /credit/simulate", "POST", f"/credit/simulate/{email}", json={"paths": 1000})
+        await call("GET /credit/tips", "GET", f"/credit/tips/{email}")
+        await call("GET /credit/insights", "GET", f"/credit/insights/{email}")
+        await call("GET /analytics", "GET", f"/analytics/{email}")
+        await call("GET /challenges", "GET", f"/challenges/{email}")
+        await call("POST /challenges/add", "POST", "/challenges/add", json={"email": email, "title": "check", "goal_amount": 10})
+        challenges = (await client.get(f"/challenges/{email}")).json()["challenges"]
+        await call("PUT /challenges/update_progress", "PUT", "/challenges/update_progress",
+                   json={"challenge_id": challenges[0]["id"], "amount": 1})
+        await call("DELETE /challenges/delete", "DELETE", f"/challenges/delete/{challenges[-1]['id']}")
+    return statuses
+
+
+def _seq_scans(plan: Dict[str, Any]) -> List[str]:
+    found = [plan["Relation Name"]] if plan.get("Node Type") == "Seq Scan" else []
+    for child in plan.get("Plans", []):
+        found += _seq_scans(child)
+    return found
+
+
+async def explain_recorded() -> Tuple[int, int, List[str]]:
+    """EXPLAINs every recorded statement once per route. Returns (checked, skipped, failures)."""
+    checked = skipped = 0
+    failures: List[str] = []
+    seen = set()
+    async with async_autocommit() as cur:
+        # Scanning an empty table reads nothing, and is what the planner picks for one.
+        await cur.execute("""
+            SELECT c.relname::text FROM pg_class c
+            WHERE c.relkind = 'r' AND c.relnamespace = current_schema()::regnamespace
+              AND pg_relation_size(c.oid) = 0;
+        """)
+        allowed = ALLOWED_SEQ_SCANS | {r[0] for r in await cur.fetchall()}
+        for label, query, params in _recorded:
+            text = query if isinstance(query, str) else query.as_string(cur)
+            if (label, text) in seen:
+                continue
+            seen.add((label, text))
+            lowered = text.strip().lower()
+            if not lowered.startswith(_PLANNED) or any(t in lowered for t in _TEMP_TABLES):
+                skipped += 1
+                continue
+            try:
+                await cur.execute("EXPLAIN (FORMAT JSON) " + text, params)
+                plan = (await cur.fetchone())[0][0]["Plan"]
+            except psycopg.Error as e:
+                skipped += 1
+                print(f"   ⚠️ {label}: could not EXPLAIN ({e.__class__.__name__})")
+                continue
+            checked += 1
+            scans = sorted({r for r in _seq_scans(plan) if r.lower() not in allowed})
+            if scans:
+                snippet = " ".join(text.split())[:160]
+                failures.append(f"{label}: Seq Scan on {', '.join(scans)}\n      {snippet}")
+    return checked, skipped, failures
+
+
+async def run(users: int, transactions: int, keep: bool) -> int:
+    await open_pool(configure=_instrument)
+    try:
+        pending = await pending_migrations()
+        if pending:
+            print(f"❌ {len(pending)} pending migration(s); run `python -m Functions.Migrations` first.")
+            return 1
+        await drop_synthetic()
+        started = time.perf_counter()
+        async with async_transaction() as cur:
+            await seed(cur, users, transactions)
+        print(f"🗄️  Seeded {users:,} users / {transactions:,} transactions in {time.perf_counter() - started:.1f} s")
+
+        import main  # imported late so the pool above (with recording cursors) is the one routes use
+        statuses = await exercise_routes(main.app)
+        errors = {label: status for label, status in statuses.items() if status >= 500}
+        for label, status in errors.items():
+            print(f"   ⚠️ {label} returned {status}")
+
+        checked, skipped, failures = await explain_recorded()
+        print(f"🔎 {len(statuses)} route calls, {checked} statements EXPLAINed, {skipped} skipped (DDL/COPY/temp tables)")
+        for failure in failures:
+            print(f"❌ {failure}")
+        if not failures:
+            print("✅ No sequential scans outside " + ", ".join(sorted(ALLOWED_SEQ_SCANS)) + ".")
+        return 1 if failures or errors else 0
+    finally:
+        if not keep:
+            await drop_synthetic()
+        await close_pool()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=5_000)
+    parser.add_argument("--transactions", type=int, default=200_000)
+    parser.add_argument("--keep", action="store_true", help="leave the synthetic rows in place")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args.users, args.transactions, args.keep)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Throughput and memory benchmark for statement import.
+
+Generates a CSV and an OFX statement of --rows transactions in a temp directory,
+then streams each one through the same parse → AddTransaction → batch pipeline
+as POST /transactions/import. Reports rows/sec and peak RSS. With --write, the
+batches are also COPY'd into the database configured in .env for a synthetic
+user (cleaned up afterwards), and the file is imported twice to show that the
+second pass is fully deduplicated.
+
+    python -m Benchmarks.StatementImportBench --rows 2000000
+    python -m Benchmarks.StatementImportBench --rows 200000 --write
+"""
+import argparse
+import asyncio
+import io
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from Functions.StatementImport import IMPORT_BATCH_SIZE, iter_statement, iter_batches
+
+_MERCHANTS = ("Tesco", "Amazon", "Shell", "Netflix", "Uber", "Starbucks", "Payroll", "Rent", "Gym", "Pharmacy")
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes on Linux.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _rows(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    # The last ~20 months: older ones may already be archived (read-only).
+    start = date.today() - timedelta(days=600)
+    for i in range(count):
+        merchant = rng.choice(_MERCHANTS)
+        amount = rng.randint(100, 300000) / 100 if merchant == "Payroll" else -rng.randint(100, 25000) / 100
+        yield i, start + timedelta(days=i % 600), amount, f"{merchant} #{rng.randint(1, 9999)}"
+
+
+def write_csv(path: str, count: int):
+    with open(path, "w", newline="") as f:
+        f.write("Date,Description,Amount\n")
+        for _, day, amount, description in _rows(count):
+            f.write(f"{day:%m/%d/%Y},{description},{amount:.2f}\n")
+
+
+def write_ofx(path: str, count: int):
+    with open(path, "w") as f:
+        f.write("OFXHEADER:100\nDATA:OFXSGML\nVERSION:102\n\n<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>\n")
+        for i, day, amount, description in _rows(count):
+            kind = "CREDIT" if amount > 0 else "DEBIT"
+            f.write(
+                f"<STMTTRN>\n<TRNTYPE>{kind}\n<DTPOSTED>{day:%Y%m%d}120000\n<TRNAMT>{amount:.2f}\n"
+                f"<FITID>{i:012d}\n<NAME>{description}\n</STMTTRN>\n"
+            )
+        f.write("</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\n")
+
+
+def run_parse(path: str, fmt: str, email: str, handle_batch=None) -> int:
+    """Parses and validates the file exactly like the endpoint does. Returns rows seen."""
+    from main import _next_import_batch
+
+    rows = 0
+    with open(path, "rb") as raw:
+        text = io.TextIOWrapper(raw, encoding="utf-8-sig", errors="replace", newline="")
+        batches = iter_batches(iter_statement(text, fmt), IMPORT_BATCH_SIZE)
+        while (batch := _next_import_batch(batches, email)) is not None:
+            records, hashes, rejected = batch
+            rows += len(records) + len(rejected)
+            if handle_batch:
+                handle_batch(records, hashes)
+    return rows
+
+
+async def run_write(path: str, fmt: str, passes: int = 2):
+    from Functions.Database import async_transaction, open_pool, close_pool
+    from Functions.BulkIngest import create_stage, stage_records, apply_stage
+    from Functions.Migrations import migrate
+    from Benchmarks.AddTransactionBench import create_user, drop_user
+
+    await open_pool()
+    await migrate()
+    user_id, email = await create_user(history=0)
+    try:
+        for n in range(1, passes + 1):
+            started = time.perf_counter()
+            loop = asyncio.get_running_loop()
+            # Same shape as the route: every batch staged, then applied in one transaction.
+            async with async_transaction() as cur:
+                await create_stage(cur)
+
+                def on_batch(records, hashes):
+                    asyncio.run_coroutine_threadsafe(stage_records(cur, records, hashes), loop).result()
+
+                rows = await asyncio.to_thread(run_parse, path, fmt, email, on_batch)
+                result = await apply_stage(cur)
+            elapsed = time.perf_counter() - started
+            print(f"  write pass {n}: {rows:,} rows in {elapsed:.2f}s ({rows / elapsed:,.0f} rows/sec)  "
+                  f"inserted={result['inserted']:,} duplicates={result['duplicates']:,}  peak RSS {peak_rss_mb():.1f} MB")
+    finally:
+        await drop_user(user_id)
+        await close_pool()
+
+
+def main(rows: int, formats: list, write: bool):
+    import main as _app  # noqa: F401 — load the app up front so the baseline RSS includes it
+    print(f"baseline RSS {peak_rss_mb():.1f} MB")
+    writers = {"csv": write_csv, "ofx": write_ofx}
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in formats:
+            path = os.path.join(tmp, f"statement.{fmt}")
+            writers[fmt](path, rows)
+            size_mb = os.path.getsize(path) / (1024 * 1024)
+            print(f"{fmt.upper()}: {rows:,} rows, {size_mb:.1f} MB")
+
+            started = time.perf_counter()
+            seen = run_parse(path, fmt, "bench@bench.local")
+            elapsed = time.perf_counter() - started
+            print(f"  parse: {seen:,} rows in {elapsed:.2f}s ({seen / elapsed:,.0f} rows/sec)  peak RSS {peak_rss_mb():.1f} MB")
+
+            if write:
+                asyncio.run(run_write(path, fmt))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--format", choices=("csv", "ofx"), action="append",
+                        help="statement format(s) to run; peak RSS is per process, so run one per invocation to compare")
+    parser.add_argument("--write", action="store_true", help="also import into the database (twice, to exercise dedup)")
+    args = parser.parse_args()
+    main(args.rows, args.format or ["csv", "ofx"], args.write)
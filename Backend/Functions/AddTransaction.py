@@ -0,0 +1,208 @@
+from datetime import date
+from typing import Optional, Tuple
+from uuid import uuid4
+
+from Functions.Categorizer import CATEGORIES, FALLBACK, predict_category
+from Functions.CreditScoring import SCORE_SQL
+from Functions.HotCache import lookup_user
+from Functions.MonthlyRollups import ROLLUP_UPSERT_SQL
+from Functions.TransactionPartitions import ensure_partitions, partition_guard
+
+# ── Whole write path in one statement ───────────────────────────
+# Data-modifying CTEs share one snapshot and cannot see each other's writes,
+# so every step reads its predecessors through RETURNING:
+#   • a freshly created default account is inserted with the balance already applied
+#     (the balance UPDATE below cannot see that row, so it only touches existing accounts);
+#   • aggregates are bumped in place, or built from history for a user with no row yet
+#     (that history snapshot does not include the new transaction, so it is added explicitly;
+#     missing_agg is MATERIALIZED so the history scan only runs when the row is really missing).
+_ADD_TRANSACTION_SQL = f"""
+WITH u AS (
+    SELECT %(user_id)s::text AS id
+),
+existing_acc AS (
+    SELECT a.id FROM Accounts a JOIN u ON a.user_id = u.id
+    WHERE %(account_id)s::text IS NULL
+    ORDER BY a.id
+    LIMIT 1
+),
+new_acc AS (
+    INSERT INTO Accounts (id, user_id, account_name, account_type, balance, credit_limit)
+    SELECT %(new_account_id)s, u.id, 'Main Account', 'checking', %(amount)s, 1000.00
+    FROM u
+    WHERE %(account_id)s::text IS NULL AND NOT EXISTS (SELECT 1 FROM existing_acc)
+    RETURNING id, credit_limit
+),
+acc AS (
+    SELECT COALESCE(%(account_id)s::text, (SELECT id FROM existing_acc), (SELECT id FROM new_acc)) AS id
+),
+cat AS (
+    INSERT INTO Categories (id, name)
+    SELECT %(category_id)s, %(category_name)s
+    WHERE NOT EXISTS (SELECT 1 FROM Categories WHERE id = %(category_id)s)
+    RETURNING id
+),
+tx AS (
+    INSERT INTO Transactions (id, user_id, account_id, category_id, category_source, amount, description, transaction_date)
+    SELECT %(tx_id)s, u.id, acc.id, %(category_id)s, %(category_source)s, %(amount)s, %(description)s, %(transaction_date)s
+    FROM u CROSS JOIN acc
+    RETURNING user_id, account_id, category_id, amount, transaction_date
+),
+rollup AS (
+    INSERT INTO MonthlyRollups (user_id, month, category_id, income, expenses, tx_count)
+    SELECT tx.user_id, date_trunc('month', tx.transaction_date)::date, tx.category_id,
+           GREATEST(tx.amount, 0), GREATEST(-tx.amount, 0), 1
+    FROM tx
+    {ROLLUP_UPSERT_SQL}
+),
+bal AS (
+    UPDATE Accounts SET balance = Accounts.balance + tx.amount
+    FROM tx
+    WHERE Accounts.id = tx.account_id
+    RETURNING Accounts.id
+),
+agg_upd AS (
+    UPDATE UserAggregates ua
+    SET total_income = ua.total_income + GREATEST(tx.amount, 0),
+        total_expenses = ua.total_expenses + GREATEST(-tx.amount, 0),
+        balance = ua.balance + tx.amount,
+        credit_limit = ua.credit_limit + COALESCE((SELECT credit_limit FROM new_acc), 0),
+        transaction_count = ua.transaction_count + 1,
+        updated_at = now()
+    FROM tx
+    WHERE ua.user_id = tx.user_id
+    RETURNING ua.total_income AS inc, ua.total_expenses AS exp, ua.balance AS bal, ua.credit_limit AS lim
+),
+missing_agg AS MATERIALIZED (
+    SELECT tx.user_id, tx.amount FROM tx
+    WHERE NOT EXISTS (SELECT 1 FROM UserAggregates WHERE user_id = tx.user_id)
+),
+agg_ins AS (
+    INSERT INTO UserAggregates (user_id, total_income, total_expenses, balance, credit_limit, transaction_count)
+    SELECT m.user_id,
+           h.income + GREATEST(m.amount, 0),
+           h.expenses + GREATEST(-m.amount, 0),
+           a.balance + m.amount,
+           a.credit_limit + COALESCE((SELECT credit_limit FROM new_acc), 0),
+           h.tx_count + 1
+    FROM missing_agg m
+    CROSS JOIN LATERAL (
+        SELECT COALESCE(SUM(CASE WHEN amount > 0 THEN amount ELSE 0 END), 0) AS income,
+               COALESCE(SUM(CASE WHEN amount < 0 THEN ABS(amount) ELSE 0 END), 0) AS expenses,
+               COUNT(*) AS tx_count
+        FROM Transactions WHERE user_id = m.user_id
+    ) h
+    CROSS JOIN LATERAL (
+        SELECT COALESCE(SUM(balance), 0) AS balance, COALESCE(SUM(credit_limit), 0) AS credit_limit
+        FROM Accounts WHERE user_id = m.user_id
+    ) a
+    RETURNING total_income AS inc, total_expenses AS exp, balance AS bal, credit_limit AS lim
+),
+score AS (
+    SELECT {SCORE_SQL} AS new_score
+    FROM (SELECT * FROM agg_upd UNION ALL SELECT * FROM agg_ins) agg
+),
+cs_upd AS (
+    UPDATE CreditScores cs
+    SET score = score.new_score, report_date = %(today)s
+    FROM tx CROSS JOIN score
+    WHERE cs.user_id = tx.user_id
+    RETURNING cs.id
+),
+cs_ins AS (
+    INSERT INTO CreditScores (id, user_id, score, report_date)
+    SELECT %(credit_score_id)s, tx.user_id, score.new_score, %(today)s
+    FROM tx CROSS JOIN score
+    WHERE NOT EXISTS (SELECT 1 FROM CreditScores WHERE user_id = tx.user_id)
+    RETURNING id
+),
+history AS (
+    -- The subquery reads the statement's snapshot, i.e. the score before this write.
+    INSERT INTO CreditScoreHistory (user_id, score, source)
+    SELECT tx.user_id, score.new_score, 'transaction'
+    FROM tx CROSS JOIN score
+    WHERE score.new_score IS DISTINCT FROM (
+        SELECT cs.score FROM CreditScores cs WHERE cs.user_id = tx.user_id ORDER BY cs.report_date DESC LIMIT 1
+    )
+)
+SELECT u.id, (SELECT new_score FROM score) FROM u;
+"""
+
+
+def signed_amount(amount: float, kind: Optional[str]) -> Tuple[float, str]:
+    """Applies the income/expense sign convention. Returns (signed_amount, kind)."""
+    kind = (kind or ("income" if amount >= 0 else "expense")).lower()
+    return (abs(amount) if kind == "income" else -abs(amount)), kind
+
+
+def client_category(category_id: str, kind: str) -> Tuple[str, str, str]:
+    """
+    A category the client sent, as (category_id, category_name, category_source).
+    The name is only used if the id is not in Categories yet.
+    """
+    name = CATEGORIES.get(category_id, CATEGORIES[FALLBACK[kind]])[0]
+    return category_id, name, "client"
+
+
+def normalize_transaction(
+    amount: float, kind: Optional[str], category_id: Optional[str], description: Optional[str] = None
+) -> Tuple[float, str, str, str]:
+    """
+    Applies the sign convention and picks the category: the client's if sent,
+    otherwise the local categorizer's guess from the description and amount.
+    Returns (signed_amount, category_id, category_name, category_source).
+    """
+    coerced_amount, kind = signed_amount(amount, kind)
+    if category_id:
+        return (coerced_amount, *client_category(category_id, kind))
+    return (coerced_amount, *predict_category(description, coerced_amount), "model")
+
+
+async def insert_transaction(
+    cur,
+    *,
+    email: str,
+    amount: float,
+    description: str,
+    transaction_date: date,
+    kind: Optional[str] = None,
+    account_id: Optional[str] = None,
+    category_id: Optional[str] = None,
+) -> Optional[Tuple[str, str, int]]:
+    """
+    Records one transaction in a single round trip once the user is resolved (through
+    the hot cache): gets or creates the default account, ensures the category (predicted
+    if none was sent), inserts the row, updates the account balance, UserAggregates and
+    MonthlyRollups, and re-scores CreditScores (appending to CreditScoreHistory when the
+    score moves).
+    Returns (user_id, transaction_id, new_score), or None if the email is unknown.
+    Raises ArchivedMonth for a date in an archived month.
+    """
+    user = await lookup_user(email, cur)
+    if user is None:
+        return None
+    coerced_amount, category_id, category_name, category_source = normalize_transaction(
+        amount, kind, category_id, description
+    )
+    tx_id = f"tx_{uuid4().hex[:16]}"
+    await ensure_partitions([transaction_date])
+
+    async with partition_guard([transaction_date]):
+        await cur.execute(_ADD_TRANSACTION_SQL, {
+            "user_id": user[0],
+            "account_id": account_id,
+            "new_account_id": f"acc_{uuid4().hex[:8]}",
+            "category_id": category_id,
+            "category_name": category_name,
+            "category_source": category_source,
+            "tx_id": tx_id,
+            "amount": coerced_amount,
+            "description": description,
+            "transaction_date": transaction_date,
+            "today": date.today(),
+            "credit_score_id": f"cs_{uuid4().hex[:8]}",
+        })
+    row = await cur.fetchone()
+    if row is None:
+        return None
+    return row[0], tx_id, row[1]
@@ -0,0 +1,190 @@
+from typing import Any, Dict, Iterable, Optional
+
+from Functions.HotCache import lookup_user
+from Functions.TransactionPartitions import archived_months
+
+# ── Per-user running totals ─────────────────────────────────────
+# One row per user, kept in step with Transactions/Accounts inside the same
+# DB transaction as every write, so readers never have to SUM() history.
+# Months archived out of Transactions are counted from their MonthlyRollups rows.
+
+_REBUILD_SQL = """
+    INSERT INTO UserAggregates (user_id, total_income, total_expenses, balance, credit_limit, transaction_count, updated_at)
+    SELECT
+        u.id,
+        COALESCE(t.income, 0),
+        COALESCE(t.expenses, 0),
+        COALESCE(a.balance, 0),
+        COALESCE(a.credit_limit, 0),
+        COALESCE(t.tx_count, 0),
+        now()
+    FROM Users u
+    LEFT JOIN (
+        SELECT user_id, SUM(income) AS income, SUM(expenses) AS expenses, SUM(tx_count) AS tx_count
+        FROM (
+            SELECT user_id,
+                   SUM(CASE WHEN amount > 0 THEN amount ELSE 0 END) AS income,
+                   SUM(CASE WHEN amount < 0 THEN ABS(amount) ELSE 0 END) AS expenses,
+                   COUNT(*) AS tx_count
+            FROM Transactions
+            {tx_filter}
+            GROUP BY user_id
+            {archived}
+        ) h
+        GROUP BY user_id
+    ) t ON t.user_id = u.id
+    LEFT JOIN (
+        SELECT user_id, SUM(balance) AS balance, SUM(credit_limit) AS credit_limit
+        FROM Accounts
+        {acc_filter}
+        GROUP BY user_id
+    ) a ON a.user_id = u.id
+    {user_filter}
+    ON CONFLICT (user_id) DO UPDATE SET
+        total_income = EXCLUDED.total_income,
+        total_expenses = EXCLUDED.total_expenses,
+        balance = EXCLUDED.balance,
+        credit_limit = EXCLUDED.credit_limit,
+        transaction_count = EXCLUDED.transaction_count,
+        updated_at = EXCLUDED.updated_at;
+"""
+
+_ARCHIVED_SQL = """
+    UNION ALL
+    SELECT user_id, SUM(income), SUM(expenses), SUM(tx_count)
+    FROM MonthlyRollups
+    WHERE month = ANY(%(archived)s::date[]) {user_filter}
+    GROUP BY user_id
+"""
+
+
+async def init_user_aggregates_table(cur):
+    """Creates the UserAggregates table and backfills rows for users that have none yet."""
+    await cur.execute("""
+        CREATE TABLE IF NOT EXISTS UserAggregates (
+            user_id TEXT PRIMARY KEY,
+            total_income NUMERIC(14, 2) NOT NULL DEFAULT 0,
+            total_expenses NUMERIC(14, 2) NOT NULL DEFAULT 0,
+            balance NUMERIC(14, 2) NOT NULL DEFAULT 0,
+            credit_limit NUMERIC(14, 2) NOT NULL DEFAULT 0,
+            transaction_count BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+    """)
+    await cur.execute("""
+        SELECT u.id FROM Users u
+        WHERE NOT EXISTS (SELECT 1 FROM UserAggregates a WHERE a.user_id = u.id);
+    """)
+    missing = [r[0] for r in await cur.fetchall()]
+    if missing:
+        print(f"💡 Backfilling UserAggregates for {len(missing)} user(s)...")
+        await rebuild_user_aggregates(cur, missing)
+
+
+async def rebuild_user_aggregates(cur, user_ids: Optional[Iterable[str]] = None):
+    """
+    Recomputes aggregates from scratch — for every user, or only `user_ids`.
+    This is the only place that scans full transaction history.
+    """
+    archived = await archived_months(cur)
+    # MonthlyRollups is only read once months have been archived, i.e. long after it exists.
+    archived_sql = _ARCHIVED_SQL.format(
+        user_filter="" if user_ids is None else "AND user_id = ANY(%(ids)s)"
+    ) if archived else ""
+    if user_ids is None:
+        await cur.execute(
+            _REBUILD_SQL.format(tx_filter="", archived=archived_sql, acc_filter="", user_filter=""),
+            {"archived": archived},
+        )
+        return
+    ids = list(user_ids)
+    await cur.execute(
+        _REBUILD_SQL.format(
+            tx_filter="WHERE user_id = ANY(%(ids)s)",
+            archived=archived_sql,
+            acc_filter="WHERE user_id = ANY(%(ids)s)",
+            user_filter="WHERE u.id = ANY(%(ids)s)",
+        ),
+        {"ids": ids, "archived": archived},
+    )
+
+
+async def create_user_aggregates(cur, user_id: str, credit_limit: float = 0.0):
+    """Starts a fresh row for a newly signed-up user."""
+    await cur.execute("""
+        INSERT INTO UserAggregates (user_id, credit_limit)
+        VALUES (%s, %s)
+        ON CONFLICT (user_id) DO NOTHING;
+    """, (user_id, credit_limit))
+
+
+async def adjust_credit_limit(cur, user_id: str, delta: float):
+    """Keeps credit_limit in step when an account is opened for the user."""
+    await cur.execute("""
+        UPDATE UserAggregates
+        SET credit_limit = credit_limit + %s, updated_at = now()
+        WHERE user_id = %s;
+    """, (delta, user_id))
+
+
+async def get_user_aggregates(cur, user_id: str) -> Dict[str, Any]:
+    """Returns the user's totals, rebuilding the row first if it is missing."""
+    await cur.execute(
+        "SELECT total_income, total_expenses, balance, credit_limit, transaction_count FROM UserAggregates WHERE user_id = %s;",
+        (user_id,),
+    )
+    row = await cur.fetchone()
+    if row is None:
+        await rebuild_user_aggregates(cur, [user_id])
+        await cur.execute(
+            "SELECT total_income, total_expenses, balance, credit_limit, transaction_count FROM UserAggregates WHERE user_id = %s;",
+            (user_id,),
+        )
+        row = await cur.fetchone()
+    return _to_dict(row)
+
+
+async def get_aggregates_by_email(cur, email: str) -> Optional[Dict[str, Any]]:
+    """
+    Resolves the email (through the hot cache) and loads the user's totals.
+    Returns None if the user does not exist; the dict carries `user_id` otherwise.
+    """
+    user = await lookup_user(email, cur)
+    if user is None:
+        return None
+    totals = await get_user_aggregates(cur, user[0])
+    totals["user_id"] = user[0]
+    return totals
+
+
+def _to_dict(row) -> Dict[str, Any]:
+    income, expenses, balance, limit, count = row
+    return {
+        "income": _num(income),
+        "expenses": _num(expenses),
+        "balance": _num(balance),
+        "credit_limit": _num(limit),
+        "transaction_count": int(count or 0),
+    }
+
+
+def _num(value) -> float:
+    return float(value) if value is not None else 0.0
+
+
+# ─── Rebuild from scratch: python -m Functions.Aggregates ──────
+if __name__ == "__main__":
+    import asyncio
+    from Functions.Database import async_transaction, open_pool, close_pool
+
+    async def _main():
+        await open_pool()
+        try:
+            async with async_transaction() as cur:
+                await init_user_aggregates_table(cur)
+                await rebuild_user_aggregates(cur)
+            print("✅ UserAggregates rebuilt for all users.")
+        finally:
+            await close_pool()
+
+    asyncio.run(_main())
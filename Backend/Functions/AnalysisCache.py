@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+from itertools import count
+from typing import Any, Dict, Optional, Set
+
+from cachetools import TTLCache
+
+from Functions.ChatAnswerCache import CHAT_CACHE_TTL_S
+
+# ── AI credit-analysis result cache ─────────────────────────────
+# Keyed on a hash of the exact inputs to the model call — the user's db_info
+# snapshot, the prompt template and the model name — so a hit is only ever
+# served for an identical question. Entries are LRU/TTL-evicted, and every
+# entry belonging to a user is dropped when one of their writes lands.
+
+ANALYSIS_CACHE_SIZE = int(os.getenv("ANALYSIS_CACHE_SIZE", "1024"))
+ANALYSIS_CACHE_TTL_S = float(os.getenv("ANALYSIS_CACHE_TTL_S", "3600"))
+ANALYSIS_GENERATION_SIZE = int(os.getenv("ANALYSIS_GENERATION_SIZE", "100000"))
+
+_cache: TTLCache = TTLCache(maxsize=ANALYSIS_CACHE_SIZE, ttl=ANALYSIS_CACHE_TTL_S)
+_keys_by_email: Dict[str, Set[str]] = {}
+
+# ── Generations ─────────────────────────────────────────────────
+# A user's generation changes on every write to their data. It guards stores
+# (a computation that started before a write must not cache its result) and
+# keys other caches: chat answers (user_scope) and coalesced requests. So a
+# generation is never handed out twice: every invalidation takes a fresh stamp
+# from one process-wide counter.
+#   • A user without a stamp is at `_epoch`. Stamps expire only after the
+#     longest-lived entry that can be keyed on an older generation, so falling
+#     back to `_epoch` cannot bring back anything cached before the write.
+#   • Evicting a stamp for space would break that, so it moves `_epoch` past
+#     every stamp instead: everyone's generation advances and nothing comes back.
+ANALYSIS_GENERATION_TTL_S = max(ANALYSIS_CACHE_TTL_S, CHAT_CACHE_TTL_S)
+
+_stamps = count(1)
+
+
+class _Generations(TTLCache):
+    def popitem(self):
+        global _epoch
+        item = super().popitem()
+        _epoch = next(_stamps)
+        _stats["generation_evictions"] += 1
+        return item
+
+
+_generation: TTLCache = _Generations(maxsize=ANALYSIS_GENERATION_SIZE, ttl=ANALYSIS_GENERATION_TTL_S)
+# The generation of users without a stamp; bumped to invalidate everyone at once.
+_epoch = 0
+_stats = {"hits": 0, "misses": 0, "stores": 0, "invalidations": 0, "generation_evictions": 0}
+
+
+def analysis_key(db_info: Dict[str, Any], prompt_template: str, model_name: str) -> str:
+    snapshot = json.dumps(db_info, sort_keys=True, default=str)
+    return hashlib.sha256(f"{model_name}\x00{prompt_template}\x00{snapshot}".encode("utf-8")).hexdigest()
+
+
+def analysis_generation(email: str) -> int:
+    return max(_epoch, _generation.get(email, 0))
+
+
+def get_cached_analysis(key: str) -> Optional[Dict[str, Any]]:
+    value = _cache.get(key)
+    _stats["hits" if value is not None else "misses"] += 1
+    return value
+
+
+def store_analysis(email: str, key: str, value: Dict[str, Any], generation: int):
+    """Caches `value` unless the user's data changed since `generation` was read."""
+    if analysis_generation(email) != generation:
+        return
+    _cache[key] = value
+    keys = _keys_by_email.setdefault(email, set())
+    # Forget keys the cache has already evicted so this index stays bounded too.
+    keys.intersection_update(_cache.keys())
+    keys.add(key)
+    _stats["stores"] += 1
+
+
+def invalidate_analysis(email: str):
+    """Drops every cached analysis for `email` — call after any write to their data."""
+    _generation[email] = next(_stamps)
+    keys = _keys_by_email.pop(email, None)
+    if not keys:
+        return
+    for key in keys:
+        _cache.pop(key, None)
+    _stats["invalidations"] += 1
+
+
+def invalidate_all_analyses():
+    """Drops every cached analysis — for writes that touch most users at once."""
+    global _epoch
+    _epoch = next(_stamps)
+    _cache.clear()
+    _keys_by_email.clear()
+    _stats["invalidations"] += 1
+
+
+def get_analysis_cache_stats() -> Dict[str, Any]:
+    lookups = _stats["hits"] + _stats["misses"]
+    return {
+        "hits": _stats["hits"],
+        "misses": _stats["misses"],
+        "stores": _stats["stores"],
+        "invalidations": _stats["invalidations"],
+        "hit_rate": round(_stats["hits"] / lookups, 3) if lookups else 0.0,
+        "size": len(_cache),
+        "max_size": ANALYSIS_CACHE_SIZE,
+        "ttl_s": ANALYSIS_CACHE_TTL_S,
+        "generations": len(_generation),
+        "generation_evictions": _stats["generation_evictions"],
+    }
@@ -0,0 +1,281 @@
+import asyncio
+import json
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+from uuid import uuid4
+
+from Functions.Database import async_autocommit
+from Functions.HotCache import lookup_user
+
+# ── Background AI analysis jobs ─────────────────────────────────
+# The queue is the AnalysisJobs table itself: workers claim the oldest queued
+# row with FOR UPDATE SKIP LOCKED, so any number of workers — in this process
+# or in other app processes — share it with no broker. Enqueues in this process
+# wake the local workers at once; other processes' jobs are found by polling.
+# A user has at most one queued job: enqueueing again returns the queued one.
+# Jobs left 'running' by a crashed process are re-claimed once stale.
+
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "2"))
+ANALYSIS_JOB_POLL_S = float(os.getenv("ANALYSIS_JOB_POLL_S", "2"))
+ANALYSIS_JOB_STALE_S = float(os.getenv("ANALYSIS_JOB_STALE_S", "300"))
+ANALYSIS_JOB_MAX_ATTEMPTS = int(os.getenv("ANALYSIS_JOB_MAX_ATTEMPTS", "3"))
+ANALYSIS_JOB_RETENTION_DAYS = int(os.getenv("ANALYSIS_JOB_RETENTION_DAYS", "7"))
+ANALYSIS_JOB_MAX_WAIT_S = 30.0
+# Quiet period after a user's last transaction before their analysis is
+# precomputed; 0 turns precomputation off.
+ANALYSIS_PRECOMPUTE_DELAY_S = float(os.getenv("ANALYSIS_PRECOMPUTE_DELAY_S", "5"))
+
+FINISHED = ("done", "failed")
+_JOB_COLUMNS = "id, user_email, status, source, result, error, attempts, created_at, started_at, finished_at"
+_PRUNE_EVERY_S = 3600
+
+_analyze: Optional[Callable[[str], Awaitable[Dict[str, Any]]]] = None
+_workers: List[asyncio.Task] = []
+_wakeup: Optional[asyncio.Event] = None
+# Replaced after every finished job; long-pollers wait on the current one.
+_finished: Optional[asyncio.Event] = None
+_pending: Dict[str, asyncio.TimerHandle] = {}
+_background: Set[asyncio.Task] = set()
+_last_prune: Optional[float] = None
+_stats = {"enqueued": 0, "precompute_scheduled": 0, "precompute_enqueued": 0, "completed": 0, "failed": 0}
+
+
+async def init_analysis_jobs_table(cur):
+    """Creates the AnalysisJobs table and its queue indexes."""
+    await cur.execute("""
+        CREATE TABLE IF NOT EXISTS AnalysisJobs (
+            id TEXT PRIMARY KEY,
+            user_email TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'done', 'failed')),
+            source TEXT NOT NULL DEFAULT 'request',
+            result JSONB,
+            error TEXT,
+            attempts INT NOT NULL DEFAULT 0,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            started_at TIMESTAMPTZ,
+            finished_at TIMESTAMPTZ
+        );
+    """)
+    await cur.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS analysis_jobs_one_queued_per_user
+        ON AnalysisJobs (user_email) WHERE status = 'queued';
+    """)
+    await cur.execute("""
+        CREATE INDEX IF NOT EXISTS analysis_jobs_open_idx
+        ON AnalysisJobs (created_at) WHERE status IN ('queued', 'running');
+    """)
+
+
+def _job_dict(row) -> Dict[str, Any]:
+    return dict(zip(("id", "email", "status", "source", "result", "error", "attempts",
+                     "created_at", "started_at", "finished_at"), row))
+
+
+# ── Enqueue / read ──────────────────────────────────────────────
+async def enqueue_analysis(email: str, source: str = "request") -> Optional[Dict[str, Any]]:
+    """
+    Queues an analysis for `email` and returns {"id", "status"}, reusing the user's
+    queued job if there is one. Returns None if the user does not exist.
+    """
+    async with async_autocommit() as cur:
+        if await lookup_user(email, cur) is None:
+            return None
+        for _ in range(2):
+            await cur.execute("""
+                WITH ins AS (
+                    INSERT INTO AnalysisJobs (id, user_email, source)
+                    VALUES (%(id)s, %(email)s, %(source)s)
+                    ON CONFLICT (user_email) WHERE status = 'queued' DO NOTHING
+                    RETURNING id, status, TRUE AS created
+                )
+                SELECT id, status, created FROM ins
+                UNION ALL
+                SELECT id, status, FALSE FROM AnalysisJobs WHERE user_email = %(email)s AND status = 'queued'
+                LIMIT 1;
+            """, {"id": str(uuid4()), "email": email, "source": source})
+            row = await cur.fetchone()
+            # No row: a concurrent enqueue's job was claimed between our conflict
+            # and our read — try once more.
+            if row is not None:
+                break
+    if row is None:
+        return None
+    if row[2]:
+        _stats["enqueued"] += 1
+        if _wakeup is not None:
+            _wakeup.set()
+    return {"id": row[0], "status": row[1]}
+
+
+async def get_analysis_job(job_id: str) -> Optional[Dict[str, Any]]:
+    async with async_autocommit() as cur:
+        await cur.execute(f"SELECT {_JOB_COLUMNS} FROM AnalysisJobs WHERE id = %s;", (job_id,))
+        row = await cur.fetchone()
+    return _job_dict(row) if row else None
+
+
+async def wait_for_analysis_job(job_id: str, wait: float) -> Optional[Dict[str, Any]]:
+    """Long-poll: returns the job once it has finished, or as it stands after `wait` seconds."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + min(wait, ANALYSIS_JOB_MAX_WAIT_S)
+    while True:
+        # Take the event before reading, so a job finishing in between still wakes us.
+        finished = _finished or asyncio.Event()
+        job = await get_analysis_job(job_id)
+        remaining = deadline - loop.time()
+        if job is None or job["status"] in FINISHED or remaining <= 0:
+            return job
+        try:
+            # Jobs run by other processes don't signal us: re-read at least every poll interval.
+            await asyncio.wait_for(finished.wait(), min(remaining, ANALYSIS_JOB_POLL_S))
+        except asyncio.TimeoutError:
+            pass
+
+
+# ── Debounced precompute ────────────────────────────────────────
+def schedule_precompute(email: str):
+    """
+    (Re)starts the user's quiet-period timer; when it expires without another call,
+    their analysis is queued. A burst of transactions therefore costs one job.
+    """
+    if ANALYSIS_PRECOMPUTE_DELAY_S <= 0 or not _workers:
+        return
+    handle = _pending.pop(email, None)
+    if handle is not None:
+        handle.cancel()
+    _pending[email] = asyncio.get_running_loop().call_later(ANALYSIS_PRECOMPUTE_DELAY_S, _precompute_now, email)
+    _stats["precompute_scheduled"] += 1
+
+
+def _precompute_now(email: str):
+    _pending.pop(email, None)
+    task = asyncio.create_task(_enqueue_precompute(email))
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+
+async def _enqueue_precompute(email: str):
+    try:
+        if await enqueue_analysis(email, source="precompute") is not None:
+            _stats["precompute_enqueued"] += 1
+    except Exception as e:
+        print("⚠️ Could not queue precomputed analysis:", e)
+
+
+# ── Workers ─────────────────────────────────────────────────────
+def start_analysis_workers(analyze: Callable[[str], Awaitable[Dict[str, Any]]], count: int = ANALYSIS_WORKERS):
+    """Starts `count` worker tasks that run `analyze(email)` for queued jobs."""
+    global _analyze, _wakeup, _finished
+    if _workers or count <= 0:
+        return
+    _analyze = analyze
+    _wakeup = asyncio.Event()
+    _finished = asyncio.Event()
+    for n in range(count):
+        _workers.append(asyncio.create_task(_worker_loop(), name=f"analysis-worker-{n}"))
+    print(f"🧠 Started {count} AI analysis worker(s).")
+
+
+async def stop_analysis_workers():
+    """Cancels pending precompute timers and the workers; interrupted jobs are re-claimed later."""
+    for handle in _pending.values():
+        handle.cancel()
+    _pending.clear()
+    tasks = _workers + list(_background)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    _workers.clear()
+
+
+async def _worker_loop():
+    while True:
+        _wakeup.clear()
+        try:
+            job = await _claim()
+        except Exception as e:
+            print("⚠️ Analysis worker could not claim a job:", e)
+            job = None
+        if job is None:
+            await _maybe_prune()
+            try:
+                await asyncio.wait_for(_wakeup.wait(), ANALYSIS_JOB_POLL_S)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        await _run(*job)
+
+
+async def _claim():
+    async with async_autocommit() as cur:
+        await cur.execute("""
+            UPDATE AnalysisJobs SET status = 'running', started_at = now(), attempts = attempts + 1
+            WHERE id = (
+                SELECT id FROM AnalysisJobs
+                WHERE status = 'queued'
+                   OR (status = 'running' AND started_at < now() - make_interval(secs => %(stale)s)
+                       AND attempts < %(max_attempts)s)
+                ORDER BY created_at
+                FOR UPDATE SKIP LOCKED
+                LIMIT 1
+            )
+            RETURNING id, user_email;
+        """, {"stale": ANALYSIS_JOB_STALE_S, "max_attempts": ANALYSIS_JOB_MAX_ATTEMPTS})
+        return await cur.fetchone()
+
+
+async def _run(job_id: str, email: str):
+    global _finished
+    status, result, error = "done", None, None
+    try:
+        result = await _analyze(email)
+        if "error" in result:
+            status, error, result = "failed", str(result["error"]), None
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        status, error = "failed", str(e) or type(e).__name__
+
+    try:
+        async with async_autocommit() as cur:
+            await cur.execute("""
+                UPDATE AnalysisJobs SET status = %s, result = %s::jsonb, error = %s, finished_at = now()
+                WHERE id = %s AND status = 'running';
+            """, (status, json.dumps(result, default=str) if result is not None else None, error, job_id))
+    except Exception as e:
+        print("⚠️ Could not save analysis job result:", e)
+        return
+
+    _stats["completed" if status == "done" else "failed"] += 1
+    finished, _finished = _finished, asyncio.Event()
+    finished.set()
+
+
+async def _maybe_prune():
+    """Deletes finished jobs past retention and gives up on stale jobs out of attempts (at most hourly)."""
+    global _last_prune
+    if _last_prune is not None and time.monotonic() - _last_prune < _PRUNE_EVERY_S:
+        return
+    _last_prune = time.monotonic()
+    try:
+        async with async_autocommit() as cur:
+            await cur.execute("""
+                DELETE FROM AnalysisJobs
+                WHERE status IN ('done', 'failed')
+                  AND finished_at < now() - make_interval(days => %s);
+            """, (ANALYSIS_JOB_RETENTION_DAYS,))
+            await cur.execute("""
+                UPDATE AnalysisJobs SET status = 'failed', error = 'Worker stopped before finishing.', finished_at = now()
+                WHERE status = 'running' AND attempts >= %s
+                  AND started_at < now() - make_interval(secs => %s);
+            """, (ANALYSIS_JOB_MAX_ATTEMPTS, ANALYSIS_JOB_STALE_S))
+    except Exception as e:
+        print("⚠️ Could not prune analysis jobs:", e)
+
+
+def get_analysis_job_stats() -> Dict[str, Any]:
+    stats = dict(_stats)
+    stats["workers"] = len(_workers)
+    stats["pending_precompute"] = len(_pending)
+    return stats
@@ -0,0 +1,307 @@
+from typing import Any, Dict, Iterable, List, Optional
+from uuid import uuid4
+
+from Functions.AddTransaction import client_category, signed_amount
+from Functions.Categorizer import CATEGORIES, predict_categories
+from Functions.CreditScoring import SCORE_SQL
+from Functions.Aggregates import rebuild_user_aggregates
+from Functions.MonthlyRollups import ROLLUP_UPSERT_SQL
+from Functions.TransactionPartitions import ensure_partitions, partition_guard
+
+# ── Bulk transaction ingest ─────────────────────────────────────
+# Rows are COPY'd into a per-transaction staging table, then applied with a
+# fixed number of set-based statements — categories upserted once, balances
+# adjusted once per account, aggregates and CreditScores updated once per user —
+# no matter how many rows the batch holds.
+# Rows that carry a content_hash (statement imports) are skipped if the user
+# already has a transaction with that hash, on any date. The (user_id,
+# content_hash) keys live in TransactionHashes, a plain table, because a unique
+# index on partitioned Transactions would have to include transaction_date —
+# and a bank re-export with a corrected posted date must still dedupe. Keys
+# stay after a month is archived, so re-importing an old statement is a no-op.
+
+STAGE_COLUMNS = (
+    "id", "email", "account_id", "category_id", "category_name", "category_source",
+    "amount", "description", "transaction_date", "content_hash",
+)
+
+
+class UnknownUsers(Exception):
+    """Raised when a batch references emails that have no Users row."""
+
+    def __init__(self, emails: List[str]):
+        super().__init__(f"Unknown user(s): {', '.join(emails)}")
+        self.emails = emails
+
+
+async def init_content_hash_index(cur):
+    """Adds Transactions.content_hash and the per-user unique index used for deduplication."""
+    await cur.execute("ALTER TABLE Transactions ADD COLUMN IF NOT EXISTS content_hash TEXT;")
+    await cur.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS transactions_user_content_hash_key
+        ON Transactions (user_id, content_hash) WHERE content_hash IS NOT NULL;
+    """)
+
+
+async def init_transaction_hashes(cur):
+    """
+    Moves statement-import dedup from the unique index on Transactions to the
+    TransactionHashes table, filled from the hashed rows already present.
+    """
+    await cur.execute("""
+        CREATE TABLE IF NOT EXISTS TransactionHashes (
+            user_id TEXT NOT NULL,
+            content_hash TEXT NOT NULL,
+            transaction_id TEXT NOT NULL,
+            PRIMARY KEY (user_id, content_hash)
+        );
+    """)
+    await cur.execute("""
+        INSERT INTO TransactionHashes (user_id, content_hash, transaction_id)
+        SELECT DISTINCT ON (user_id, content_hash) user_id, content_hash, id
+        FROM Transactions WHERE content_hash IS NOT NULL
+        ORDER BY user_id, content_hash, transaction_date, id
+        ON CONFLICT DO NOTHING;
+    """)
+    await cur.execute("DROP INDEX IF EXISTS transactions_user_content_hash_key;")
+
+
+async def create_stage(cur):
+    """Creates the staging table; it is dropped automatically at commit."""
+    await cur.execute("""
+        CREATE TEMP TABLE tx_stage (
+            id TEXT NOT NULL,
+            email TEXT NOT NULL,
+            user_id TEXT,
+            account_id TEXT,
+            category_id TEXT NOT NULL,
+            category_name TEXT NOT NULL,
+            category_source TEXT NOT NULL,
+            amount NUMERIC(12, 2) NOT NULL,
+            description TEXT,
+            transaction_date DATE NOT NULL,
+            content_hash TEXT
+        ) ON COMMIT DROP;
+    """)
+
+
+async def stage_records(cur, records: Iterable[Any], content_hashes: Optional[Iterable[str]] = None) -> int:
+    """
+    COPYs validated AddTransaction records into the staging table. Returns the row count.
+    `content_hashes`, if given, runs parallel to `records`. Rows sent without a
+    category are categorized together in one batch.
+    Raises ArchivedMonth if any record is dated in an archived month.
+    """
+    records = list(records)
+    signed = [signed_amount(r.amount, r.kind) for r in records]
+    uncategorized = [i for i, r in enumerate(records) if not r.category_id]
+    predicted, _ = predict_categories(
+        [records[i].description for i in uncategorized], [signed[i][0] for i in uncategorized]
+    )
+    categories = dict(zip(uncategorized, ((cid, CATEGORIES[cid][0], "model") for cid in predicted)))
+
+    # Partitions are created up front, in their own transaction, so the COPY and
+    # the import's transaction never hold partition DDL locks.
+    await ensure_partitions(r.transaction_date for r in records)
+
+    hashes = iter(content_hashes) if content_hashes is not None else None
+    async with cur.copy(f"COPY tx_stage ({', '.join(STAGE_COLUMNS)}) FROM STDIN") as copy:
+        for i, r in enumerate(records):
+            amount, kind = signed[i]
+            category = categories.get(i) or client_category(r.category_id, kind)
+            await copy.write_row((
+                f"tx_{uuid4().hex[:16]}",
+                r.email,
+                r.account_id,
+                *category,
+                amount,
+                r.description,
+                r.transaction_date,
+                next(hashes) if hashes is not None else None,
+            ))
+    return len(records)
+
+
+async def apply_stage(cur) -> Dict[str, Any]:
+    """
+    Moves staged rows into Transactions and brings Accounts, UserAggregates and
+    CreditScores up to date. Returns counts plus the new score per email.
+    Raises ArchivedMonth if any row is dated in an archived month.
+    """
+    # Resolve users once per distinct email.
+    await cur.execute("""
+        UPDATE tx_stage s SET user_id = u.id
+        FROM Users u WHERE u.email = s.email;
+    """)
+    await cur.execute("SELECT DISTINCT email FROM tx_stage WHERE user_id IS NULL;")
+    unknown = [r[0] for r in await cur.fetchall()]
+    if unknown:
+        raise UnknownUsers(unknown)
+
+    # Remember who has no aggregates row yet: they get a full rebuild at the end.
+    await cur.execute("""
+        SELECT DISTINCT s.user_id FROM tx_stage s
+        WHERE NOT EXISTS (SELECT 1 FROM UserAggregates a WHERE a.user_id = s.user_id);
+    """)
+    missing_aggregates = [r[0] for r in await cur.fetchall()]
+
+    # Default accounts: create them for users that have none, then fill them in.
+    await cur.execute("""
+        INSERT INTO Accounts (id, user_id, account_name, account_type, balance, credit_limit)
+        SELECT 'acc_' || substr(md5(random()::text || n.user_id), 1, 8), n.user_id, 'Main Account', 'checking', 0.00, 1000.00
+        FROM (SELECT DISTINCT user_id FROM tx_stage WHERE account_id IS NULL) n
+        WHERE NOT EXISTS (SELECT 1 FROM Accounts a WHERE a.user_id = n.user_id)
+        RETURNING user_id, credit_limit;
+    """)
+    new_limits = await cur.fetchall()
+    if new_limits:
+        await cur.execute("""
+            UPDATE UserAggregates ua
+            SET credit_limit = ua.credit_limit + n.credit_limit, updated_at = now()
+            FROM unnest(%s::text[], %s::numeric[]) AS n(user_id, credit_limit)
+            WHERE ua.user_id = n.user_id;
+        """, ([r[0] for r in new_limits], [r[1] for r in new_limits]))
+    await cur.execute("""
+        UPDATE tx_stage s SET account_id = d.id
+        FROM (
+            SELECT DISTINCT ON (user_id) user_id, id FROM Accounts
+            WHERE user_id IN (SELECT user_id FROM tx_stage WHERE account_id IS NULL)
+            ORDER BY user_id, id
+        ) d
+        WHERE s.account_id IS NULL AND s.user_id = d.user_id;
+    """)
+
+    # Categories: one upsert for the whole batch.
+    await cur.execute("""
+        INSERT INTO Categories (id, name)
+        SELECT DISTINCT ON (category_id) category_id, category_name FROM tx_stage s
+        WHERE NOT EXISTS (SELECT 1 FROM Categories c WHERE c.id = s.category_id)
+        ORDER BY category_id;
+    """)
+
+    # Claim every content_hash (the first staged row wins a hash repeated within
+    # the batch), then drop staged rows whose hash was already taken, so every
+    # step below only counts what is really written.
+    await cur.execute("""
+        WITH claimed AS (
+            INSERT INTO TransactionHashes (user_id, content_hash, transaction_id)
+            SELECT DISTINCT ON (user_id, content_hash) user_id, content_hash, id
+            FROM tx_stage WHERE content_hash IS NOT NULL
+            ORDER BY user_id, content_hash, id
+            ON CONFLICT DO NOTHING
+            RETURNING transaction_id
+        ),
+        dup AS (
+            DELETE FROM tx_stage s
+            WHERE s.content_hash IS NOT NULL AND NOT EXISTS (SELECT 1 FROM claimed c WHERE c.transaction_id = s.id)
+            RETURNING 1
+        )
+        SELECT COUNT(*) FROM dup;
+    """)
+    duplicates = (await cur.fetchone())[0]
+
+    await cur.execute("SELECT DISTINCT date_trunc('month', transaction_date)::date FROM tx_stage;")
+    months = [r[0] for r in await cur.fetchall()]
+
+    async with partition_guard(months):
+        await cur.execute("""
+            INSERT INTO Transactions (
+                id, user_id, account_id, category_id, category_source, amount, description, transaction_date, content_hash
+            )
+            SELECT id, user_id, account_id, category_id, category_source, amount, description, transaction_date, content_hash
+            FROM tx_stage;
+        """)
+    inserted = cur.rowcount
+
+    # Balances: one adjustment per account.
+    await cur.execute("""
+        UPDATE Accounts a SET balance = a.balance + d.delta
+        FROM (SELECT account_id, SUM(amount) AS delta FROM tx_stage GROUP BY account_id) d
+        WHERE a.id = d.account_id;
+    """)
+
+    # Monthly rollups: one increment per (user, month, category).
+    await cur.execute(f"""
+        INSERT INTO MonthlyRollups (user_id, month, category_id, income, expenses, tx_count)
+        SELECT user_id, date_trunc('month', transaction_date)::date, category_id,
+               SUM(GREATEST(amount, 0)), SUM(GREATEST(-amount, 0)), COUNT(*)
+        FROM tx_stage
+        GROUP BY 1, 2, 3
+        {ROLLUP_UPSERT_SQL};
+    """)
+
+    # Aggregates: one increment per user.
+    await cur.execute("""
+        UPDATE UserAggregates ua
+        SET total_income = ua.total_income + d.income,
+            total_expenses = ua.total_expenses + d.expenses,
+            balance = ua.balance + d.delta,
+            transaction_count = ua.transaction_count + d.tx_count,
+            updated_at = now()
+        FROM (
+            SELECT user_id,
+                   SUM(CASE WHEN amount > 0 THEN amount ELSE 0 END) AS income,
+                   SUM(CASE WHEN amount < 0 THEN ABS(amount) ELSE 0 END) AS expenses,
+                   SUM(amount) AS delta,
+                   COUNT(*) AS tx_count
+            FROM tx_stage GROUP BY user_id
+        ) d
+        WHERE ua.user_id = d.user_id;
+    """)
+    if missing_aggregates:
+        await rebuild_user_aggregates(cur, missing_aggregates)
+
+    # Re-score once per user.
+    await cur.execute(f"""
+        WITH scored AS (
+            SELECT user_id, {SCORE_SQL} AS new_score
+            FROM (
+                SELECT user_id, total_income AS inc, total_expenses AS exp, balance AS bal, credit_limit AS lim
+                FROM UserAggregates
+                WHERE user_id IN (SELECT DISTINCT user_id FROM tx_stage)
+            ) agg
+        ),
+        upd AS (
+            UPDATE CreditScores cs SET score = scored.new_score, report_date = CURRENT_DATE
+            FROM scored WHERE cs.user_id = scored.user_id
+        ),
+        ins AS (
+            INSERT INTO CreditScores (id, user_id, score, report_date)
+            SELECT 'cs_' || substr(md5(random()::text || user_id), 1, 8), user_id, new_score, CURRENT_DATE
+            FROM scored
+            WHERE NOT EXISTS (SELECT 1 FROM CreditScores cs WHERE cs.user_id = scored.user_id)
+        ),
+        history AS (
+            INSERT INTO CreditScoreHistory (user_id, score, source)
+            SELECT user_id, new_score, 'import'
+            FROM scored
+            WHERE new_score IS DISTINCT FROM (
+                SELECT cs.score FROM CreditScores cs
+                WHERE cs.user_id = scored.user_id
+                ORDER BY cs.report_date DESC LIMIT 1
+            )
+        )
+        SELECT u.email, scored.new_score FROM scored JOIN Users u ON u.id = scored.user_id;
+    """)
+    scores = {email: score for email, score in await cur.fetchall()}
+
+    return {"inserted": inserted, "duplicates": duplicates, "users": len(scores), "scores": scores}
+
+
+async def iter_ndjson_chunks(stream, chunk_size: int):
+    """Splits an async byte stream of NDJSON into lists of at most `chunk_size` raw lines."""
+    buffer = b""
+    chunk: List[bytes] = []
+    async for piece in stream:
+        buffer += piece
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                chunk.append(line)
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+    if buffer.strip():
+        chunk.append(buffer)
+    if chunk:
+        yield chunk
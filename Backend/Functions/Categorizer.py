@@ -0,0 +1,451 @@
+"""
+Local transaction categorizer.
+
+Re-categorizing every user's transactions scans the whole table, so it is not
+an API route (POST /transactions/recategorize only takes one user). Run it here:
+
+    python -m Functions.Categorizer recategorize                   # everyone
+    python -m Functions.Categorizer recategorize --email a@b.com   # one user
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import re
+import sys
+import time
+import zlib
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from Functions.AnalysisCache import invalidate_analysis
+from Functions.Database import async_autocommit, async_server_cursor, async_transaction, open_pool, close_pool
+from Functions.HotCache import lookup_user
+from Functions.MonthlyRollups import ROLLUP_UPSERT_SQL
+
+# ── Local transaction categorizer ───────────────────────────────
+# Multinomial naive Bayes over hashed features: description words, word pairs
+# and character trigrams (so "UBER *TRIP 8841" still looks like "uber ride"),
+# plus one sign/magnitude bucket of the amount. It starts from the seed phrases
+# below and learns from every category a user corrects (CategoryLabels), online
+# in this process and from the table again at startup. No model call involved.
+# Scoring a batch is one gather from the (features × categories) log-probability
+# table and one np.add.reduceat, so the same code path serves a single insert
+# and a re-categorization of every stored transaction.
+
+CATEGORIZER_HASH_BITS = int(os.getenv("CATEGORIZER_HASH_BITS", "16"))
+CATEGORIZER_MIN_CONFIDENCE = float(os.getenv("CATEGORIZER_MIN_CONFIDENCE", "0.6"))
+CATEGORIZER_BATCH = int(os.getenv("CATEGORIZER_BATCH", "5000"))
+LABEL_WEIGHT = 3.0  # a user's correction counts for this many seed phrases
+_ALPHA = 0.05  # additive smoothing
+# The trigrams of one word are far from independent, so raw naive-Bayes odds are
+# overconfident; scores are divided by this before the confidence threshold.
+_TEMPERATURE = 2.0
+
+# id → (name, kind). cat_001/cat_011 are the historical defaults and stay the fallbacks.
+CATEGORIES: Dict[str, Tuple[str, str]] = {
+    "cat_001": ("Salary", "income"),
+    "cat_002": ("Side Income", "income"),
+    "cat_003": ("Refunds & Interest", "income"),
+    "cat_004": ("Groceries", "expense"),
+    "cat_005": ("Dining Out", "expense"),
+    "cat_006": ("Rent & Housing", "expense"),
+    "cat_007": ("Utilities & Bills", "expense"),
+    "cat_008": ("Transport", "expense"),
+    "cat_009": ("Entertainment & Subscriptions", "expense"),
+    "cat_010": ("Shopping", "expense"),
+    "cat_011": ("Other Expense", "expense"),
+    "cat_012": ("Health", "expense"),
+    "cat_013": ("Education", "expense"),
+    "cat_014": ("Travel", "expense"),
+}
+FALLBACK = {"income": "cat_001", "expense": "cat_011"}
+
+SEED_EXAMPLES: Dict[str, Tuple[str, ...]] = {
+    "cat_001": ("salary", "paycheck", "payroll", "monthly pay", "wages", "direct deposit payroll", "employer payment",
+                "salary credit", "pay day", "stipend", "bonus"),
+    "cat_002": ("freelance payment", "client invoice paid", "consulting fee", "upwork", "fiverr payout", "side gig",
+                "tutoring income", "etsy sale", "sold on ebay", "commission", "rental income", "dividend"),
+    "cat_003": ("refund", "cashback", "interest earned", "savings interest", "reimbursement", "tax refund",
+                "return credit", "chargeback", "gift from family", "transfer from savings"),
+    "cat_004": ("groceries", "supermarket", "walmart grocery", "costco", "aldi", "lidl", "kroger", "whole foods",
+                "trader joes", "tesco", "carrefour", "safeway", "market", "vegetables", "bakery", "butcher"),
+    "cat_005": ("restaurant", "dinner out", "lunch", "coffee", "starbucks", "mcdonalds", "kfc", "pizza", "burger king",
+                "doordash", "uber eats", "grubhub", "cafe", "takeaway", "subway sandwich", "chipotle", "bar tab"),
+    "cat_006": ("rent", "monthly rent", "mortgage", "landlord", "apartment rent", "hoa fee", "property tax",
+                "home insurance", "furniture", "home repair", "plumber"),
+    "cat_007": ("electricity bill", "water bill", "gas bill", "internet", "phone bill", "mobile plan", "utility",
+                "verizon", "at&t", "comcast", "broadband", "power company", "insurance premium"),
+    "cat_008": ("uber ride", "lyft", "taxi", "bus fare", "metro card", "train ticket", "fuel", "gas station", "shell",
+                "petrol", "parking", "toll", "car repair", "car insurance", "subway pass"),
+    "cat_009": ("netflix", "spotify", "hulu", "disney plus", "youtube premium", "cinema", "movie tickets", "concert",
+                "steam games", "playstation", "xbox", "subscription", "gym membership", "apple music", "twitch"),
+    "cat_010": ("amazon", "shopping", "clothes", "shoes", "zara", "h&m", "target", "best buy", "electronics", "ikea",
+                "online order", "mall", "gift", "nike", "aliexpress", "shein"),
+    "cat_011": ("misc", "other", "atm withdrawal", "cash withdrawal", "bank fee", "service charge", "donation",
+                "charity", "fine", "transfer to friend"),
+    "cat_012": ("pharmacy", "doctor", "dentist", "hospital", "clinic", "medicine", "cvs", "walgreens", "health insurance",
+                "optician", "therapy session", "lab test"),
+    "cat_013": ("tuition", "school fees", "university", "course", "udemy", "coursera", "books", "textbook",
+                "exam fee", "student loan", "school supplies"),
+    "cat_014": ("flight", "airline", "hotel", "airbnb", "booking com", "expedia", "vacation", "travel insurance",
+                "car rental", "hostel", "visa fee"),
+}
+
+_IDS = list(CATEGORIES)
+_INDEX = {cid: i for i, cid in enumerate(_IDS)}
+_IS_INCOME = np.array([CATEGORIES[cid][1] == "income" for cid in _IDS])
+_FALLBACK_INDEX = {kind: _INDEX[cid] for kind, cid in FALLBACK.items()}
+
+_TEXT_FEATURES = 1 << CATEGORIZER_HASH_BITS
+_AMOUNT_BUCKETS = 21  # log2 magnitude buckets per sign, the last one open-ended
+_PAD = _TEXT_FEATURES + 2 * _AMOUNT_BUCKETS
+_WORD = re.compile(r"[a-z&]+")
+
+_stats: Dict[str, Any] = {
+    "predictions": 0, "predict_ms_total": 0.0, "fallbacks": 0, "labels_learned": 0,
+    "recategorize_runs": 0, "last_recategorize": None,
+}
+
+
+@lru_cache(maxsize=65536)
+def _text_features(normalized: str) -> Tuple[int, ...]:
+    """Hashed word, word-pair and character-trigram features of space-joined words."""
+    words = normalized.split()
+    tokens = [f"w:{w}" for w in words]
+    tokens += [f"b:{a} {b}" for a, b in zip(words, words[1:])]
+    for w in words:
+        padded = f"<{w}>"
+        tokens += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+    return tuple(zlib.crc32(t.encode("utf-8")) & (_TEXT_FEATURES - 1) for t in tokens)
+
+
+def _distinct_features(descriptions: Sequence[Optional[str]]) -> Tuple[List[Tuple[int, ...]], np.ndarray]:
+    """
+    Hashed features of each distinct description, and every input's position in
+    that list. Keyed on the words alone, so "UBER TRIP 8841" and "Uber trip 1172"
+    are one entry — statements repeat the same merchants over and over.
+    """
+    distinct: Dict[str, int] = {}
+    keys = (" ".join(_WORD.findall(d.lower())) if d else "" for d in descriptions)
+    position = np.fromiter((distinct.setdefault(k, len(distinct)) for k in keys), dtype=np.int64, count=len(descriptions))
+    return [_text_features(k) for k in distinct], position
+
+
+def _flatten(features: List[Tuple[int, ...]], pad: bool = False) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Feature tuples as flat (indices, offsets, lengths); `pad` closes every row with the all-zero _PAD row."""
+    lengths = np.fromiter((len(f) + pad for f in features), dtype=np.int64, count=len(features))
+    offsets = np.zeros(len(features), dtype=np.int64)
+    np.cumsum(lengths[:-1], out=offsets[1:])
+    rows = (f + (_PAD,) for f in features) if pad else features
+    indices = np.fromiter(itertools.chain.from_iterable(rows), dtype=np.int64, count=int(lengths.sum()))
+    return indices, offsets, lengths
+
+
+def _amount_features(amounts: np.ndarray) -> np.ndarray:
+    magnitude = np.minimum(np.log2(np.abs(amounts) + 1).astype(np.int64), _AMOUNT_BUCKETS - 1)
+    return _TEXT_FEATURES + (amounts > 0) * _AMOUNT_BUCKETS + magnitude
+
+
+class CategoryModel:
+    """Naive Bayes counts plus the log-probability table they imply, kept in step."""
+
+    def __init__(self):
+        features = _TEXT_FEATURES + 2 * _AMOUNT_BUCKETS
+        self.counts = np.zeros((features, len(_IDS)))
+        self.totals = np.zeros(len(_IDS))
+        # One extra all-zero row (_PAD) so no feature row is ever empty.
+        self.log_prob = np.zeros((features + 1, len(_IDS)), dtype=np.float32)
+        self._refresh(np.arange(len(_IDS)))
+
+    def _refresh(self, classes: np.ndarray):
+        smoothed = self.counts[:, classes] + _ALPHA
+        self.log_prob[:-1, classes] = np.log(smoothed / (self.totals[classes] + _ALPHA * len(self.counts)))
+
+    def learn(self, descriptions: Sequence[Optional[str]], amounts: Optional[np.ndarray], classes: np.ndarray, weight: float = 1.0):
+        """Adds the rows' features to their classes; a negative weight takes a label back."""
+        features, position = _distinct_features(descriptions)
+        indices, offsets, lengths = _flatten(features)
+        # Expand each input to its distinct row's features.
+        row_lengths = lengths[position]
+        starts = np.repeat(offsets[position] - (np.cumsum(row_lengths) - row_lengths), row_lengths)
+        feature_idx = indices[starts + np.arange(int(row_lengths.sum()))]
+        feature_cls = np.repeat(classes, row_lengths)
+        if amounts is not None:
+            feature_idx = np.concatenate([feature_idx, _amount_features(amounts)])
+            feature_cls = np.concatenate([feature_cls, classes])
+        np.add.at(self.counts, (feature_idx, feature_cls), weight)
+        np.add.at(self.totals, feature_cls, weight)
+        self._refresh(np.unique(classes))
+
+    def scores(self, descriptions: Sequence[Optional[str]], amounts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(rows × categories) log-likelihoods with a uniform prior, and which rows had any words."""
+        features, position = _distinct_features(descriptions)
+        indices, offsets, lengths = _flatten(features, pad=True)
+        text_scores = np.add.reduceat(self.log_prob[indices], offsets, axis=0)
+        return text_scores[position] + self.log_prob[_amount_features(amounts)], (lengths > 1)[position]
+
+
+def _seed_model() -> CategoryModel:
+    model = CategoryModel()
+    pairs = [(cid, text) for cid, texts in SEED_EXAMPLES.items() for text in texts]
+    # Seeds carry no amount, so the amount buckets are learned from labels only.
+    model.learn([text for _, text in pairs], None, np.array([_INDEX[cid] for cid, _ in pairs]))
+    return model
+
+
+_model = _seed_model()
+
+
+def predict_categories(descriptions: Sequence[Optional[str]], amounts: Sequence[float]) -> Tuple[List[str], np.ndarray]:
+    """
+    Category ids and confidences for signed amounts (positive = income). Only
+    categories of the matching kind are considered; rows without usable text or
+    below CATEGORIZER_MIN_CONFIDENCE get the kind's fallback category.
+    """
+    started = time.perf_counter()
+    amounts = np.asarray(amounts, dtype=np.float64)
+    if not len(amounts):
+        return [], np.zeros(0)
+    scores, has_text = _model.scores(descriptions, amounts)
+
+    income = amounts > 0
+    scores[np.ix_(income, ~_IS_INCOME)] = -np.inf
+    scores[np.ix_(~income, _IS_INCOME)] = -np.inf
+    scores -= scores.max(axis=1, keepdims=True)
+    probs = np.exp(scores / _TEMPERATURE)
+    best = probs.argmax(axis=1)
+    confidence = probs[np.arange(len(best)), best] / probs.sum(axis=1)
+
+    fallback = ~has_text | (confidence < CATEGORIZER_MIN_CONFIDENCE)
+    best[fallback] = np.where(income[fallback], _FALLBACK_INDEX["income"], _FALLBACK_INDEX["expense"])
+    _stats["predictions"] += len(best)
+    _stats["fallbacks"] += int(fallback.sum())
+    _stats["predict_ms_total"] += (time.perf_counter() - started) * 1000
+    return [_IDS[i] for i in best.tolist()], confidence
+
+
+def predict_category(description: Optional[str], amount: float) -> Tuple[str, str]:
+    """(category_id, category_name) for one signed amount."""
+    (category_id,), _ = predict_categories([description], [amount])
+    return category_id, CATEGORIES[category_id][0]
+
+
+def learn_labels(labels: Sequence[Tuple[Optional[str], float, str]], weight: float = LABEL_WEIGHT) -> int:
+    """Trains on (description, signed amount, category_id) rows; rows outside the catalog are skipped."""
+    labels = [label for label in labels if label[2] in _INDEX]
+    if labels:
+        amounts = np.array([float(a) for _, a, _ in labels])
+        _model.learn([d for d, _, _ in labels], amounts, np.array([_INDEX[c] for _, _, c in labels]), weight)
+    return len(labels)
+
+
+# ── Storage ─────────────────────────────────────────────────────
+async def init_categorizer(cur):
+    """Seeds the catalog categories, adds Transactions.category_source and the CategoryLabels table."""
+    await cur.executemany(
+        "INSERT INTO Categories (id, name) VALUES (%s, %s) ON CONFLICT (id) DO NOTHING;",
+        [(cid, name) for cid, (name, _) in CATEGORIES.items()],
+    )
+    # 'client' (sent with the transaction), 'model' (predicted) or 'label' (corrected by the user);
+    # NULL for rows written before the categorizer existed.
+    await cur.execute("ALTER TABLE Transactions ADD COLUMN IF NOT EXISTS category_source TEXT;")
+    await cur.execute("""
+        CREATE TABLE IF NOT EXISTS CategoryLabels (
+            transaction_id TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            description TEXT,
+            amount NUMERIC(12, 2) NOT NULL,
+            category_id TEXT NOT NULL,
+            labeled_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+    """)
+
+
+async def load_category_labels(cur):
+    """Trains the in-memory model on every stored correction."""
+    await cur.execute("SELECT description, amount, category_id FROM CategoryLabels;")
+    learned = learn_labels(await cur.fetchall())
+    _stats["labels_learned"] += learned
+    if learned:
+        print(f"🏷️ Categorizer trained on {learned} user correction(s).")
+
+
+async def label_transaction(email: str, transaction_id: str, category_id: str) -> Optional[str]:
+    """
+    Sets a transaction's category as the user chose it (moving its amount between
+    MonthlyRollups rows), records the correction and learns from it. Returns the category name, or None if the user has no
+    such transaction. Raises ValueError for an unknown category.
+    """
+    async with async_autocommit() as cur:
+        user = await lookup_user(email, cur)
+        if user is None:
+            return None
+        await cur.execute(f"""
+            WITH tx AS (
+                SELECT id, user_id, description, amount, transaction_date, category_id
+                FROM Transactions
+                WHERE id = %(tx_id)s AND user_id = %(user_id)s
+            ),
+            cat AS (
+                SELECT id, name FROM Categories WHERE id = %(category_id)s
+            ),
+            upd AS (
+                UPDATE Transactions t SET category_id = cat.id, category_source = 'label'
+                FROM tx, cat
+                WHERE t.id = tx.id AND t.transaction_date = tx.transaction_date
+            ),
+            moved AS (
+                INSERT INTO MonthlyRollups (user_id, month, category_id, income, expenses, tx_count)
+                SELECT tx.user_id, date_trunc('month', tx.transaction_date)::date, m.category_id,
+                       SUM(m.sign * GREATEST(tx.amount, 0)), SUM(m.sign * GREATEST(-tx.amount, 0)), SUM(m.sign)
+                FROM tx CROSS JOIN cat
+                CROSS JOIN LATERAL (VALUES (COALESCE(tx.category_id, ''), -1), (cat.id, 1)) m(category_id, sign)
+                GROUP BY 1, 2, 3
+                {ROLLUP_UPSERT_SQL}
+            ),
+            lbl AS (
+                INSERT INTO CategoryLabels (transaction_id, user_id, description, amount, category_id)
+                SELECT tx.id, tx.user_id, tx.description, tx.amount, cat.id FROM tx, cat
+                ON CONFLICT (transaction_id) DO UPDATE
+                SET category_id = EXCLUDED.category_id, labeled_at = now()
+            )
+            SELECT tx.description, tx.amount, (SELECT name FROM cat),
+                   (SELECT category_id FROM CategoryLabels WHERE transaction_id = tx.id)
+            FROM tx;
+        """, {"tx_id": transaction_id, "user_id": user[0], "category_id": category_id})
+        row = await cur.fetchone()
+    if row is None:
+        return None
+    description, amount, name, previous = row
+    if name is None:
+        raise ValueError(f"Unknown category: {category_id}")
+    if previous is not None:
+        learn_labels([(description, amount, previous)], weight=-LABEL_WEIGHT)
+    _stats["labels_learned"] += learn_labels([(description, amount, category_id)])
+    invalidate_analysis(email)
+    return name
+
+
+# ── Batch re-categorization ─────────────────────────────────────
+# Covers rows the model categorized, and legacy rows that still hold a
+# fallback category. Anything the client chose or the user corrected is left
+# alone; the UPDATE re-checks the category it read, so a correction landing
+# mid-run is not overwritten.
+_ELIGIBLE_SQL = f"""
+    (t.category_source = 'model'
+     OR (t.category_source IS NULL AND t.category_id IN ('{FALLBACK["income"]}', '{FALLBACK["expense"]}')))
+"""
+
+
+async def _apply_categories(changed: List[Tuple[str, date, str, str]]) -> List[str]:
+    """
+    Writes (transaction id, date, new category, category read) rows and moves their
+    amounts between MonthlyRollups rows; returns the emails touched. The date
+    completes the primary key, so each row is one index probe in its own partition.
+    """
+    async with async_transaction() as cur:
+        await cur.execute("""
+            CREATE TEMP TABLE recategorized (id TEXT, transaction_date DATE, category_id TEXT, previous TEXT) ON COMMIT DROP;
+        """)
+        async with cur.copy("COPY recategorized FROM STDIN") as copy:
+            for row in changed:
+                await copy.write_row(row)
+        await cur.execute(f"""
+            WITH upd AS (
+                UPDATE Transactions t SET category_id = r.category_id, category_source = 'model'
+                FROM recategorized r
+                WHERE t.id = r.id AND t.transaction_date = r.transaction_date AND t.category_id = r.previous
+                  AND t.category_source IS DISTINCT FROM 'label'
+                RETURNING t.user_id, t.transaction_date, t.amount, r.previous, r.category_id
+            ),
+            moved AS (
+                INSERT INTO MonthlyRollups (user_id, month, category_id, income, expenses, tx_count)
+                SELECT upd.user_id, date_trunc('month', upd.transaction_date)::date, m.category_id,
+                       SUM(m.sign * GREATEST(upd.amount, 0)), SUM(m.sign * GREATEST(-upd.amount, 0)), SUM(m.sign)
+                FROM upd
+                CROSS JOIN LATERAL (VALUES (upd.previous, -1), (upd.category_id, 1)) m(category_id, sign)
+                GROUP BY 1, 2, 3
+                {ROLLUP_UPSERT_SQL}
+            )
+            SELECT u.email FROM Users u WHERE u.id IN (SELECT user_id FROM upd);
+        """)
+        return [row[0] for row in await cur.fetchall()]
+
+
+async def recategorize_transactions(email: Optional[str] = None) -> Dict[str, Any]:
+    """Re-runs the model over eligible transactions (one user's, or everyone's) in CATEGORIZER_BATCH chunks."""
+    started = time.perf_counter()
+    scanned = changed = 0
+    predict_ms = 0.0
+    emails = set()
+    user = await lookup_user(email) if email else None
+    async with async_server_cursor("recategorize", itersize=CATEGORIZER_BATCH) as cur:
+        await cur.execute(f"""
+            SELECT t.id, t.description, t.amount, t.category_id, t.transaction_date
+            FROM Transactions t
+            WHERE {"t.user_id = %(user_id)s AND" if email else ""} {_ELIGIBLE_SQL};
+        """, {"user_id": user[0] if user else None})
+        while rows := await cur.fetchmany(CATEGORIZER_BATCH):
+            scanned += len(rows)
+            mark = time.perf_counter()
+            predicted, _ = await asyncio.to_thread(
+                predict_categories, [r[1] for r in rows], [float(r[2]) for r in rows]
+            )
+            predict_ms += (time.perf_counter() - mark) * 1000
+            updates = [(r[0], r[4], new, r[3]) for r, new in zip(rows, predicted) if new != r[3]]
+            if updates:
+                changed += len(updates)
+                emails.update(await _apply_categories(updates))
+
+    for touched in emails:
+        invalidate_analysis(touched)
+    result = {
+        "scanned": scanned,
+        "changed": changed,
+        "users": len(emails),
+        "ms": {"predict": round(predict_ms, 1), "total": round((time.perf_counter() - started) * 1000, 1)},
+    }
+    _stats["recategorize_runs"] += 1
+    _stats["last_recategorize"] = {**result, "finished_at": datetime.now().isoformat(timespec="seconds")}
+    return result
+
+
+def list_categories() -> List[Dict[str, str]]:
+    return [{"id": cid, "name": name, "kind": kind} for cid, (name, kind) in CATEGORIES.items()]
+
+
+def get_categorizer_stats() -> Dict[str, Any]:
+    stats = dict(_stats)
+    total_ms = stats.pop("predict_ms_total")
+    stats["predict_us_per_row"] = round(total_ms * 1000 / stats["predictions"], 2) if stats["predictions"] else None
+    stats["description_cache"] = _text_features.cache_info()._asdict()
+    return stats
+
+
+async def _main(email: Optional[str]) -> int:
+    await open_pool()
+    try:
+        async with async_autocommit() as cur:
+            await load_category_labels(cur)
+        result = await recategorize_transactions(email)
+        print(f"🏷️ Re-categorized {result['changed']} of {result['scanned']} transaction(s) "
+              f"for {result['users']} user(s) in {result['ms']['total'] / 1000:.1f} s.")
+        return 0
+    finally:
+        await close_pool()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("recategorize",))
+    parser.add_argument("--email", help="only this user's transactions (default: everyone's)")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(_main(args.email)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import hashlib
+import os
+import random
+import re
+import time
+from collections import OrderedDict
+from itertools import count
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+# ── Similarity cache for chat answers ───────────────────────────
+# Near-duplicate questions ("how do I improve my credit score?" / "how can I
+# improve my credit score") asked in the same context get the stored answer
+# instead of a model call. Questions are normalized to word uni+bigrams;
+# MinHash + LSH banding finds candidates in O(1), and the exact Jaccard
+# similarity of the candidate's shingles decides a hit (>= CHAT_CACHE_THRESHOLD).
+#
+# Every entry lives in a scope, and lookups only match within it:
+#   bucket:…  answers that used none of the user's data, shared by everyone whose
+#             snapshot falls in the same utilization / income-ratio / score bands;
+#   user:…    answers built from the user's own numbers (the model called a tool),
+#             visible to that user only and dropped when their data changes.
+# Entries are LRU-evicted beyond CHAT_CACHE_SIZE and expire after CHAT_CACHE_TTL_S.
+
+CHAT_CACHE_SIZE = int(os.getenv("CHAT_CACHE_SIZE", "2000"))
+CHAT_CACHE_TTL_S = float(os.getenv("CHAT_CACHE_TTL_S", "86400"))
+CHAT_CACHE_THRESHOLD = float(os.getenv("CHAT_CACHE_THRESHOLD", "0.8"))
+
+_NUM_HASHES = 64
+_BANDS = 16  # 16 bands × 4 rows: ~0.8 Jaccard pairs collide in a band with high probability
+_ROWS = _NUM_HASHES // _BANDS
+_PRIME = (1 << 61) - 1
+_rng = random.Random(1729)
+_COEFFS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(_NUM_HASHES)]
+
+_STOPWORDS = frozenset(
+    "a an the is are am was were be been to of for in on at and or i me my mine you your it its this that "
+    "do does did can could should would will please any some with about just really so im s".split()
+)
+_SYNONYMS = {"okay": "ok", "alright": "ok", "improving": "improve", "improved": "improve", "raise": "increase",
+             "boost": "increase", "lower": "reduce", "decrease": "reduce", "cc": "card", "util": "utilization"}
+
+
+class _Entry:
+    __slots__ = ("id", "scope", "question", "shingles", "signature", "answer", "tokens", "created", "hits")
+
+    def __init__(self, entry_id, scope, question, shingles, signature, answer, tokens):
+        self.id = entry_id
+        self.scope = scope
+        self.question = question
+        self.shingles = shingles
+        self.signature = signature
+        self.answer = answer
+        self.tokens = tokens
+        self.created = time.monotonic()
+        self.hits = 0
+
+
+_entries: "OrderedDict[int, _Entry]" = OrderedDict()
+_bands: Dict[Tuple[str, int, Tuple[int, ...]], set] = {}
+_ids = count(1)
+_stats = {"lookups": 0, "hits": 0, "user_hits": 0, "bucket_hits": 0, "stores": 0, "evictions": 0, "tokens_saved": 0}
+
+
+# ── Text → shingles → signature ─────────────────────────────────
+def _stem(word: str) -> str:
+    word = _SYNONYMS.get(word, word)
+    for suffix in ("ing", "ed", "s"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3 and not word.endswith("ss"):
+            return _SYNONYMS.get(word[: -len(suffix)], word[: -len(suffix)])
+    return word
+
+
+def shingles(text: str) -> FrozenSet[str]:
+    """Normalized word unigrams and bigrams of `text`."""
+    words = [_stem(w) for w in re.findall(r"[a-z0-9%]+", text.lower()) if w not in _STOPWORDS]
+    return frozenset(words + [f"{a} {b}" for a, b in zip(words, words[1:])])
+
+
+def _signature(items: FrozenSet[str]) -> Tuple[int, ...]:
+    hashed = [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big") for s in items]
+    return tuple(min((a * h + b) % _PRIME for h in hashed) for a, b in _COEFFS)
+
+
+def _band_keys(scope: str, signature: Tuple[int, ...]):
+    for band in range(_BANDS):
+        yield scope, band, signature[band * _ROWS:(band + 1) * _ROWS]
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+# ── Context scopes ──────────────────────────────────────────────
+def _band(value: Optional[float], edges: Tuple[float, ...], labels: Tuple[str, ...]) -> str:
+    if value is None:
+        return "none"
+    for edge, label in zip(edges, labels):
+        if value < edge:
+            return label
+    return labels[-1]
+
+
+def context_bucket(db_info: Optional[Dict[str, Any]]) -> str:
+    """Coarse snapshot key: utilization band, expense/income ratio band and score range."""
+    if not db_info or "error" in db_info:
+        return "bucket:anon"
+    limit, income, expenses = db_info.get("credit_limit") or 0, db_info.get("income") or 0, db_info.get("expenses") or 0
+    utilization = db_info.get("utilization_percent") if limit > 0 else None
+    ratio = expenses / income if income > 0 else None
+    return "bucket:" + "/".join((
+        "util-" + _band(utilization, (10, 30, 50, 75), ("lt10", "10-30", "30-50", "50-75", "75+")),
+        "spend-" + _band(ratio, (0.5, 0.8, 1.0), ("lt50", "50-80", "80-100", "over")),
+        "score-" + _band(db_info.get("credit_score"), (580, 670, 740, 800), ("poor", "fair", "good", "very-good", "excellent")),
+    ))
+
+
+def user_scope(email: str, generation: int) -> str:
+    return f"user:{email}:{generation}"
+
+
+# ── Lookup / store ──────────────────────────────────────────────
+def _drop(entry: _Entry):
+    _entries.pop(entry.id, None)
+    for key in _band_keys(entry.scope, entry.signature):
+        members = _bands.get(key)
+        if members is not None:
+            members.discard(entry.id)
+            if not members:
+                del _bands[key]
+
+
+def lookup_answer(question: str, scopes: List[str]) -> Optional[Dict[str, Any]]:
+    """
+    The best cached answer for `question` within the first scope that has one, as
+    {"reply", "provenance"}, or None on a miss.
+    """
+    _stats["lookups"] += 1
+    items = shingles(question)
+    if not items:
+        return None
+    signature = _signature(items)
+    now = time.monotonic()
+    for scope in scopes:
+        best, best_score = None, 0.0
+        candidates = set().union(*(_bands.get(key, ()) for key in _band_keys(scope, signature)))
+        for entry_id in candidates:
+            entry = _entries.get(entry_id)
+            if entry is None:
+                continue
+            if now - entry.created > CHAT_CACHE_TTL_S:
+                _drop(entry)
+                continue
+            score = jaccard(items, entry.shingles)
+            if score > best_score:
+                best, best_score = entry, score
+        if best is not None and best_score >= CHAT_CACHE_THRESHOLD:
+            best.hits += 1
+            _entries.move_to_end(best.id)
+            kind = scope.split(":", 1)[0]
+            _stats["hits"] += 1
+            _stats[f"{kind}_hits"] += 1
+            _stats["tokens_saved"] += best.tokens
+            return {
+                "reply": best.answer,
+                "provenance": {
+                    "entry_id": best.id,
+                    "scope": kind,
+                    "similarity": round(best_score, 3),
+                    "age_s": round(now - best.created, 1),
+                    "hits": best.hits,
+                    # Another user's wording is never echoed back.
+                    "matched_question": best.question if kind == "user" else None,
+                },
+            }
+    return None
+
+
+def store_answer(question: str, answer: str, scope: str, tokens: int):
+    """Caches `answer` for `question` in `scope`; `tokens` is what a future hit saves."""
+    items = shingles(question)
+    if not items or not answer:
+        return
+    entry = _Entry(next(_ids), scope, question, items, _signature(items), answer, tokens)
+    _entries[entry.id] = entry
+    for key in _band_keys(scope, entry.signature):
+        _bands.setdefault(key, set()).add(entry.id)
+    _stats["stores"] += 1
+    while len(_entries) > CHAT_CACHE_SIZE:
+        _drop(next(iter(_entries.values())))
+        _stats["evictions"] += 1
+
+
+def get_chat_cache_stats() -> Dict[str, Any]:
+    stats = dict(_stats)
+    stats["hit_rate"] = round(stats["hits"] / stats["lookups"], 3) if stats["lookups"] else 0.0
+    stats["size"] = len(_entries)
+    stats["max_size"] = CHAT_CACHE_SIZE
+    stats["threshold"] = CHAT_CACHE_THRESHOLD
+    return stats
@@ -0,0 +1,222 @@
+import asyncio
+import json
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from uuid import uuid4
+
+from Functions.Database import async_autocommit
+from Functions.HotCache import lookup_user
+
+# ── Server-side chat sessions ───────────────────────────────────
+# A session keeps its newest messages verbatim and folds older ones into a
+# rolling summary, so the history sent with each prompt has a fixed ceiling
+# instead of growing with the conversation:
+#   * history_contents() never returns more than CHAT_HISTORY_TOKEN_BUDGET,
+#     newest messages first, whatever state the session is in;
+#   * after a reply, plan_compaction() says how many of the oldest messages to
+#     fold into the summary, and compact_session() does it off the request path.
+# Token counts are estimated (~4 characters per token); no tokenizer round trip.
+
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "1000"))
+CHAT_RECENT_MESSAGES = int(os.getenv("CHAT_RECENT_MESSAGES", "8"))
+CHAT_SUMMARY_MAX_TOKENS = int(os.getenv("CHAT_SUMMARY_MAX_TOKENS", "250"))
+CHAT_SESSION_TTL_DAYS = int(os.getenv("CHAT_SESSION_TTL_DAYS", "30"))
+
+_SUMMARY_PREFIX = "Summary of our conversation so far:\n"
+_background = set()
+_stats = {"sessions_created": 0, "turns": 0, "compactions": 0, "summary_fallbacks": 0, "compaction_conflicts": 0}
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+def clip_summary(summary: str) -> str:
+    """Keeps the newest part of a summary that fits CHAT_SUMMARY_MAX_TOKENS."""
+    limit = CHAT_SUMMARY_MAX_TOKENS * 4
+    return summary if len(summary) <= limit else summary[-limit:]
+
+
+# ── Prompt assembly and compaction planning (pure) ──────────────
+def history_contents(session: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    The session as Gemini contents plus its estimated token count, which never
+    exceeds CHAT_HISTORY_TOKEN_BUDGET: the summary first, then as many of the
+    newest messages as fit.
+    """
+    contents: List[Dict[str, Any]] = []
+    used = 0
+    summary = clip_summary(session.get("summary") or "")
+    if summary:
+        used = estimate_tokens(_SUMMARY_PREFIX + summary)
+        contents = [
+            {"role": "user", "parts": [_SUMMARY_PREFIX + summary]},
+            {"role": "model", "parts": ["Got it."]},
+        ]
+
+    recent: List[Dict[str, Any]] = []
+    for message in reversed(session.get("recent") or []):
+        cost = estimate_tokens(message["text"])
+        if used + cost > CHAT_HISTORY_TOKEN_BUDGET:
+            break
+        recent.append(message)
+        used += cost
+    recent.reverse()
+    # History must resume on a user turn.
+    while recent and recent[0]["role"] != "user":
+        used -= estimate_tokens(recent.pop(0)["text"])
+    contents += [{"role": m["role"], "parts": [m["text"]]} for m in recent]
+    return contents, used
+
+
+def plan_compaction(session: Dict[str, Any]) -> int:
+    """How many of the oldest messages to fold into the summary (always whole exchanges)."""
+    recent = session.get("recent") or []
+    room = CHAT_HISTORY_TOKEN_BUDGET - CHAT_SUMMARY_MAX_TOKENS
+    fold = 0
+    while len(recent) - fold > CHAT_RECENT_MESSAGES or sum(estimate_tokens(m["text"]) for m in recent[fold:]) > room:
+        fold += 2
+        if fold >= len(recent):
+            return len(recent)
+    return fold
+
+
+def fallback_summary(summary: str, folded: List[Dict[str, Any]]) -> str:
+    """Model-free summary: each folded message shortened to one line."""
+    lines = [f"- {m['role']}: {m['text'][:160]}" for m in folded]
+    return clip_summary("\n".join(filter(None, [summary] + lines)))
+
+
+# ── Storage ─────────────────────────────────────────────────────
+async def init_chat_sessions_table(cur):
+    """Creates the ChatSessions table."""
+    await cur.execute("""
+        CREATE TABLE IF NOT EXISTS ChatSessions (
+            id TEXT PRIMARY KEY,
+            user_email TEXT NOT NULL,
+            summary TEXT NOT NULL DEFAULT '',
+            recent JSONB NOT NULL DEFAULT '[]',
+            compacted INT NOT NULL DEFAULT 0,
+            turns INT NOT NULL DEFAULT 0,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+    """)
+    await cur.execute("""
+        CREATE INDEX IF NOT EXISTS chat_sessions_user_updated_idx
+        ON ChatSessions (user_email, updated_at);
+    """)
+
+
+def _session_dict(row) -> Dict[str, Any]:
+    return dict(zip(("id", "summary", "recent", "compacted", "turns"), row))
+
+
+async def open_session(email: str, session_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Returns the user's session `session_id`, or a new empty session when it is
+    missing, expired or belongs to someone else. Returns None if the user does
+    not exist.
+    """
+    async with async_autocommit() as cur:
+        if await lookup_user(email, cur) is None:
+            return None
+        if session_id:
+            await cur.execute("""
+                SELECT id, summary, recent, compacted, turns FROM ChatSessions
+                WHERE id = %s AND user_email = %s
+                  AND updated_at >= now() - make_interval(days => %s);
+            """, (session_id, email, CHAT_SESSION_TTL_DAYS))
+            row = await cur.fetchone()
+            if row:
+                return _session_dict(row)
+
+        # New session; expired ones of the same user are cleared on the way.
+        await cur.execute("""
+            WITH expired AS (
+                DELETE FROM ChatSessions
+                WHERE user_email = %(email)s AND updated_at < now() - make_interval(days => %(ttl)s)
+            )
+            INSERT INTO ChatSessions (id, user_email) VALUES (%(id)s, %(email)s)
+            RETURNING id, summary, recent, compacted, turns;
+        """, {"id": str(uuid4()), "email": email, "ttl": CHAT_SESSION_TTL_DAYS})
+        _stats["sessions_created"] += 1
+        return _session_dict(await cur.fetchone())
+
+
+async def append_turn(session_id: str, message: str, reply: str) -> Dict[str, Any]:
+    """Appends one user/model exchange atomically and returns the updated session."""
+    turn = [{"role": "user", "text": message}, {"role": "model", "text": reply}]
+    async with async_autocommit() as cur:
+        await cur.execute("""
+            UPDATE ChatSessions
+            SET recent = recent || %s::jsonb, turns = turns + 1, updated_at = now()
+            WHERE id = %s
+            RETURNING id, summary, recent, compacted, turns;
+        """, (json.dumps(turn), session_id))
+        row = await cur.fetchone()
+    _stats["turns"] += 1
+    return _session_dict(row) if row else None
+
+
+async def compact_session(
+    session: Dict[str, Any],
+    summarize: Callable[[str, List[Dict[str, Any]]], Awaitable[str]],
+) -> bool:
+    """
+    Folds the oldest messages into the summary using `summarize(summary, messages)`,
+    falling back to fallback_summary() if it fails. The write is guarded on the
+    session's `compacted` counter, so two overlapping compactions can't both apply.
+    Returns True if the session changed.
+    """
+    fold = plan_compaction(session)
+    if not fold:
+        return False
+    folded = session["recent"][:fold]
+    try:
+        summary = clip_summary(await summarize(session["summary"], folded))
+        if not summary:
+            raise ValueError("empty summary")
+    except Exception as e:
+        print("⚠️ Chat summary failed, using a plain digest:", e)
+        _stats["summary_fallbacks"] += 1
+        summary = fallback_summary(session["summary"], folded)
+
+    async with async_autocommit() as cur:
+        await cur.execute("""
+            UPDATE ChatSessions
+            SET summary = %(summary)s,
+                recent = COALESCE((
+                    SELECT jsonb_agg(m ORDER BY i)
+                    FROM jsonb_array_elements(recent) WITH ORDINALITY AS r(m, i)
+                    WHERE i > %(fold)s
+                ), '[]'::jsonb),
+                compacted = compacted + %(fold)s
+            WHERE id = %(id)s AND compacted = %(compacted)s;
+        """, {"summary": summary, "fold": fold, "id": session["id"], "compacted": session["compacted"]})
+        changed = cur.rowcount == 1
+    _stats["compactions" if changed else "compaction_conflicts"] += 1
+    return changed
+
+
+def schedule_compaction(session: Optional[Dict[str, Any]], summarize: Callable[[str, List[Dict[str, Any]]], Awaitable[str]]):
+    """Runs compact_session() in the background when the session has outgrown its window."""
+    if session is None or not plan_compaction(session):
+        return
+    task = asyncio.create_task(_compact_quietly(session, summarize))
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+
+async def _compact_quietly(session, summarize):
+    try:
+        await compact_session(session, summarize)
+    except Exception as e:
+        print("⚠️ Could not compact chat session:", e)
+
+
+def get_chat_session_stats() -> Dict[str, Any]:
+    stats = dict(_stats)
+    stats["history_token_budget"] = CHAT_HISTORY_TOKEN_BUDGET
+    stats["recent_messages"] = CHAT_RECENT_MESSAGES
+    return stats
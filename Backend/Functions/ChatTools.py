@@ -0,0 +1,112 @@
+from typing import Any, Dict, List, Optional
+
+from Functions.Database import async_autocommit
+from Functions.HotCache import lookup_user
+from Functions.TransactionPages import fetch_transaction_page
+
+# ── Data tools the chat model can call ──────────────────────────
+# Each tool reads one slice of the signed-in user's data. The email is always
+# supplied by the server, never by the model, so a tool can only ever see the
+# user who is chatting. Arguments from the model are clamped to sane ranges.
+
+
+def _clamp(value: Any, default: int, low: int, high: int) -> int:
+    try:
+        return max(low, min(high, int(value)))
+    except (TypeError, ValueError):
+        return default
+
+
+async def get_recent_transactions(email: str, limit: Any = 10) -> List[Dict[str, Any]]:
+    """Newest transactions first (at most 50)."""
+    async with async_autocommit() as cur:
+        transactions, _ = await fetch_transaction_page(cur, email, limit=_clamp(limit, 10, 1, 50))
+    return transactions
+
+
+async def get_category_breakdown(email: str, days: Any = 90) -> List[Dict[str, Any]]:
+    """Spending and income per category over the last `days` days (at most a year)."""
+    async with async_autocommit() as cur:
+        user = await lookup_user(email, cur)
+        if user is None:
+            return []
+        await cur.execute("""
+            SELECT COALESCE(c.name, 'Other') AS category,
+                   SUM(CASE WHEN t.amount < 0 THEN -t.amount ELSE 0 END)::float8 AS spent,
+                   SUM(CASE WHEN t.amount > 0 THEN t.amount ELSE 0 END)::float8 AS received,
+                   COUNT(*) AS transactions
+            FROM Transactions t
+            LEFT JOIN Categories c ON c.id = t.category_id
+            WHERE t.user_id = %s AND t.transaction_date >= CURRENT_DATE - %s
+            GROUP BY 1
+            ORDER BY spent DESC;
+        """, (user[0], _clamp(days, 90, 1, 366)))
+        rows = await cur.fetchall()
+    return [{"category": r[0], "spent": r[1], "received": r[2], "transactions": r[3]} for r in rows]
+
+
+async def get_savings_challenges(email: str) -> List[Dict[str, Any]]:
+    async with async_autocommit() as cur:
+        await cur.execute("""
+            SELECT title, goal_amount::float8, progress::float8, start_date, end_date, COALESCE(completed, FALSE)
+            FROM savings_challenges
+            WHERE user_email = %s
+            ORDER BY id;
+        """, (email,))
+        rows = await cur.fetchall()
+    return [
+        {"title": r[0], "goal_amount": r[1], "progress": r[2], "start_date": r[3], "end_date": r[4], "completed": r[5]}
+        for r in rows
+    ]
+
+
+async def get_credit_score_history(email: str, limit: Any = 12) -> List[Dict[str, Any]]:
+    """Most recent credit score changes first (at most 100)."""
+    async with async_autocommit() as cur:
+        user = await lookup_user(email, cur)
+        if user is None:
+            return []
+        await cur.execute("""
+            SELECT score, recorded_at::date, source
+            FROM CreditScoreHistory
+            WHERE user_id = %s
+            ORDER BY recorded_at DESC
+            LIMIT %s;
+        """, (user[0], _clamp(limit, 12, 1, 100)))
+        rows = await cur.fetchall()
+    return [{"score": r[0], "date": r[1], "source": r[2]} for r in rows]
+
+
+def _declaration(name: str, description: str, properties: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    declaration = {"name": name, "description": description}
+    if properties:
+        declaration["parameters"] = {"type": "object", "properties": properties}
+    return declaration
+
+
+# Schemas the model sees. None of them take an email.
+TOOL_DECLARATIONS = [
+    _declaration(
+        "get_database_info",
+        "The user's totals: income, expenses, balance, credit limit, utilization percent and latest credit score.",
+    ),
+    _declaration(
+        "get_recent_transactions",
+        "The user's most recent transactions (amount, description, date, category), newest first.",
+        {"limit": {"type": "integer", "description": "How many transactions to return (1-50, default 10)."}},
+    ),
+    _declaration(
+        "get_category_breakdown",
+        "Total spent and received per category over a recent period.",
+        {"days": {"type": "integer", "description": "Look-back window in days (1-366, default 90)."}},
+    ),
+    _declaration(
+        "get_savings_challenges",
+        "The user's savings challenges with goal, progress, dates and completion.",
+    ),
+    _declaration(
+        "get_credit_score_history",
+        "The user's credit score changes over time, newest first, with what caused each one.",
+        {"limit": {"type": "integer", "description": "How many changes to return (1-100, default 12)."}},
+    ),
+]
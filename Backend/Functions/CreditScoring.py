@@ -0,0 +1,68 @@
+import numpy as np
+
+# ── Credit score rules ──────────────────────────────────────────
+# The one definition of the score. It is rendered two ways:
+#   score_sql()   a SQL expression, for writes that re-score inside their own
+#                 statement (POST /transactions/add, bulk ingest);
+#   score_batch() NumPy over whole columns, for re-scoring every user at once.
+# Both compare exact cents (utilization as expenses*100 >= limit*pct rather than
+# a divided ratio), so they agree on every boundary.
+
+BASE_SCORE = 700
+SCORE_MIN, SCORE_MAX = 300, 850
+# (utilization % of the credit limit at or above, points), highest band first.
+UTILIZATION_BANDS = ((80, -20), (40, -10))
+LOW_UTILIZATION_POINTS = 10
+OVERSPEND_POINTS = -10
+# Spending under this share of income earns SAVER_POINTS.
+SAVER_EXPENSE_PCT = 50
+SAVER_POINTS = 10
+POSITIVE_BALANCE_POINTS = 5
+
+
+def score_sql(inc: str = "inc", exp: str = "exp", bal: str = "bal", lim: str = "lim") -> str:
+    """The score as a SQL expression over the named income/expenses/balance/limit columns."""
+    bands = "\n".join(
+        f"            WHEN {lim} > 0 AND {exp} * 100 >= {lim} * {pct} THEN {points}"
+        for pct, points in UTILIZATION_BANDS
+    )
+    return f"""
+    GREATEST({SCORE_MIN}, LEAST({SCORE_MAX},
+        {BASE_SCORE}
+        + CASE
+{bands}
+            ELSE {LOW_UTILIZATION_POINTS}
+          END
+        + CASE
+            WHEN {exp} > {inc} THEN {OVERSPEND_POINTS}
+            WHEN {inc} > 0 AND {exp} * 100 < {inc} * {SAVER_EXPENSE_PCT} THEN {SAVER_POINTS}
+            ELSE 0
+          END
+        + CASE WHEN {bal} > 0 THEN {POSITIVE_BALANCE_POINTS} ELSE 0 END
+    ))::int
+"""
+
+
+SCORE_SQL = score_sql()
+
+
+def _cents(values) -> np.ndarray:
+    return np.rint(np.asarray(values, dtype=np.float64) * 100).astype(np.int64)
+
+
+def score_batch(income, expenses, balance, credit_limit) -> np.ndarray:
+    """Scores for whole columns of per-user totals (any array-likes of equal length)."""
+    inc, exp, bal, lim = _cents(income), _cents(expenses), _cents(balance), _cents(credit_limit)
+
+    utilization = np.full(inc.shape, LOW_UTILIZATION_POINTS, dtype=np.int32)
+    # Lowest band first, so higher bands overwrite it.
+    for pct, points in reversed(UTILIZATION_BANDS):
+        utilization[(lim > 0) & (exp * 100 >= lim * pct)] = points
+
+    spending = np.where(
+        exp > inc, OVERSPEND_POINTS,
+        np.where((inc > 0) & (exp * 100 < inc * SAVER_EXPENSE_PCT), SAVER_POINTS, 0),
+    )
+    bonus = np.where(bal > 0, POSITIVE_BALANCE_POINTS, 0)
+    return np.clip(BASE_SCORE + utilization + spending + bonus, SCORE_MIN, SCORE_MAX).astype(np.int32)
+
@@ -0,0 +1,63 @@
+from typing import Dict, List, Optional
+
+# ── Rule-based credit advice ────────────────────────────────────
+# Pure functions over a user's totals, shared by /credit/tips, /credit/insights
+# and /dashboard so each caller computes income/expenses/utilization once.
+
+
+def utilization_percent(expenses: float, credit_limit: float) -> Optional[float]:
+    """Expenses as a percentage of the credit limit, or None when no limit is set."""
+    return (expenses / credit_limit * 100) if credit_limit > 0 else None
+
+
+def build_personalized_tips(income: float, expenses: float, utilization: Optional[float]) -> List[Dict[str, str]]:
+    tips = []
+    if expenses > income:
+        tips.append({"title": "You're Overspending", "content": "Your expenses exceed your income — try to reduce non-essential costs."})
+    elif income > 0 and expenses < income * 0.5:
+        tips.append({"title": "Excellent Saving Habits", "content": "You're saving a good portion of your income — consider investing to grow your wealth."})
+
+    if utilization is not None:
+        if utilization > 40:
+            tips.append({
+                "title": "Higher Credit Usage",
+                "content": f"Your credit utilization is {utilization:.1f}%. Try to keep it below 40% to maintain a healthy score."
+            })
+        else:
+            tips.append({
+                "title": "Good Credit Usage",
+                "content": f"Your utilization is {utilization:.1f}% — great job keeping it under 40%!"
+            })
+    return tips
+
+
+def build_credit_insights(income: float, expenses: float, utilization: Optional[float]) -> List[Dict[str, str]]:
+    tips = []
+    if utilization is not None:
+        if utilization > 40:
+            tips.append({
+                "title": "High Credit Utilization",
+                "content": f"Your utilization is {utilization:.1f}%. Try to keep it below 40% to improve your score."
+            })
+        else:
+            tips.append({
+                "title": "Excellent Utilization",
+                "content": f"Your utilization is {utilization:.1f}% — staying under 40% is great!"
+            })
+    else:
+        tips.append({
+            "title": "Set Your Credit Limit",
+            "content": "We can give better insights once you set a credit limit for your account."
+        })
+
+    if expenses > income:
+        tips.append({
+            "title": "High Spending Alert",
+            "content": "Your expenses exceed your income — try reducing non-essential costs."
+        })
+    else:
+        tips.append({
+            "title": "Good Financial Balance",
+            "content": "You’re saving more than you spend — this strengthens your credit health."
+        })
+    return tips
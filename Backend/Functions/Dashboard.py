@@ -0,0 +1,128 @@
+from datetime import date
+from typing import Any, Dict, Iterable, Optional
+
+from Functions.Aggregates import get_user_aggregates
+from Functions.CreditTips import utilization_percent, build_personalized_tips, build_credit_insights
+from Functions.HotCache import HOT_CACHE_ENABLED, lookup_user, sample_tips
+from Functions.TransactionPages import encode_cursor
+
+# ── Composite dashboard read ────────────────────────────────────
+# Every requested section is a scalar subquery of ONE statement keyed on the
+# user id (the email is resolved through the hot cache), so the whole payload
+# comes from a single snapshot (a statement never sees concurrent commits
+# halfway through), and it costs one round trip with no BEGIN/COMMIT. The
+# general tips come from the in-memory catalog instead, unless the hot cache
+# is disabled.
+
+DASHBOARD_SECTIONS = ("user", "summary", "credit", "insights", "tips", "transactions", "challenges")
+DASHBOARD_TX_LIMIT = 6
+
+_SECTION_SQL = {
+    "user": "json_build_object('id', u.id, 'username', u.username, 'email', u.email)",
+    "totals": """(
+        SELECT json_build_object(
+            'income', a.total_income::float8, 'expenses', a.total_expenses::float8,
+            'balance', a.balance::float8, 'credit_limit', a.credit_limit::float8,
+            'transaction_count', a.transaction_count)
+        FROM UserAggregates a WHERE a.user_id = u.id
+    )""",
+    "credit": """(
+        SELECT json_build_object('score', cs.score, 'date', cs.report_date, 'provider', cs.provider)
+        FROM CreditScores cs WHERE cs.user_id = u.id
+        ORDER BY cs.report_date DESC LIMIT 1
+    )""",
+    "tips": """(
+        SELECT COALESCE(json_agg(f), '[]'::json)
+        FROM (SELECT title, content, category FROM FinancialTips ORDER BY RANDOM() LIMIT 3) f
+    )""",
+    "transactions": """(
+        SELECT COALESCE(json_agg(t ORDER BY t.transaction_date DESC, t.id DESC), '[]'::json)
+        FROM (
+            SELECT t.id, t.amount::float8 AS amount, t.description, t.transaction_date,
+                   COALESCE(c.name, 'Other') AS category
+            FROM Transactions t
+            LEFT JOIN Categories c ON t.category_id = c.id
+            WHERE t.user_id = u.id
+            ORDER BY t.transaction_date DESC, t.id DESC
+            LIMIT %(tx_limit)s
+        ) t
+    )""",
+    "challenges": """(
+        SELECT COALESCE(json_agg(ch ORDER BY ch.id), '[]'::json)
+        FROM (
+            SELECT id, user_email, title, goal_amount::float8 AS goal_amount, progress::float8 AS progress,
+                   start_date, end_date, COALESCE(completed, FALSE) AS completed
+            FROM savings_challenges WHERE user_email = u.email
+        ) ch
+    )""",
+}
+
+# Sections derived from the running totals rather than read directly.
+_NEEDS_TOTALS = {"summary", "insights", "tips"}
+
+
+def parse_sections(raw: Optional[str]) -> Iterable[str]:
+    """Comma-separated section names; all sections when empty. Raises ValueError on unknown names."""
+    if not raw:
+        return DASHBOARD_SECTIONS
+    sections = [s.strip().lower() for s in raw.split(",") if s.strip()]
+    unknown = [s for s in sections if s not in DASHBOARD_SECTIONS]
+    if unknown:
+        raise ValueError(f"Unknown section(s): {', '.join(unknown)}. Choose from {', '.join(DASHBOARD_SECTIONS)}.")
+    return sections
+
+
+async def load_dashboard(cur, email: str, sections: Iterable[str], tx_limit: int = DASHBOARD_TX_LIMIT) -> Optional[Dict[str, Any]]:
+    """Returns the requested sections for `email`, or None if the user does not exist."""
+    sections = set(sections)
+    columns = ["u.id"]
+    keys = []
+    for key in ("user", "totals", "credit", "tips", "transactions", "challenges"):
+        if key == "tips" and HOT_CACHE_ENABLED:
+            continue
+        if key in sections or (key == "totals" and sections & _NEEDS_TOTALS):
+            columns.append(f"{_SECTION_SQL[key]} AS {key}")
+            keys.append(key)
+
+    user = await lookup_user(email, cur)
+    if user is None:
+        return None
+    await cur.execute(
+        f"SELECT {', '.join(columns)} FROM Users u WHERE u.id = %(user_id)s;",
+        {"user_id": user[0], "tx_limit": tx_limit + 1},
+    )
+    row = await cur.fetchone()
+    if row is None:
+        return None
+    user_id, data = row[0], dict(zip(keys, row[1:]))
+
+    result: Dict[str, Any] = {}
+    if "user" in sections:
+        result["user"] = data["user"]
+    if "credit" in sections:
+        result["credit"] = data["credit"]
+
+    if sections & _NEEDS_TOTALS:
+        # Shared intermediates: computed once, used by every derived section.
+        totals = data["totals"] or await get_user_aggregates(cur, user_id)
+        income, expenses = totals["income"], totals["expenses"]
+        utilization = utilization_percent(expenses, totals["credit_limit"])
+        if "summary" in sections:
+            result["summary"] = {
+                **totals,
+                "utilization_percent": round(utilization, 2) if utilization is not None else None,
+            }
+        if "insights" in sections:
+            result["insights"] = build_credit_insights(income, expenses, utilization)
+        if "tips" in sections:
+            general = data["tips"] if "tips" in data else await sample_tips(cur)
+            result["tips"] = build_personalized_tips(income, expenses, utilization) + general
+
+    if "transactions" in sections:
+        rows = data["transactions"]
+        last = rows[tx_limit - 1] if len(rows) > tx_limit else None
+        result["transactions"] = rows[:tx_limit]
+        result["next_cursor"] = encode_cursor(date.fromisoformat(last["transaction_date"]), last["id"]) if last else None
+    if "challenges" in sections:
+        result["challenges"] = data["challenges"]
+    return result
@@ -0,0 +1,187 @@
+import asyncio
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+
+import psycopg
+from psycopg_pool import AsyncConnectionPool, PoolTimeout
+from dotenv import load_dotenv
+
+# ── Connection settings (override via .env) ─────────────────────
+load_dotenv()
+DB_CONFIG = {
+    "dbname": os.getenv("DB_NAME", "CrediWise"),
+    "user": os.getenv("DB_USER", "postgres"),
+    "password": os.getenv("DB_PASSWORD", "12345678@"),  # ← update if needed
+    "host": os.getenv("DB_HOST", "localhost"),
+    "port": os.getenv("DB_PORT", "5432"),
+}
+CONNINFO = psycopg.conninfo.make_conninfo(**DB_CONFIG)
+
+POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN", "2"))
+POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX", "20"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+POOL_MAX_IDLE = float(os.getenv("DB_POOL_MAX_IDLE", "600"))
+# Idle connections are probed this often; broken ones are replaced in the background
+# so request checkouts never pay for a health-check round trip.
+HEALTHCHECK_INTERVAL = float(os.getenv("DB_HEALTHCHECK_INTERVAL", "30"))
+
+_async_pool = None
+_health_task = None
+
+_stats_lock = threading.Lock()
+_stats = {
+    "checkouts": 0,
+    "timeouts": 0,
+    "in_use": 0,
+    "wait_ms_total": 0.0,
+    "wait_ms_max": 0.0,
+}
+
+
+# ── Async pool (used by every FastAPI route) ────────────────────
+async def open_pool(configure=None):
+    """
+    Opens the process-wide async pool (called from the app lifespan or a job's main()).
+    `configure`, if given, is awaited on every new connection (tools use it to instrument cursors).
+    """
+    global _async_pool, _health_task
+    if _async_pool is not None:
+        return _async_pool
+    pool = AsyncConnectionPool(
+        CONNINFO,
+        min_size=POOL_MIN_SIZE,
+        max_size=POOL_MAX_SIZE,
+        timeout=POOL_TIMEOUT,
+        max_idle=POOL_MAX_IDLE,
+        kwargs={"autocommit": True},
+        configure=configure,
+        name="crediwise",
+        open=False,
+    )
+    try:
+        await pool.open(wait=True, timeout=POOL_TIMEOUT)
+        print(f"✅ Connected to PostgreSQL database (pool {POOL_MIN_SIZE}-{POOL_MAX_SIZE})!")
+    except Exception as e:
+        print("❌ Error connecting to database:", e)
+        await pool.close()
+        raise
+    _async_pool = pool
+    _health_task = asyncio.create_task(_health_check_loop(pool))
+    return pool
+
+
+async def _health_check_loop(pool):
+    while True:
+        await asyncio.sleep(HEALTHCHECK_INTERVAL)
+        try:
+            await pool.check()
+        except Exception as e:
+            print("⚠️ Database health check failed:", e)
+
+
+async def close_pool():
+    """Closes the pool (called on app shutdown)."""
+    global _async_pool, _health_task
+    if _health_task is not None:
+        _health_task.cancel()
+        _health_task = None
+    if _async_pool is not None:
+        await _async_pool.close()
+        _async_pool = None
+
+
+def _record_checkout(started: float):
+    waited_ms = (time.monotonic() - started) * 1000
+    with _stats_lock:
+        _stats["checkouts"] += 1
+        _stats["in_use"] += 1
+        _stats["wait_ms_total"] += waited_ms
+        _stats["wait_ms_max"] = max(_stats["wait_ms_max"], waited_ms)
+
+
+def _record_release():
+    with _stats_lock:
+        _stats["in_use"] -= 1
+
+
+def _record_timeout():
+    with _stats_lock:
+        _stats["timeouts"] += 1
+
+
+@asynccontextmanager
+async def _checkout():
+    pool = _async_pool or await open_pool()
+    started = time.monotonic()
+    checked_out = False
+    try:
+        async with pool.connection() as conn:
+            _record_checkout(started)
+            checked_out = True
+            yield conn
+    except PoolTimeout:
+        if not checked_out:
+            _record_timeout()
+        raise
+    finally:
+        if checked_out:
+            _record_release()
+
+
+@asynccontextmanager
+async def async_transaction():
+    """
+    Checks a connection out of the async pool for one unit of work and yields a cursor.
+    Commits when the block exits cleanly and rolls back on any exception; connections
+    left broken are discarded by the pool and replaced on the next checkout.
+    """
+    async with _checkout() as conn:
+        async with conn.transaction():
+            async with conn.cursor() as cur:
+                yield cur
+
+
+@asynccontextmanager
+async def async_autocommit():
+    """
+    Yields a cursor with no surrounding BEGIN/COMMIT: each statement commits on its own.
+    For single-statement work this saves two round trips over async_transaction().
+    """
+    async with _checkout() as conn:
+        async with conn.cursor() as cur:
+            yield cur
+
+
+@asynccontextmanager
+async def async_server_cursor(name: str, itersize: int = 500):
+    """
+    Yields a server-side (named) cursor inside a read transaction, so large result
+    sets are pulled `itersize` rows at a time instead of all at once.
+    """
+    async with _checkout() as conn:
+        async with conn.transaction():
+            async with conn.cursor(name=name) as cur:
+                cur.itersize = itersize
+                yield cur
+
+
+def get_pool_stats():
+    """Snapshot of pool sizing and checkout wait metrics."""
+    with _stats_lock:
+        stats = dict(_stats)
+    checkouts = stats["checkouts"]
+    stats["wait_ms_avg"] = round(stats["wait_ms_total"] / checkouts, 3) if checkouts else 0.0
+    stats["wait_ms_total"] = round(stats["wait_ms_total"], 3)
+    stats["wait_ms_max"] = round(stats["wait_ms_max"], 3)
+    stats["min_size"] = POOL_MIN_SIZE
+    stats["max_size"] = POOL_MAX_SIZE
+    if _async_pool is not None:
+        pool_stats = _async_pool.get_stats()
+        stats["pool_size"] = pool_stats.get("pool_size", 0)
+        stats["pool_available"] = pool_stats.get("pool_available", 0)
+        stats["requests_waiting"] = pool_stats.get("requests_waiting", 0)
+        stats["connections_lost"] = pool_stats.get("connections_lost", 0)
+        stats["connections_opened"] = pool_stats.get("connections_num", 0)
+    return stats
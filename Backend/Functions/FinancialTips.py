@@ -0,0 +1,35 @@
+# ── FinancialTips catalog ───────────────────────────────────────
+# General credit-education tips, seeded once when the table is created.
+
+DEFAULT_TIPS = [
+    ("Pay on Time", "Always make payments before the due date to build trust with lenders.", "Credit Score"),
+    ("Keep Utilization Low", "Use less than 30% of your available credit to maintain a healthy score.", "Credit Usage"),
+    ("Check Your Report Regularly", "Monitor your credit report to correct any mistakes early.", "Monitoring"),
+    ("Diversify Credit Types", "Having both credit cards and loans shows good credit management.", "Credit Mix"),
+    ("Avoid Frequent Applications", "Too many credit applications can lower your score temporarily.", "Inquiries"),
+    ("Build Long-Term Accounts", "Older credit accounts improve your score by showing stability.", "Account Age"),
+    ("Don’t Close Old Cards", "Keeping older accounts open improves your credit history length.", "Credit History"),
+    ("Track Spending", "Keeping track of where your money goes helps you avoid overutilization.", "Budgeting")
+]
+
+
+async def init_financial_tips_table(cur):
+    """Creates FinancialTips and seeds the default tips if it is empty."""
+    await cur.execute("""
+        CREATE TABLE IF NOT EXISTS FinancialTips (
+            id SERIAL PRIMARY KEY,
+            title TEXT NOT NULL,
+            content TEXT NOT NULL,
+            category TEXT
+        );
+    """)
+
+    await cur.execute("SELECT COUNT(*) FROM FinancialTips;")
+    count = (await cur.fetchone())[0]
+
+    if count == 0:
+        print("💡 Seeding default FinancialTips...")
+        await cur.executemany("INSERT INTO FinancialTips (title, content, category) VALUES (%s, %s, %s);", DEFAULT_TIPS)
+        print("✅ Default financial tips inserted successfully!")
+    else:
+        print(f"ℹ️ FinancialTips already seeded ({count} records).")
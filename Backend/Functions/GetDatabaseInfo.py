@@ -1,73 +1,48 @@
-import psycopg2
-from decimal import Decimal
+from Functions.Database import async_transaction
+from Functions.Aggregates import get_aggregates_by_email
+from Functions.AnalysisCache import analysis_generation
+from Functions.SingleFlight import SingleFlight, FlightTimeout
 
-def get_database_info(email: str):
+# Concurrent lookups for the same user share one query. The key includes the
+# user's write generation, so a request made after a write never joins a
+# lookup that started before it.
+_flight = SingleFlight("database_info")
+
+async def get_database_info(email: str):
     """
     Returns summarized user financial info (income, expenses, balance, credit limit, and credit score)
-    using a shared connection from main.py.
-    Automatically converts Decimal values to floats for JSON serialization.
+    using a pooled async connection from Functions.Database.
+    Totals come from the UserAggregates running sums, so the cost does not grow with history.
     """
     try:
-        # Lazy import to avoid circular import
-        from main import conn
-
-        cur = conn.cursor()
-
-        # Get the user's ID
-        cur.execute("SELECT id FROM Users WHERE email = %s;", (email,))
-        user = cur.fetchone()
-        if not user:
-            cur.close()
-            return {"error": "User not found"}
-        user_id = user[0]
-
-        # Income and expenses
-        cur.execute("""
-            SELECT 
-                COALESCE(SUM(CASE WHEN amount > 0 THEN amount ELSE 0 END), 0),
-                COALESCE(SUM(CASE WHEN amount < 0 THEN ABS(amount) ELSE 0 END), 0)
-            FROM Transactions WHERE user_id = %s;
-        """, (user_id,))
-        income, expenses = cur.fetchone()
-
-        # Balances and credit limits
-        cur.execute("""
-            SELECT 
-                COALESCE(SUM(balance), 0),
-                COALESCE(SUM(credit_limit), 0)
-            FROM Accounts WHERE user_id = %s;
-        """, (user_id,))
-        balance, limit = cur.fetchone() or (0, 0)
-
-        # 🧠 Get the latest credit score
-        cur.execute("""
-            SELECT score, report_date
-            FROM CreditScores
-            WHERE user_id = %s
-            ORDER BY report_date DESC
-            LIMIT 1;
-        """, (user_id,))
-        credit_row = cur.fetchone()
-        credit_score = credit_row[0] if credit_row else None
-        report_date = credit_row[1] if credit_row else None
-
-        cur.close()
-
-        # Safe Decimal → float converter
-        def to_float(value):
-            if value is None:
-                return 0.0
-            if isinstance(value, Decimal):
-                return float(value)
-            try:
-                return float(value)
-            except Exception:
-                return 0.0
+        return await _flight.do((email, analysis_generation(email)), _load_database_info, email)
+    except FlightTimeout as e:
+        return {"error": str(e)}
 
-        income = to_float(income)
-        expenses = to_float(expenses)
-        balance = to_float(balance)
-        limit = to_float(limit)
+async def _load_database_info(email: str):
+    try:
+        async with async_transaction() as cur:
+            totals = await get_aggregates_by_email(cur, email)
+            if not totals:
+                return {"error": "User not found"}
+            user_id = totals["user_id"]
+
+            # 🧠 Get the latest credit score
+            await cur.execute("""
+                SELECT score, report_date
+                FROM CreditScores
+                WHERE user_id = %s
+                ORDER BY report_date DESC
+                LIMIT 1;
+            """, (user_id,))
+            credit_row = await cur.fetchone()
+            credit_score = credit_row[0] if credit_row else None
+            report_date = credit_row[1] if credit_row else None
+
+        income = totals["income"]
+        expenses = totals["expenses"]
+        balance = totals["balance"]
+        limit = totals["credit_limit"]
 
         utilization = (expenses / limit * 100) if limit > 0 else 0
 
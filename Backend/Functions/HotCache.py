@@ -0,0 +1,124 @@
+import os
+import random
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from cachetools import TTLCache
+
+from Functions.Database import async_autocommit
+
+# ── In-process hot-path caches ──────────────────────────────────
+# Two reads sit in front of most requests and almost never change:
+#   • email → (id, username, email). Ids never change, and the username only
+#     changes through /update_user, which drops the entry in this process;
+#     USER_CACHE_TTL_S bounds how long other workers keep the old name.
+#     Unknown emails are not cached, so a new signup is visible at once.
+#   • the FinancialTips catalog, held as a list and re-read every TIPS_RELOAD_S,
+#     so picking tips is random.sample() instead of ORDER BY RANDOM() over the table.
+# HOT_CACHE_ENABLED=0 sends every lookup back to the database.
+
+HOT_CACHE_ENABLED = os.getenv("HOT_CACHE_ENABLED", "1") == "1"
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL_S = float(os.getenv("USER_CACHE_TTL_S", "300"))
+TIPS_RELOAD_S = float(os.getenv("TIPS_RELOAD_S", "300"))
+TIPS_PER_REQUEST = 3
+
+UserRow = Tuple[str, str, str]  # (id, username, email)
+
+_users: TTLCache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL_S)
+# Bumped on every invalidation, so a lookup that read Users before an update
+# committed does not store the old row after it.
+_user_epoch = 0
+_tips: List[Dict[str, Any]] = []
+_tips_loaded_at: Optional[float] = None
+_stats = {"user_hits": 0, "user_misses": 0, "user_invalidations": 0, "tips_served": 0, "tips_reloads": 0}
+
+
+# ── Users ───────────────────────────────────────────────────────
+def cached_user(email: str) -> Optional[UserRow]:
+    """The cached row for `email`, or None on a miss (never touches the database)."""
+    if not HOT_CACHE_ENABLED:
+        return None
+    row = _users.get(email)
+    _stats["user_hits" if row is not None else "user_misses"] += 1
+    return row
+
+
+def remember_user(user_id: str, username: str, email: str, epoch: Optional[int] = None):
+    """Caches a row just read from Users, unless an invalidation happened since `epoch`."""
+    if HOT_CACHE_ENABLED and (epoch is None or epoch == _user_epoch):
+        _users[email] = (user_id, username, email)
+
+
+def forget_user(email: str):
+    """Drops the cached row for `email` — call after any change to that Users row."""
+    global _user_epoch
+    _user_epoch += 1
+    if _users.pop(email, None) is not None:
+        _stats["user_invalidations"] += 1
+
+
+async def lookup_user(email: str, cur=None) -> Optional[UserRow]:
+    """
+    (id, username, email) for `email`, or None if there is no such user. Served from
+    the cache when possible; otherwise read with `cur`, or on a pooled connection
+    checked out only for that read.
+    """
+    row = cached_user(email)
+    if row is not None:
+        return row
+    epoch = _user_epoch
+    if cur is None:
+        async with async_autocommit() as cur:
+            await cur.execute("SELECT id, username, email FROM Users WHERE email = %s;", (email,))
+            row = await cur.fetchone()
+    else:
+        await cur.execute("SELECT id, username, email FROM Users WHERE email = %s;", (email,))
+        row = await cur.fetchone()
+    if row is None:
+        return None
+    remember_user(*row, epoch=epoch)
+    return tuple(row)
+
+
+# ── FinancialTips catalog ───────────────────────────────────────
+async def _reload_tips(cur):
+    global _tips, _tips_loaded_at
+    await cur.execute("SELECT title, content, category FROM FinancialTips ORDER BY id;")
+    _tips = [{"title": r[0], "content": r[1], "category": r[2]} for r in await cur.fetchall()]
+    _tips_loaded_at = time.monotonic()
+    _stats["tips_reloads"] += 1
+
+
+async def sample_tips(cur, k: int = TIPS_PER_REQUEST) -> List[Dict[str, Any]]:
+    """`k` random tips from the catalog, reloading it first if it is older than TIPS_RELOAD_S."""
+    if not HOT_CACHE_ENABLED:
+        await cur.execute("SELECT title, content, category FROM FinancialTips ORDER BY RANDOM() LIMIT %s;", (k,))
+        return [{"title": r[0], "content": r[1], "category": r[2]} for r in await cur.fetchall()]
+    if _tips_loaded_at is None or time.monotonic() - _tips_loaded_at > TIPS_RELOAD_S:
+        await _reload_tips(cur)
+    _stats["tips_served"] += 1
+    return random.sample(_tips, min(k, len(_tips)))
+
+
+def get_hot_cache_stats() -> Dict[str, Any]:
+    lookups = _stats["user_hits"] + _stats["user_misses"]
+    return {
+        "enabled": HOT_CACHE_ENABLED,
+        "users": {
+            "hits": _stats["user_hits"],
+            "misses": _stats["user_misses"],
+            "invalidations": _stats["user_invalidations"],
+            "hit_rate": round(_stats["user_hits"] / lookups, 3) if lookups else 0.0,
+            "size": len(_users),
+            "max_size": USER_CACHE_SIZE,
+            "ttl_s": USER_CACHE_TTL_S,
+        },
+        "tips": {
+            "served": _stats["tips_served"],
+            "reloads": _stats["tips_reloads"],
+            "catalog_size": len(_tips),
+            "age_s": round(time.monotonic() - _tips_loaded_at, 1) if _tips_loaded_at is not None else None,
+            "reload_s": TIPS_RELOAD_S,
+        },
+    }
@@ -0,0 +1,369 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+
+from Functions.LLMProviders import LLM_PROVIDER, MODEL_NAME, create_provider
+
+# ── Async LLM client ────────────────────────────────────────────
+# Every model call goes through generate(): it awaits the provider's native
+# async API (the event loop never blocks), caps in-flight calls with a semaphore,
+# enforces one deadline per call across all attempts, retries transient
+# failures with jittered exponential backoff, and trips a circuit breaker when
+# the upstream keeps failing so requests fail fast instead of piling up.
+# generate_stream() does the same for token streaming. The provider itself
+# (Gemini or the offline stub) is chosen by LLM_PROVIDER — see LLMProviders.
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_TIMEOUT_S = float(os.getenv("LLM_TIMEOUT_S", "30"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_BACKOFF_BASE_S = float(os.getenv("LLM_BACKOFF_BASE_S", "0.5"))
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))
+LLM_BREAKER_COOLDOWN_S = float(os.getenv("LLM_BREAKER_COOLDOWN_S", "30"))
+
+# Worth another attempt with any provider; each provider adds its own
+# (rate limits, overload and other upstream hiccups).
+TRANSIENT_ERRORS = (asyncio.TimeoutError, ConnectionError)
+
+
+class LLMUnavailable(RuntimeError):
+    """The model could not answer: provider not configured, breaker open, deadline spent or retries exhausted."""
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive transient failures. While open, calls are
+    rejected until `cooldown` seconds pass; then one trial call is let through
+    (half-open) and its outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.trial_in_flight or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+            print(f"⚠️ LLM circuit breaker opened after {self.failures} failure(s).")
+        self.trial_in_flight = False
+
+
+_breaker = CircuitBreaker(LLM_BREAKER_THRESHOLD, LLM_BREAKER_COOLDOWN_S)
+_semaphore: Optional[asyncio.Semaphore] = None
+_provider = None
+_provider_lock = threading.Lock()
+
+_stats_lock = threading.Lock()
+_stats = {
+    "calls": 0,
+    "succeeded": 0,
+    "failed": 0,
+    "retries": 0,
+    "timeouts": 0,
+    "rejected_open_circuit": 0,
+    "in_flight": 0,
+    "queued": 0,
+}
+# Streaming timings over the last STREAM_WINDOW calls.
+STREAM_WINDOW = 500
+_stream_stats = {"completed": 0, "cancelled": 0, "failed": 0}
+_stream_ttft_ms: Deque[float] = deque(maxlen=STREAM_WINDOW)
+_stream_total_ms: Deque[float] = deque(maxlen=STREAM_WINDOW)
+
+
+def _bump(key: str, delta: int = 1):
+    with _stats_lock:
+        _stats[key] += delta
+
+
+def get_provider():
+    """The configured provider, built on first use. Raises LLMUnavailable if it can't be."""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                try:
+                    _provider = create_provider(LLM_PROVIDER)
+                except (ValueError, RuntimeError) as e:
+                    raise LLMUnavailable(str(e)) from e
+    return _provider
+
+
+def init_llm_provider():
+    """Builds the provider at startup; a missing key is reported, not fatal, so the rest of the API still runs."""
+    try:
+        provider = get_provider()
+    except LLMUnavailable as e:
+        print(f"⚠️ AI features disabled: {e}")
+        return
+    print(f"🤖 LLM provider: {provider.name} ({MODEL_NAME})")
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    return _semaphore
+
+
+def _backoff(attempt: int) -> float:
+    # Full jitter: spreads retries from many callers instead of synchronising them.
+    return random.uniform(0, LLM_BACKOFF_BASE_S * (2 ** attempt))
+
+
+def _admit(timeout: Optional[float]) -> float:
+    """Breaker check; returns the call's absolute deadline on the loop clock."""
+    if not _breaker.allow():
+        _bump("rejected_open_circuit")
+        raise LLMUnavailable("AI service is temporarily unavailable. Please try again shortly.")
+    _bump("calls")
+    return asyncio.get_running_loop().time() + (timeout or LLM_TIMEOUT_S)
+
+
+def _remaining(deadline: float) -> float:
+    remaining = deadline - asyncio.get_running_loop().time()
+    if remaining <= 0:
+        raise asyncio.TimeoutError()
+    return remaining
+
+
+@asynccontextmanager
+async def _slot(deadline: float):
+    """Holds one of the LLM_MAX_CONCURRENCY slots; waiting for it counts against the deadline."""
+    _bump("queued")
+    try:
+        await asyncio.wait_for(_get_semaphore().acquire(), _remaining(deadline))
+    finally:
+        _bump("queued", -1)
+    _bump("in_flight")
+    try:
+        yield
+    finally:
+        _bump("in_flight", -1)
+        _get_semaphore().release()
+
+
+async def _retry_or_raise(error: BaseException, attempt: int, deadline: float):
+    """Sleeps before the next attempt, or raises LLMUnavailable when out of retries or time."""
+    if isinstance(error, asyncio.TimeoutError):
+        _bump("timeouts")
+    backoff = _backoff(attempt)
+    if attempt >= LLM_MAX_RETRIES or asyncio.get_running_loop().time() + backoff >= deadline:
+        _breaker.record_failure()
+        _bump("failed")
+        raise LLMUnavailable(f"AI service failed after {attempt + 1} attempt(s) ({type(error).__name__}).") from error
+    _bump("retries")
+    await asyncio.sleep(backoff)
+
+
+def _not_upstream_failure(counted: bool = True):
+    # Cancellations and bad requests say nothing about the upstream's health:
+    # they don't count against the breaker, but a half-open trial has finished.
+    _breaker.trial_in_flight = False
+    if counted:
+        _bump("failed")
+
+
+async def generate(
+    prompt: Any,
+    *,
+    generation_config: Any = None,
+    system_instruction: Optional[str] = None,
+    timeout: Optional[float] = None,
+    **kwargs,
+):
+    """
+    Awaits the provider's generate_content_async with the limits above and returns the raw
+    response. Raises LLMUnavailable for breaker-open, deadline and exhausted-retry
+    cases; other errors (bad request, safety blocks) propagate unchanged.
+    """
+    provider = get_provider()
+    transient = TRANSIENT_ERRORS + provider.transient_errors
+    deadline = _admit(timeout)
+
+    attempt = 0
+    while True:
+        try:
+            async with _slot(deadline):
+                response = await asyncio.wait_for(
+                    provider.generate_content_async(
+                        prompt, generation_config=generation_config, system_instruction=system_instruction, **kwargs
+                    ),
+                    _remaining(deadline),
+                )
+        except transient as e:
+            await _retry_or_raise(e, attempt, deadline)
+            attempt += 1
+            continue
+        except asyncio.CancelledError:
+            _not_upstream_failure(counted=False)
+            raise
+        except Exception:
+            _not_upstream_failure()
+            raise
+
+        _breaker.record_success()
+        _bump("succeeded")
+        return response
+
+
+async def generate_stream(
+    prompt: Any,
+    *,
+    generation_config: Any = None,
+    system_instruction: Optional[str] = None,
+    timeout: Optional[float] = None,
+    raw: bool = False,
+    **kwargs,
+) -> AsyncIterator[Any]:
+    """
+    Streams the response as text chunks (or, with raw=True, as the SDK's response
+    chunks, e.g. to see function calls). Retries happen only before the first chunk
+    (after that the caller has already shown partial output). The slot is held until
+    the stream ends; closing or cancelling the consumer aborts the upstream call.
+    Use with contextlib.aclosing() so an abandoned stream releases its slot at once.
+    """
+    provider = get_provider()
+    transient = TRANSIENT_ERRORS + provider.transient_errors
+    deadline = _admit(timeout)
+    started = time.monotonic()
+    first_chunk_at: Optional[float] = None
+    outcome = "failed"
+
+    attempt = 0
+    try:
+        while True:
+            try:
+                async with _slot(deadline):
+                    response = await asyncio.wait_for(
+                        provider.generate_content_async(
+                            prompt,
+                            generation_config=generation_config,
+                            system_instruction=system_instruction,
+                            stream=True,
+                            **kwargs,
+                        ),
+                        _remaining(deadline),
+                    )
+                    chunks = response.__aiter__()
+                    try:
+                        while True:
+                            try:
+                                chunk = await asyncio.wait_for(chunks.__anext__(), _remaining(deadline))
+                            except StopAsyncIteration:
+                                break
+                            item = chunk if raw else _chunk_text(chunk)
+                            if not item:
+                                continue
+                            if first_chunk_at is None:
+                                first_chunk_at = time.monotonic()
+                            yield item
+                    finally:
+                        await _abort_stream(response, chunks)
+            except transient as e:
+                if first_chunk_at is not None:
+                    _breaker.record_failure()
+                    _bump("failed")
+                    raise LLMUnavailable(f"AI stream broke off ({type(e).__name__}).") from e
+                await _retry_or_raise(e, attempt, deadline)
+                attempt += 1
+                continue
+            except (asyncio.CancelledError, GeneratorExit):
+                outcome = "cancelled"
+                _not_upstream_failure(counted=False)
+                raise
+            except Exception:
+                _not_upstream_failure()
+                raise
+
+            _breaker.record_success()
+            _bump("succeeded")
+            outcome = "completed"
+            return
+    finally:
+        _record_stream(started, first_chunk_at, outcome)
+
+
+async def _abort_stream(response, chunks):
+    """Closes the SDK iterator and cancels the underlying RPC so no more tokens are generated."""
+    call = getattr(response, "_iterator", None)
+    if call is not None and hasattr(call, "cancel"):
+        call.cancel()
+    if hasattr(chunks, "aclose"):
+        await chunks.aclose()
+
+
+def _chunk_text(chunk) -> str:
+    try:
+        return chunk.text or ""
+    except ValueError:
+        # A chunk with no text part (e.g. only a finish reason or safety ratings).
+        return ""
+
+
+def _record_stream(started: float, first_chunk_at: Optional[float], outcome: str):
+    now = time.monotonic()
+    with _stats_lock:
+        _stream_stats[outcome] += 1
+        if first_chunk_at is not None:
+            _stream_ttft_ms.append((first_chunk_at - started) * 1000)
+        if outcome == "completed":
+            _stream_total_ms.append((now - started) * 1000)
+
+
+def _percentile(values, pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * pct))], 1)
+
+
+def get_llm_stats() -> Dict[str, Any]:
+    """Snapshot of call counters, concurrency and breaker state."""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["max_concurrency"] = LLM_MAX_CONCURRENCY
+    stats["timeout_s"] = LLM_TIMEOUT_S
+    stats["breaker_state"] = _breaker.state
+    stats["consecutive_failures"] = _breaker.failures
+    stats["provider"] = LLM_PROVIDER
+    if _provider is not None:
+        stats["provider_stats"] = _provider.stats()
+    with _stats_lock:
+        ttft, total = list(_stream_ttft_ms), list(_stream_total_ms)
+        stats["streams"] = dict(_stream_stats)
+    stats["streams"].update({
+        "ttft_ms_p50": _percentile(ttft, 0.5),
+        "ttft_ms_p95": _percentile(ttft, 0.95),
+        "total_ms_p50": _percentile(total, 0.5),
+        "total_ms_p95": _percentile(total, 0.95),
+    })
+    return stats
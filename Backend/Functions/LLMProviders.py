@@ -0,0 +1,279 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+# ── LLM providers ───────────────────────────────────────────────
+# A provider makes ONE upstream model call; LLMClient wraps it with the
+# concurrency cap, deadlines, retries and circuit breaker. Responses follow the
+# google.generativeai shape — .text, .candidates[0].content.parts with .text /
+# .function_call, and async iteration when stream=True — which is all the rest
+# of the backend reads. Pick one with LLM_PROVIDER:
+#   gemini  Google Gemini (needs GEMINI_API_KEY; the default)
+#   stub    offline and deterministic, for load tests and running without a key
+
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini").strip().lower()
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash-exp")
+# Part of the analysis cache key, so stub answers are never served as real ones.
+MODEL_NAME = GEMINI_MODEL if LLM_PROVIDER == "gemini" else LLM_PROVIDER
+
+
+class GeminiProvider:
+    name = "gemini"
+
+    def __init__(self):
+        api_key = os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise RuntimeError("GEMINI_API_KEY missing. Add it to your .env file (or set LLM_PROVIDER=stub).")
+        import google.generativeai as genai
+        from google.api_core import exceptions as google_exceptions
+
+        genai.configure(api_key=api_key)
+        self._genai = genai
+        self._models: Dict[Optional[str], Any] = {}
+        self._models_lock = threading.Lock()
+        # Worth another attempt: rate limits, overload and upstream hiccups.
+        self.transient_errors = (
+            google_exceptions.TooManyRequests,
+            google_exceptions.ResourceExhausted,
+            google_exceptions.ServiceUnavailable,
+            google_exceptions.InternalServerError,
+            google_exceptions.DeadlineExceeded,
+            google_exceptions.GatewayTimeout,
+        )
+
+    def _model(self, system_instruction: Optional[str]):
+        """One GenerativeModel per distinct system instruction, built on first use."""
+        model = self._models.get(system_instruction)
+        if model is None:
+            with self._models_lock:
+                model = self._models.get(system_instruction)
+                if model is None:
+                    model = self._genai.GenerativeModel(model_name=GEMINI_MODEL, system_instruction=system_instruction)
+                    self._models[system_instruction] = model
+        return model
+
+    async def generate_content_async(self, contents: Any, *, system_instruction: Optional[str] = None, **kwargs):
+        return await self._model(system_instruction).generate_content_async(contents, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"model": GEMINI_MODEL, "cached_models": len(self._models)}
+
+
+# ── Offline stub ────────────────────────────────────────────────
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """
+    Latency distribution in milliseconds → sampler returning seconds.
+    fixed:MS | uniform:LO:HI | normal:MEAN:STD | lognormal:MEDIAN:SIGMA
+    """
+    kind, *params = spec.strip().lower().split(":")
+    try:
+        values = [float(p) for p in params]
+        if kind == "fixed":
+            (ms,) = values
+            return lambda rng: ms / 1000
+        if kind == "uniform":
+            low, high = values
+            return lambda rng: rng.uniform(low, high) / 1000
+        if kind == "normal":
+            mean, std = values
+            return lambda rng: max(0.0, rng.gauss(mean, std)) / 1000
+        if kind == "lognormal":
+            median, sigma = values
+            return lambda rng: median * rng.lognormvariate(0, sigma) / 1000
+    except ValueError:
+        pass
+    raise ValueError(f"Bad latency spec {spec!r}: use fixed:MS, uniform:LO:HI, normal:MEAN:STD or lognormal:MEDIAN:SIGMA.")
+
+
+_STUB_WORDS = (
+    "keep", "your", "credit", "utilization", "below", "30%", "and", "pay", "balances", "in", "full", "each",
+    "month", "track", "spending", "by", "category", "build", "an", "emergency", "fund", "before", "investing",
+)
+_STUB_TIPS = {
+    "tips": [
+        {"title": "Lower Your Utilization", "advice": "Pay your card down before the statement date to report a balance under 30% of your limit."},
+        {"title": "Automate Savings", "advice": "Move a fixed amount to savings on payday so it never reaches your spending account."},
+        {"title": "Review Subscriptions", "advice": "Cancel recurring charges you have not used in the last month."},
+    ]
+}
+
+
+class _FunctionCall:
+    __slots__ = ("name", "args")
+
+    def __init__(self, name: str = "", args: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.args = args or {}
+
+
+class _Part:
+    __slots__ = ("text", "function_call")
+
+    def __init__(self, text: str = "", function_call: Optional[_FunctionCall] = None):
+        self.text = text
+        self.function_call = function_call or _FunctionCall()
+
+
+class _Content:
+    __slots__ = ("role", "parts")
+
+    def __init__(self, parts: List[_Part]):
+        self.role = "model"
+        self.parts = parts
+
+
+class _Candidate:
+    __slots__ = ("content",)
+
+    def __init__(self, parts: List[_Part]):
+        self.content = _Content(parts)
+
+
+class StubResponse:
+    def __init__(self, parts: List[_Part]):
+        self.candidates = [_Candidate(parts)]
+
+    @property
+    def text(self) -> str:
+        return "".join(p.text for p in self.candidates[0].content.parts)
+
+
+class StubStream:
+    """Async-iterable response: waits `ttft`, then yields a few tokens per chunk at `tokens_per_s`."""
+
+    def __init__(self, parts: List[_Part], ttft: float, tokens_per_s: float, tokens_per_chunk: int = 4):
+        self._parts = parts
+        self._ttft = ttft
+        self._chunk_delay = tokens_per_chunk / tokens_per_s
+        self._tokens_per_chunk = tokens_per_chunk
+
+    def __aiter__(self):
+        return self._chunks()
+
+    async def _chunks(self):
+        await asyncio.sleep(self._ttft)
+        for part in self._parts:
+            if part.function_call.name:
+                yield StubResponse([part])
+                continue
+            words = part.text.split(" ")
+            for i in range(0, len(words), self._tokens_per_chunk):
+                if i:
+                    await asyncio.sleep(self._chunk_delay)
+                piece = " ".join(words[i:i + self._tokens_per_chunk])
+                yield StubResponse([_Part(text=piece if i == 0 else " " + piece)])
+
+
+def _last_parts(contents: Any) -> List[Any]:
+    if isinstance(contents, (str, bytes)):
+        return [contents]
+    if isinstance(contents, (list, tuple)):
+        last = contents[-1] if contents else ""
+        if isinstance(last, dict):
+            return list(last.get("parts") or [])
+        return list(getattr(last, "parts", [last]))
+    return [contents]
+
+
+def _part_kind(part: Any) -> str:
+    if isinstance(part, str):
+        return "text"
+    if isinstance(part, dict):
+        return "function_response" if "function_response" in part else "text"
+    return "function_response" if getattr(getattr(part, "function_response", None), "name", "") else "text"
+
+
+class StubProvider:
+    """
+    Deterministic offline model. Everything is driven by env vars:
+      LLM_STUB_LATENCY_MS      time to first token, as a parse_latency() spec
+      LLM_STUB_TOKENS_PER_S    generation speed after the first token
+      LLM_STUB_REPLY_TOKENS    length of text replies (capped by max_output_tokens)
+      LLM_STUB_ERROR_RATE      share of calls that fail with a retryable ConnectionError
+      LLM_STUB_HANG_RATE       share of calls that never answer (exercises deadlines)
+      LLM_STUB_TOOL_CALL_RATE  share of tool-enabled chats that call a tool first
+      LLM_STUB_SEED            seed for every random choice above
+    JSON requests (response_mime_type=application/json) get canned tips.
+    """
+
+    name = "stub"
+    transient_errors = ()
+
+    def __init__(self):
+        self.latency = parse_latency(os.getenv("LLM_STUB_LATENCY_MS", "lognormal:600:0.4"))
+        self.tokens_per_s = float(os.getenv("LLM_STUB_TOKENS_PER_S", "80"))
+        self.reply_tokens = int(os.getenv("LLM_STUB_REPLY_TOKENS", "60"))
+        self.error_rate = float(os.getenv("LLM_STUB_ERROR_RATE", "0"))
+        self.hang_rate = float(os.getenv("LLM_STUB_HANG_RATE", "0"))
+        self.tool_call_rate = float(os.getenv("LLM_STUB_TOOL_CALL_RATE", "0.5"))
+        self._rng = random.Random(int(os.getenv("LLM_STUB_SEED", "0")))
+        self._stats = {"calls": 0, "injected_errors": 0, "injected_hangs": 0, "tool_calls": 0}
+
+    async def generate_content_async(
+        self,
+        contents: Any,
+        *,
+        generation_config: Any = None,
+        stream: bool = False,
+        tools: Any = None,
+        tool_config: Any = None,
+        system_instruction: Optional[str] = None,
+        **kwargs,
+    ):
+        self._stats["calls"] += 1
+        ttft = self.latency(self._rng)
+        roll = self._rng.random()
+        if roll < self.hang_rate:
+            self._stats["injected_hangs"] += 1
+            await asyncio.sleep(3600)
+        if roll < self.hang_rate + self.error_rate:
+            self._stats["injected_errors"] += 1
+            await asyncio.sleep(ttft)
+            raise ConnectionError("stub: injected upstream error")
+
+        config = generation_config if isinstance(generation_config, dict) else {}
+        parts = self._answer(contents, config, tools, tool_config)
+        if stream:
+            return StubStream(parts, ttft, self.tokens_per_s)
+        tokens = sum(len(p.text.split(" ")) for p in parts if p.text)
+        await asyncio.sleep(ttft + tokens / self.tokens_per_s)
+        return StubResponse(parts)
+
+    def _answer(self, contents: Any, config: Dict[str, Any], tools: Any, tool_config: Any) -> List[_Part]:
+        last = _last_parts(contents)
+        answering_tools = any(_part_kind(p) == "function_response" for p in last)
+        mode = ((tool_config or {}).get("function_calling_config") or {}).get("mode", "AUTO")
+        if tools and not answering_tools and str(mode).upper() != "NONE" and self._rng.random() < self.tool_call_rate:
+            declarations = [d for tool in tools for d in (tool.get("function_declarations") or [])]
+            if declarations:
+                self._stats["tool_calls"] += 1
+                return [_Part(function_call=_FunctionCall(declarations[0]["name"], {}))]
+
+        if config.get("response_mime_type") == "application/json":
+            return [_Part(text=json.dumps(_STUB_TIPS))]
+
+        # Same prompt → same words, so runs are reproducible.
+        prompt = " ".join(p if isinstance(p, str) else json.dumps(p, default=str) if isinstance(p, dict) else str(p) for p in last)
+        seed = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8], 16)
+        count = min(self.reply_tokens, int(config.get("max_output_tokens") or self.reply_tokens))
+        words = [_STUB_WORDS[(seed + i * 7) % len(_STUB_WORDS)] for i in range(count)]
+        return [_Part(text=" ".join(words).capitalize() + ".")]
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self._stats)
+
+
+_PROVIDERS = {"gemini": GeminiProvider, "stub": StubProvider}
+
+
+def create_provider(name: str = LLM_PROVIDER):
+    """Builds the named provider; raises ValueError/RuntimeError if it is unknown or misconfigured."""
+    try:
+        provider_cls = _PROVIDERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown LLM_PROVIDER {name!r}. Choose from {', '.join(_PROVIDERS)}.") from None
+    return provider_cls()
@@ -0,0 +1,241 @@
+"""
+Versioned schema migrations.
+
+Run once per deploy, before starting the app workers:
+
+    python -m Functions.Migrations            # apply pending migrations, then verify
+    python -m Functions.Migrations status     # list applied / pending versions
+    python -m Functions.Migrations verify     # check indexes and version only
+
+The app itself only checks that the schema is current at startup (and refuses
+to start otherwise), unless DB_AUTO_MIGRATE=1 lets it apply them itself.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from typing import Any, Awaitable, Callable, List, NamedTuple, Tuple
+
+from Functions.Aggregates import init_user_aggregates_table
+from Functions.AnalysisJobs import init_analysis_jobs_table
+from Functions.BulkIngest import init_content_hash_index, init_transaction_hashes
+from Functions.Categorizer import init_categorizer
+from Functions.ChatSessions import init_chat_sessions_table
+from Functions.Database import async_autocommit, open_pool, close_pool
+from Functions.FinancialTips import init_financial_tips_table
+from Functions.MonthlyRollups import init_monthly_rollups_table
+from Functions.NightlyRescore import init_credit_score_index
+from Functions.ScoreHistory import init_score_history_table
+from Functions.TransactionPages import init_transaction_indexes
+from Functions.TransactionPartitions import init_transaction_partitions
+
+# ── Migration list ──────────────────────────────────────────────
+# Versions are applied in order, each exactly once, and recorded in
+# SchemaMigrations. Never edit or renumber an applied migration: append a new
+# one. The base tables (Users, Accounts, Transactions, Categories, CreditScores,
+# savings_challenges) predate this list and are not created here.
+# Transactional migrations run with their version record in one transaction;
+# the others (CREATE INDEX CONCURRENTLY cannot run in one) are written to be
+# safe to re-run if interrupted.
+
+DB_AUTO_MIGRATE = os.getenv("DB_AUTO_MIGRATE", "0") == "1"
+_LOCK_ID = 720_023  # pg_advisory lock key held while migrating
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    apply: Callable[[Any], Awaitable[None]]
+    transactional: bool = True
+
+
+class IndexSpec(NamedTuple):
+    name: str
+    table: str
+    columns: Tuple[str, ...]
+
+
+# Lookups every request path depends on. Any valid, non-partial index whose
+# leading columns match counts — e.g. a UNIQUE constraint on Users(email). A
+# (user_id, transaction_date, id) index serves newest-first pages by scanning
+# backwards, and CreditScores keeps user_id alone so score updates stay HOT.
+HOT_INDEXES = (
+    IndexSpec("users_email_idx", "Users", ("email",)),
+    IndexSpec("transactions_user_date_id_idx", "Transactions", ("user_id", "transaction_date", "id")),
+    IndexSpec("accounts_user_idx", "Accounts", ("user_id",)),
+    IndexSpec("credit_scores_user_idx", "CreditScores", ("user_id",)),
+    IndexSpec("savings_challenges_user_email_idx", "savings_challenges", ("user_email",)),
+)
+
+
+async def _find_index(cur, spec: IndexSpec) -> Tuple[List[str], List[str]]:
+    """(valid, invalid) names of non-partial indexes on the spec's table that lead with its columns."""
+    await cur.execute("""
+        SELECT i.indexrelid::regclass::text, i.indisvalid
+        FROM pg_index i
+        WHERE i.indrelid = to_regclass(%(table)s)
+          AND i.indpred IS NULL
+          AND (
+              SELECT array_agg(a.attname::text ORDER BY k.ord)
+              FROM unnest(i.indkey::int2[]) WITH ORDINALITY k(attnum, ord)
+              JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = k.attnum
+              WHERE k.ord <= %(n)s
+          ) = %(columns)s::text[];
+    """, {"table": spec.table, "n": len(spec.columns), "columns": [c.lower() for c in spec.columns]})
+    rows = await cur.fetchall()
+    return [name for name, valid in rows if valid], [name for name, valid in rows if not valid]
+
+
+async def ensure_index(cur, spec: IndexSpec) -> str:
+    """
+    Creates the index CONCURRENTLY (writes keep flowing) unless a matching valid
+    one exists. A leftover invalid build of it — from an interrupted run — is
+    dropped and rebuilt. Needs an autocommit cursor. Returns what was done.
+    """
+    valid, invalid = await _find_index(cur, spec)
+    if valid:
+        return f"present ({valid[0]})"
+    if spec.name.lower() in invalid:
+        await cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {spec.name};")
+    await cur.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {spec.name} ON {spec.table} ({', '.join(spec.columns)});")
+    valid, _ = await _find_index(cur, spec)
+    if not valid:
+        raise RuntimeError(f"Index {spec.name} on {spec.table} was not built.")
+    return "created"
+
+
+async def create_hot_indexes(cur):
+    for spec in HOT_INDEXES:
+        print(f"   {spec.table}({', '.join(spec.columns)}): {await ensure_index(cur, spec)}")
+
+
+MIGRATIONS = (
+    Migration(1, "financial_tips", init_financial_tips_table),
+    Migration(2, "user_aggregates", init_user_aggregates_table),
+    Migration(3, "transaction_content_hash", init_content_hash_index),
+    Migration(4, "transaction_page_index", init_transaction_indexes),
+    Migration(5, "analysis_jobs", init_analysis_jobs_table),
+    Migration(6, "chat_sessions", init_chat_sessions_table),
+    Migration(7, "credit_score_index", init_credit_score_index),
+    Migration(8, "credit_score_history", init_score_history_table),
+    Migration(9, "categorizer", init_categorizer),
+    Migration(10, "monthly_rollups", init_monthly_rollups_table),
+    Migration(11, "hot_lookup_indexes", create_hot_indexes, transactional=False),
+    Migration(12, "transaction_partitions", init_transaction_partitions),
+    Migration(13, "transaction_hashes", init_transaction_hashes),
+)
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+# ── Runner ──────────────────────────────────────────────────────
+async def _applied_versions(cur) -> List[int]:
+    await cur.execute("SELECT to_regclass('SchemaMigrations') IS NOT NULL;")
+    if not (await cur.fetchone())[0]:
+        return []
+    await cur.execute("SELECT version FROM SchemaMigrations ORDER BY version;")
+    return [r[0] for r in await cur.fetchall()]
+
+
+async def pending_migrations() -> List[Migration]:
+    async with async_autocommit() as cur:
+        applied = set(await _applied_versions(cur))
+    return [m for m in MIGRATIONS if m.version not in applied]
+
+
+async def migrate() -> List[str]:
+    """Applies every pending migration in order; concurrent runners wait on an advisory lock."""
+    applied: List[str] = []
+    async with async_autocommit() as cur:
+        await cur.execute("""
+            CREATE TABLE IF NOT EXISTS SchemaMigrations (
+                version INT PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            );
+        """)
+        await cur.execute("SELECT pg_advisory_lock(%s);", (_LOCK_ID,))
+        try:
+            done = set(await _applied_versions(cur))
+            for m in MIGRATIONS:
+                if m.version in done:
+                    continue
+                print(f"🧱 Migration {m.version:03d} {m.name}...")
+                started = time.perf_counter()
+                if m.transactional:
+                    async with cur.connection.transaction():
+                        await m.apply(cur)
+                        await cur.execute("INSERT INTO SchemaMigrations (version, name) VALUES (%s, %s);", (m.version, m.name))
+                else:
+                    await m.apply(cur)
+                    await cur.execute("INSERT INTO SchemaMigrations (version, name) VALUES (%s, %s);", (m.version, m.name))
+                print(f"✅ Migration {m.version:03d} {m.name} applied in {time.perf_counter() - started:.1f} s")
+                applied.append(f"{m.version:03d}_{m.name}")
+        finally:
+            await cur.execute("SELECT pg_advisory_unlock(%s);", (_LOCK_ID,))
+    return applied
+
+
+async def verify_schema() -> List[str]:
+    """Problems with the live schema: pending migrations, missing hot-path indexes, invalid indexes."""
+    problems = [f"migration {m.version:03d} {m.name} is pending" for m in await pending_migrations()]
+    async with async_autocommit() as cur:
+        for spec in HOT_INDEXES:
+            valid, _ = await _find_index(cur, spec)
+            if not valid:
+                problems.append(f"no valid index on {spec.table}({', '.join(spec.columns)})")
+        await cur.execute("""
+            SELECT i.indexrelid::regclass::text FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE NOT i.indisvalid AND n.nspname = current_schema();
+        """)
+        problems += [f"index {r[0]} is invalid (interrupted build?)" for r in await cur.fetchall()]
+    return problems
+
+
+async def require_current_schema():
+    """Startup guard: migrates if DB_AUTO_MIGRATE=1, otherwise refuses to run on an outdated schema."""
+    if DB_AUTO_MIGRATE:
+        await migrate()
+        return
+    pending = await pending_migrations()
+    if pending:
+        names = ", ".join(f"{m.version:03d}_{m.name}" for m in pending)
+        raise RuntimeError(
+            f"Database schema has {len(pending)} pending migration(s): {names}. "
+            "Run `python -m Functions.Migrations` before starting the app."
+        )
+
+
+async def _main(command: str) -> int:
+    await open_pool()
+    try:
+        if command == "status":
+            async with async_autocommit() as cur:
+                applied = set(await _applied_versions(cur))
+            for m in MIGRATIONS:
+                print(f"   {'✅' if m.version in applied else '⏳'} {m.version:03d} {m.name}")
+            return 0
+        if command == "upgrade":
+            applied = await migrate()
+            print(f"🧱 {len(applied)} migration(s) applied; schema at version {LATEST_VERSION}.")
+        problems = await verify_schema()
+        for problem in problems:
+            print(f"❌ {problem}")
+        if not problems:
+            print("✅ Schema verified.")
+        return 1 if problems else 0
+    finally:
+        await close_pool()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", nargs="?", default="upgrade", choices=("upgrade", "status", "verify"))
+    args = parser.parse_args()
+    sys.exit(asyncio.run(_main(args.command)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional
+
+from Functions.Database import async_autocommit
+from Functions.HotCache import lookup_user
+from Functions.TransactionPartitions import archived_months, month_start
+
+# ── Per-user monthly totals by category ─────────────────────────
+# One row per (user, month, category), bumped by the same statement that writes
+# the transaction (POST /transactions/add, bulk/statement ingest) and moved
+# between categories when the categorizer or a user re-categorizes a row. Reads
+# touch at most months × categories rows of the primary key, however long the
+# user's history is. Transactions without a category are kept under ''.
+# Rows for archived months (see TransactionPartitions) are the only live record
+# of those months, so rebuilds leave them alone.
+
+ANALYTICS_DEFAULT_MONTHS = 12
+ANALYTICS_MAX_MONTHS = 120
+
+# Appended to an INSERT INTO MonthlyRollups (user_id, month, category_id, income, expenses, tx_count)
+# ... SELECT; the SELECT must yield each key at most once.
+ROLLUP_UPSERT_SQL = """
+    ON CONFLICT (user_id, month, category_id) DO UPDATE SET
+        income = MonthlyRollups.income + EXCLUDED.income,
+        expenses = MonthlyRollups.expenses + EXCLUDED.expenses,
+        tx_count = MonthlyRollups.tx_count + EXCLUDED.tx_count
+"""
+
+_REBUILD_SQL = """
+    INSERT INTO MonthlyRollups (user_id, month, category_id, income, expenses, tx_count)
+    SELECT user_id, date_trunc('month', transaction_date)::date, COALESCE(category_id, ''),
+           SUM(GREATEST(amount, 0)), SUM(GREATEST(-amount, 0)), COUNT(*)
+    FROM Transactions
+    {tx_filter}
+    GROUP BY 1, 2, 3;
+"""
+
+
+async def init_monthly_rollups_table(cur):
+    """Creates MonthlyRollups and builds rows for users with transactions but no rollups yet."""
+    await cur.execute("""
+        CREATE TABLE IF NOT EXISTS MonthlyRollups (
+            user_id TEXT NOT NULL,
+            month DATE NOT NULL,
+            category_id TEXT NOT NULL,
+            income NUMERIC(14, 2) NOT NULL DEFAULT 0,
+            expenses NUMERIC(14, 2) NOT NULL DEFAULT 0,
+            tx_count BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, month, category_id)
+        );
+    """)
+    await cur.execute("""
+        SELECT a.user_id FROM UserAggregates a
+        WHERE a.transaction_count > 0
+          AND NOT EXISTS (SELECT 1 FROM MonthlyRollups r WHERE r.user_id = a.user_id);
+    """)
+    missing = [r[0] for r in await cur.fetchall()]
+    if missing:
+        print(f"💡 Backfilling MonthlyRollups for {len(missing)} user(s)...")
+        await rebuild_monthly_rollups(cur, missing)
+
+
+async def rebuild_monthly_rollups(cur, user_ids: Optional[Iterable[str]] = None):
+    """
+    Recomputes rollups of live months from Transactions — for every user, or
+    only `user_ids`. The users' UserAggregates rows are locked first, so
+    transaction writes for them (which all update that row) wait until the
+    rebuild commits instead of being lost or counted twice.
+    """
+    archived = await archived_months(cur)
+    if user_ids is None:
+        await cur.execute("SELECT 1 FROM UserAggregates FOR UPDATE;")
+        await cur.execute("DELETE FROM MonthlyRollups WHERE month <> ALL(%s::date[]);", (archived,))
+        await cur.execute(_REBUILD_SQL.format(tx_filter=""))
+        return
+    ids = list(user_ids)
+    await cur.execute("SELECT 1 FROM UserAggregates WHERE user_id = ANY(%s) FOR UPDATE;", (ids,))
+    await cur.execute(
+        "DELETE FROM MonthlyRollups WHERE user_id = ANY(%s) AND month <> ALL(%s::date[]);", (ids, archived)
+    )
+    await cur.execute(_REBUILD_SQL.format(tx_filter="WHERE user_id = ANY(%(ids)s)"), {"ids": ids})
+
+
+async def fetch_analytics(email: str, months: int = ANALYTICS_DEFAULT_MONTHS, today: Optional[date] = None) -> Optional[Dict[str, Any]]:
+    """
+    Monthly trend and category breakdown over the last `months` months
+    (the current one included), from MonthlyRollups only. Returns None for an
+    unknown user.
+    """
+    end = month_start(today or date.today())
+    start = month_start(end, months - 1)
+    async with async_autocommit() as cur:
+        user = await lookup_user(email, cur)
+        if user is None:
+            return None
+        await cur.execute("""
+            SELECT r.month, r.category_id, COALESCE(c.name, 'Other'),
+                   r.income::float8, r.expenses::float8, r.tx_count
+            FROM MonthlyRollups r
+            LEFT JOIN Categories c ON c.id = r.category_id
+            WHERE r.user_id = %(user_id)s AND r.month BETWEEN %(start)s AND %(end)s AND r.tx_count > 0
+            ORDER BY r.month, r.category_id;
+        """, {"user_id": user[0], "start": start, "end": end})
+        rows = await cur.fetchall()
+
+    month_keys = [month_start(end, back) for back in range(months - 1, -1, -1)]
+    position = {m: i for i, m in enumerate(month_keys)}
+    trend = [{"month": m, "income": 0.0, "expenses": 0.0, "net": 0.0, "transactions": 0} for m in month_keys]
+    categories: Dict[str, Dict[str, Any]] = {}
+    for month, category_id, name, income, expenses, count in rows:
+        point = trend[position[month]]
+        point["income"] += income
+        point["expenses"] += expenses
+        point["transactions"] += count
+        category = categories.setdefault(category_id, {
+            "category_id": category_id or None, "category": name,
+            "income": 0.0, "expenses": 0.0, "transactions": 0, "monthly_expenses": [0.0] * months,
+        })
+        category["income"] += income
+        category["expenses"] += expenses
+        category["transactions"] += count
+        category["monthly_expenses"][position[month]] = round(expenses, 2)
+
+    for point in trend:
+        point["net"] = round(point["income"] - point["expenses"], 2)
+        point["income"], point["expenses"] = round(point["income"], 2), round(point["expenses"], 2)
+    total_expenses = sum(point["expenses"] for point in trend)
+    breakdown: List[Dict[str, Any]] = sorted(categories.values(), key=lambda c: (-c["expenses"], -c["income"]))
+    for category in breakdown:
+        category["income"], category["expenses"] = round(category["income"], 2), round(category["expenses"], 2)
+        category["share_of_expenses"] = round(category["expenses"] / total_expenses, 4) if total_expenses else 0.0
+
+    return {
+        "start": start,
+        "end": end,
+        "months": trend,
+        "categories": breakdown,
+        "totals": {
+            "income": round(sum(point["income"] for point in trend), 2),
+            "expenses": round(total_expenses, 2),
+            "transactions": sum(point["transactions"] for point in trend),
+        },
+    }
@@ -0,0 +1,224 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from Functions.AnalysisCache import invalidate_analysis, invalidate_all_analyses
+from Functions.CreditScoring import score_batch
+from Functions.Database import async_transaction
+
+# ── Nightly re-score of every user ──────────────────────────────
+# Transactions re-score their own user as they are written; this catches
+# everyone else (rule changes, users who stopped posting, rows written by other
+# tools). One set-based query reads every user's totals and current score,
+# score_batch() scores them in one NumPy pass, and only the scores that changed
+# are COPYed back and applied with one UPDATE plus one INSERT (each also
+# appending the new scores to CreditScoreHistory).
+#   * A write is skipped if the user's transaction_count moved since the read,
+#     so a concurrent POST /transactions/add is never overwritten with an older score.
+#   * An advisory lock keeps it to one run at a time across app processes.
+#   * Re-scored users' cached analyses (and user-scoped chat answers) are invalidated.
+
+CREDIT_RESCORE_AT = os.getenv("CREDIT_RESCORE_AT", "03:00").strip()  # server-local HH:MM; empty disables
+_LOCK_ID = 720_018  # pg_advisory lock key held for the duration of a run
+# Past this many changed scores (e.g. after a rule change) caches are cleared
+# wholesale instead of user by user.
+_INVALIDATE_ALL_OVER = 10_000
+
+_scheduler: Optional[asyncio.Task] = None
+_stats: Dict[str, Any] = {"runs": 0, "skipped_locked": 0, "failures": 0, "last_run": None}
+
+# Every column comes back as one packed value (ids newline-joined, numbers as
+# big-endian binary), so a million users is one row to decode, not a million.
+# All aggregates in a query consume rows in the same order, so position i of
+# every column is the same user.
+_LOAD_SQL = """
+    SELECT string_agg(u.id, E'\\n'),
+           string_agg(float8send(COALESCE(a.total_income, 0)::float8), ''),
+           string_agg(float8send(COALESCE(a.total_expenses, 0)::float8), ''),
+           string_agg(float8send(COALESCE(a.balance, 0)::float8), ''),
+           string_agg(float8send(COALESCE(a.credit_limit, 0)::float8), ''),
+           string_agg(int8send(COALESCE(a.transaction_count, 0)), ''),
+           string_agg(int4send(COALESCE(cs.score, -1)), '')
+    FROM Users u
+    LEFT JOIN UserAggregates a ON a.user_id = u.id
+    LEFT JOIN LATERAL (
+        SELECT score FROM CreditScores
+        WHERE user_id = u.id
+        ORDER BY report_date DESC
+        LIMIT 1
+    ) cs ON true;
+"""
+
+
+async def init_credit_score_index(cur):
+    """
+    Index for finding a user's score, which every re-score (per-request and
+    nightly) does. Scores and dates are left out so their updates can stay HOT.
+    """
+    await cur.execute("CREATE INDEX IF NOT EXISTS credit_scores_user_idx ON CreditScores (user_id);")
+
+
+def unpack_totals(row) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]:
+    """
+    The _LOAD_SQL row → (user ids, float64 totals of shape (4, n),
+    transaction counts, current scores with -1 for none).
+    """
+    if row[0] is None:
+        return [], np.zeros((4, 0)), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int32)
+    ids = row[0].split("\n")
+    totals = np.stack([np.frombuffer(col, dtype=">f8") for col in row[1:5]]).astype(np.float64)
+    counts = np.frombuffer(row[5], dtype=">i8").astype(np.int64)
+    current = np.frombuffer(row[6], dtype=">i4").astype(np.int32)
+    return ids, totals, counts, current
+
+
+def format_scores(ids: List[str], scores: np.ndarray, counts: np.ndarray) -> bytes:
+    """(user_id, score, transaction_count) rows as text COPY input."""
+    return "".join(
+        f"{user_id}\t{score}\t{count}\n" for user_id, score, count in zip(ids, scores.tolist(), counts.tolist())
+    ).encode("utf-8")
+
+
+async def rescore_users(cur) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Re-scores every user inside the caller's transaction. Returns counts with
+    per-phase timings in ms, and the emails of users whose existing score changed.
+    """
+    timings: Dict[str, float] = {}
+    started = mark = time.perf_counter()
+
+    def lap(name: str):
+        nonlocal mark
+        now = time.perf_counter()
+        timings[name] = round((now - mark) * 1000, 1)
+        mark = now
+
+    await cur.execute(_LOAD_SQL, binary=True)
+    ids, totals, counts, current = unpack_totals(await cur.fetchone())
+    lap("load")
+
+    scores = score_batch(*totals)
+    changed = np.flatnonzero(scores != current)
+    lap("score")
+
+    emails: List[str] = []
+    updated = inserted = 0
+    if len(changed):
+        await cur.execute("""
+            CREATE TEMP TABLE rescored (user_id TEXT, score INT, transaction_count BIGINT) ON COMMIT DROP;
+        """)
+        async with cur.copy("COPY rescored FROM STDIN") as copy:
+            await copy.write(format_scores([ids[i] for i in changed], scores[changed], counts[changed]))
+        await cur.execute("ANALYZE rescored;")
+        lap("stage")
+        await cur.execute("""
+            WITH upd AS (
+                UPDATE CreditScores cs
+                SET score = r.score, report_date = CURRENT_DATE
+                FROM rescored r
+                JOIN Users u ON u.id = r.user_id
+                LEFT JOIN UserAggregates ua ON ua.user_id = r.user_id
+                WHERE cs.user_id = r.user_id
+                  AND COALESCE(ua.transaction_count, 0) = r.transaction_count
+                RETURNING cs.user_id, r.score, u.email
+            ),
+            history AS (
+                INSERT INTO CreditScoreHistory (user_id, score, source)
+                SELECT DISTINCT user_id, score, 'rescore' FROM upd
+            )
+            SELECT DISTINCT email FROM upd;
+        """)
+        emails = [row[0] for row in await cur.fetchall()]
+        updated = len(emails)
+        lap("update")
+        await cur.execute("""
+            WITH ins AS (
+                INSERT INTO CreditScores (id, user_id, score, report_date)
+                SELECT 'cs_' || substr(md5(random()::text || r.user_id), 1, 12), r.user_id, r.score, CURRENT_DATE
+                FROM rescored r
+                WHERE NOT EXISTS (SELECT 1 FROM CreditScores cs WHERE cs.user_id = r.user_id)
+                RETURNING user_id, score
+            )
+            INSERT INTO CreditScoreHistory (user_id, score, source)
+            SELECT user_id, score, 'rescore' FROM ins;
+        """)
+        inserted = cur.rowcount
+        lap("insert")
+
+    return {
+        "users": len(ids),
+        "changed": int(len(changed)),
+        "updated": updated,
+        "inserted": inserted,
+        "skipped_concurrent": int(len(changed)) - updated - inserted,
+        "ms": {**timings, "total": round((time.perf_counter() - started) * 1000, 1)},
+    }, emails
+
+
+async def rescore_all_users() -> Dict[str, Any]:
+    """One full re-score in its own transaction, unless another process is already running one."""
+    async with async_transaction() as cur:
+        await cur.execute("SELECT pg_try_advisory_xact_lock(%s);", (_LOCK_ID,))
+        if not (await cur.fetchone())[0]:
+            _stats["skipped_locked"] += 1
+            return {"skipped": "another re-score is running"}
+        result, emails = await rescore_users(cur)
+
+    if len(emails) > _INVALIDATE_ALL_OVER:
+        invalidate_all_analyses()
+    else:
+        for email in emails:
+            invalidate_analysis(email)
+    _stats["runs"] += 1
+    _stats["last_run"] = {**result, "finished_at": datetime.now().isoformat(timespec="seconds")}
+    return result
+
+
+# ── Scheduling ──────────────────────────────────────────────────
+def _seconds_until(at: str) -> float:
+    hour, minute = (int(x) for x in at.split(":"))
+    now = datetime.now()
+    target = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if target <= now:
+        target += timedelta(days=1)
+    return (target - now).total_seconds()
+
+
+async def _scheduler_loop(at: str):
+    while True:
+        await asyncio.sleep(_seconds_until(at))
+        try:
+            result = await rescore_all_users()
+            print("📈 Nightly re-score:", result)
+        except Exception as e:
+            _stats["failures"] += 1
+            print("⚠️ Nightly re-score failed:", e)
+
+
+def start_rescore_scheduler(at: str = CREDIT_RESCORE_AT):
+    """Runs rescore_all_users() every day at `at` (HH:MM, server-local time)."""
+    global _scheduler
+    if _scheduler is not None or not at:
+        return
+    _seconds_until(at)  # fail fast on a malformed time
+    _scheduler = asyncio.create_task(_scheduler_loop(at), name="credit-rescore")
+    print(f"📈 Nightly credit re-score scheduled for {at}.")
+
+
+async def stop_rescore_scheduler():
+    global _scheduler
+    if _scheduler is None:
+        return
+    _scheduler.cancel()
+    await asyncio.gather(_scheduler, return_exceptions=True)
+    _scheduler = None
+
+
+def get_rescore_stats() -> Dict[str, Any]:
+    stats = dict(_stats)
+    stats["scheduled_at"] = CREDIT_RESCORE_AT or None
+    return stats
@@ -0,0 +1,131 @@
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from Functions.Database import async_autocommit
+from Functions.HotCache import lookup_user
+
+# ── Credit score history ────────────────────────────────────────
+# CreditScores keeps one current row per user (the O(1) "latest" lookup, via
+# credit_scores_user_idx); every change to it is also appended here. Writers
+# append inside the statement that changes the score, and only when the score
+# actually moves, so a user posting daily without effect adds no rows.
+# The (user_id, recorded_at) index carries the score, so a user's range is one
+# index-only scan, and charts are downsampled in SQL before leaving the database.
+
+HISTORY_DEFAULT_DAYS = 365
+HISTORY_RAW_LIMIT = 1000
+BUCKETS = ("raw", "day", "week", "month")
+
+
+async def init_score_history_table(cur):
+    """Creates CreditScoreHistory and seeds it with the current score of users that have none."""
+    await cur.execute("""
+        CREATE TABLE IF NOT EXISTS CreditScoreHistory (
+            user_id TEXT NOT NULL,
+            recorded_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            score INT NOT NULL,
+            source TEXT NOT NULL
+        );
+    """)
+    await cur.execute("""
+        CREATE INDEX IF NOT EXISTS credit_score_history_user_time_idx
+        ON CreditScoreHistory (user_id, recorded_at) INCLUDE (score);
+    """)
+    await cur.execute("""
+        INSERT INTO CreditScoreHistory (user_id, recorded_at, score, source)
+        SELECT cs.user_id, COALESCE(cs.report_date::timestamptz, now()), cs.score, 'backfill'
+        FROM CreditScores cs
+        WHERE cs.score IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM CreditScoreHistory h WHERE h.user_id = cs.user_id);
+    """)
+    if cur.rowcount:
+        print(f"💡 Backfilled CreditScoreHistory with {cur.rowcount} current score(s).")
+
+
+def choose_bucket(start: date, end: date) -> str:
+    """Resolution that keeps a chart of this span to a few hundred points at most."""
+    days = (end - start).days
+    if days <= 92:
+        return "day"
+    if days <= 2 * 366:
+        return "week"
+    return "month"
+
+
+async def fetch_score_history(
+    email: str,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    bucket: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    The user's scores from `start` to `end` (inclusive dates, default the last
+    HISTORY_DEFAULT_DAYS). Per bucket: the closing score plus min/max and the
+    number of changes; "raw" returns the changes themselves. `opening` is the
+    score in effect at `start`, so a chart can begin before the first change.
+    Returns None for an unknown user.
+    """
+    end = end or date.today()
+    start = start or end - timedelta(days=HISTORY_DEFAULT_DAYS)
+    bucket = bucket or choose_bucket(start, end)
+    start_at = datetime.combine(start, time.min, tzinfo=timezone.utc)
+    end_at = datetime.combine(end + timedelta(days=1), time.min, tzinfo=timezone.utc)
+
+    async with async_autocommit() as cur:
+        user = await lookup_user(email, cur)
+        if user is None:
+            return None
+        user_id = user[0]
+        await cur.execute("""
+            SELECT cs.score, cs.report_date,
+                   (SELECT h.score FROM CreditScoreHistory h
+                    WHERE h.user_id = %(user_id)s AND h.recorded_at < %(start)s
+                    ORDER BY h.recorded_at DESC LIMIT 1)
+            FROM (SELECT 1) one
+            LEFT JOIN LATERAL (
+                SELECT score, report_date FROM CreditScores
+                WHERE user_id = %(user_id)s
+                ORDER BY report_date DESC
+                LIMIT 1
+            ) cs ON true;
+        """, {"user_id": user_id, "start": start_at})
+        latest_score, latest_date, opening = await cur.fetchone()
+
+        params = {"user_id": user_id, "start": start_at, "end": end_at, "unit": bucket, "limit": HISTORY_RAW_LIMIT}
+        if bucket == "raw":
+            await cur.execute("""
+                SELECT recorded_at, score, source
+                FROM CreditScoreHistory
+                WHERE user_id = %(user_id)s AND recorded_at >= %(start)s AND recorded_at < %(end)s
+                ORDER BY recorded_at
+                LIMIT %(limit)s;
+            """, params)
+            points: List[Dict[str, Any]] = [
+                {"at": at, "score": score, "source": source} for at, score, source in await cur.fetchall()
+            ]
+        else:
+            # Buckets are cut and labelled in UTC, whatever the session time zone, so the
+            # same request always gives the same points.
+            await cur.execute("""
+                SELECT date_trunc(%(unit)s, recorded_at AT TIME ZONE 'UTC')::date AS bucket,
+                       (array_agg(score ORDER BY recorded_at DESC))[1] AS close,
+                       min(score), max(score), count(*)
+                FROM CreditScoreHistory
+                WHERE user_id = %(user_id)s AND recorded_at >= %(start)s AND recorded_at < %(end)s
+                GROUP BY 1
+                ORDER BY 1;
+            """, params)
+            points = [
+                {"date": day, "score": close, "min": low, "max": high, "changes": changes}
+                for day, close, low, high, changes in await cur.fetchall()
+            ]
+
+    return {
+        "latest": {"score": latest_score, "date": latest_date} if latest_score is not None else None,
+        "start": start,
+        "end": end,
+        "bucket": bucket,
+        "opening": opening,
+        "points": points,
+        "truncated": bucket == "raw" and len(points) == HISTORY_RAW_LIMIT,
+    }
@@ -0,0 +1,108 @@
+import os
+from datetime import date
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from Functions.CreditScoring import score_batch
+from Functions.MonthlyRollups import month_start
+
+# ── "What-if" credit score projections ──────────────────────────
+# Monte Carlo over the user's own months: every path draws each future month's
+# (income, expenses) pair from the user's recent complete months (bootstrap, so
+# irregular pay and lumpy spending carry over as they really happened), applies
+# the hypothetical changes, accumulates onto today's totals and scores every
+# (path, month) cell with the same rules as POST /transactions/add. All of it
+# is array math over a (paths × months) grid; there is no per-path loop.
+
+SIM_HISTORY_MONTHS = int(os.getenv("SIM_HISTORY_MONTHS", "12"))
+SIM_MAX_PATHS = int(os.getenv("SIM_MAX_PATHS", "20000"))
+SIM_MAX_MONTHS = int(os.getenv("SIM_MAX_MONTHS", "36"))
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+async def load_monthly_history(cur, user_id: str, today: Optional[date] = None) -> np.ndarray:
+    """
+    (income, expenses) per complete month over the last SIM_HISTORY_MONTHS, as an
+    (n, 2) array. Months without transactions count as zero, from the user's first
+    month in the window on; a user with no complete month yet gets an empty array.
+    """
+    this_month = month_start(today or date.today())
+    await cur.execute("""
+        SELECT month, SUM(income), SUM(expenses)
+        FROM MonthlyRollups
+        WHERE user_id = %s AND month >= %s AND month < %s
+        GROUP BY 1;
+    """, (user_id, month_start(this_month, SIM_HISTORY_MONTHS), this_month))
+    by_month = {month: (float(inc), float(exp)) for month, inc, exp in await cur.fetchall()}
+    if not by_month:
+        return np.zeros((0, 2))
+    first = min(by_month)
+    span = (this_month.year - first.year) * 12 + this_month.month - first.month
+    return np.array([by_month.get(month_start(this_month, back), (0.0, 0.0)) for back in range(span, 0, -1)])
+
+
+def simulate_scores(
+    totals: Dict[str, float],
+    history: np.ndarray,
+    *,
+    months: int = 12,
+    paths: int = 10_000,
+    monthly_income_change: float = 0.0,
+    monthly_expense_change: float = 0.0,
+    expense_scale: float = 1.0,
+    credit_limit_change: float = 0.0,
+    one_off: Sequence[Tuple[int, float]] = (),
+    seed: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Projects the score `months` ahead over `paths` simulated futures.
+    `totals` are the user's current income/expenses/balance/credit_limit sums,
+    `history` the (n, 2) monthly pairs from load_monthly_history(). `one_off`
+    holds (month, signed amount) extras: positive is income, negative spending.
+    Returns per-month percentile bands and the distribution of the final score.
+    """
+    rng = np.random.default_rng(seed)
+    if len(history):
+        drawn = history[rng.integers(0, len(history), size=(paths, months))]
+        income, expenses = drawn[..., 0], drawn[..., 1]
+    else:
+        income = expenses = np.zeros((paths, months))
+
+    income = np.maximum(income + monthly_income_change, 0.0)
+    expenses = np.maximum(expenses * expense_scale + monthly_expense_change, 0.0)
+    extra_income, extra_expenses = np.zeros(months), np.zeros(months)
+    for month, amount in one_off:
+        if 1 <= month <= months:
+            (extra_income if amount > 0 else extra_expenses)[month - 1] += abs(amount)
+    income, expenses = income + extra_income, expenses + extra_expenses
+
+    cum_income = totals["income"] + np.cumsum(income, axis=1)
+    cum_expenses = totals["expenses"] + np.cumsum(expenses, axis=1)
+    balance = totals["balance"] + np.cumsum(income - expenses, axis=1)
+    limit = np.full_like(balance, totals["credit_limit"] + credit_limit_change)
+    scores = score_batch(cum_income, cum_expenses, balance, limit)
+
+    current = int(score_batch([totals["income"]], [totals["expenses"]], [totals["balance"]], [totals["credit_limit"]])[0])
+    bands = np.percentile(scores, PERCENTILES, axis=0, method="nearest")
+    means = scores.mean(axis=0)
+    final_values, final_counts = np.unique(scores[:, -1], return_counts=True)
+    return {
+        "current_score": current,
+        "months": months,
+        "paths": paths,
+        "history_months": len(history),
+        "baseline": {
+            "monthly_income_mean": round(float(history[:, 0].mean()), 2) if len(history) else 0.0,
+            "monthly_expense_mean": round(float(history[:, 1].mean()), 2) if len(history) else 0.0,
+        },
+        "bands": [
+            {"month": m + 1, **{f"p{p}": int(bands[i, m]) for i, p in enumerate(PERCENTILES)}, "mean": round(float(means[m]), 1)}
+            for m in range(months)
+        ],
+        "final": {
+            "p_above_current": round(float((scores[:, -1] > current).mean()), 4),
+            "p_below_current": round(float((scores[:, -1] < current).mean()), 4),
+            "distribution": {int(v): round(int(c) / paths, 4) for v, c in zip(final_values, final_counts)},
+        },
+    }
@@ -0,0 +1,96 @@
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+# ── Request coalescing (single-flight) ──────────────────────────
+# Concurrent calls for the same key share ONE in-flight computation: the first
+# caller starts it as a task, later callers await that same task. Each waiter
+# has its own timeout and may give up (or be cancelled) without affecting the
+# others; the shared task is only cancelled once nobody is waiting for it.
+# Results are handed to every waiter as-is, so treat them as read-only.
+
+SINGLEFLIGHT_TIMEOUT_S = float(os.getenv("SINGLEFLIGHT_TIMEOUT_S", "10"))
+
+_groups: Dict[str, "SingleFlight"] = {}
+
+
+class FlightTimeout(asyncio.TimeoutError):
+    """A waiter's timeout expired before the shared computation finished."""
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """One named group of coalesced calls, e.g. SingleFlight("database_info")."""
+
+    def __init__(self, name: str, timeout: float = SINGLEFLIGHT_TIMEOUT_S):
+        self.name = name
+        self.timeout = timeout
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._stats = {"calls": 0, "executions": 0, "coalesced": 0, "timeouts": 0, "errors": 0, "max_waiters": 0}
+        _groups[name] = self
+
+    async def do(
+        self,
+        key: Hashable,
+        fn: Callable[..., Awaitable[Any]],
+        *args,
+        timeout: Optional[float] = None,
+        **kwargs,
+    ) -> Any:
+        """
+        Returns fn(*args, **kwargs), sharing the call with any in-flight one for `key`.
+        Raises FlightTimeout after `timeout` (default: the group's) seconds; errors
+        raised by fn reach every waiter.
+        """
+        self._stats["calls"] += 1
+        flight = self._flights.get(key)
+        if flight is None:
+            self._stats["executions"] += 1
+            flight = _Flight(asyncio.ensure_future(fn(*args, **kwargs)))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda task, key=key, flight=flight: self._finish(key, flight, task))
+        else:
+            self._stats["coalesced"] += 1
+
+        flight.waiters += 1
+        self._stats["max_waiters"] = max(self._stats["max_waiters"], flight.waiters)
+        limit = timeout if timeout is not None else self.timeout
+        try:
+            # shield(): one waiter timing out must not cancel the task for the rest.
+            return await asyncio.wait_for(asyncio.shield(flight.task), limit)
+        except asyncio.TimeoutError:
+            if flight.task.done():
+                raise  # fn itself raised the timeout
+            self._stats["timeouts"] += 1
+            raise FlightTimeout(f"{self.name} did not finish within {limit:g}s.") from None
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+
+    def _finish(self, key: Hashable, flight: _Flight, task: asyncio.Task):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        # Retrieve the exception so an unawaited failure is not logged as "never retrieved".
+        if not task.cancelled() and task.exception() is not None:
+            self._stats["errors"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats["in_flight"] = len(self._flights)
+        stats["timeout_s"] = self.timeout
+        calls = stats["calls"]
+        stats["coalesced_ratio"] = round(stats["coalesced"] / calls, 3) if calls else 0.0
+        return stats
+
+
+def get_singleflight_stats() -> Dict[str, Any]:
+    """Per-group counters: how many calls ran vs. were coalesced onto an in-flight one."""
+    return {name: group.stats() for name, group in _groups.items()}
@@ -0,0 +1,238 @@
+import csv
+import hashlib
+import re
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+# ── Streaming bank-statement parsing (CSV / OFX) ────────────────
+# Both parsers read the file line by line and yield one dict per transaction,
+# so memory stays flat regardless of file size. Rows carry a content hash used
+# to skip transactions that were already imported from an earlier statement.
+
+IMPORT_BATCH_SIZE = 2000
+DEDUP_WINDOW_DAYS = 62
+
+_DATE_HEADERS = ("transaction_date", "date", "posted date", "posting date", "transaction date", "booking date")
+_DESCRIPTION_HEADERS = ("description", "details", "memo", "payee", "name", "narrative", "merchant")
+_AMOUNT_HEADERS = ("amount", "transaction amount", "value")
+_DEBIT_HEADERS = ("debit", "withdrawal", "withdrawals", "money out", "paid out")
+_CREDIT_HEADERS = ("credit", "deposit", "deposits", "money in", "paid in")
+_CATEGORY_HEADERS = ("category_id",)
+_ID_HEADERS = ("id", "transaction id", "reference", "fitid")
+
+_DATE_FORMATS = ("%Y-%m-%d", "%m/%d/%Y", "%d/%m/%Y", "%Y/%m/%d", "%d-%m-%Y", "%m/%d/%y", "%d.%m.%Y")
+
+_OFX_TAG = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<\r\n]*)")
+
+
+class StatementRowError(ValueError):
+    """A single statement row could not be mapped onto a transaction."""
+
+    def __init__(self, line: int, message: str):
+        super().__init__(f"line {line}: {message}")
+        self.line = line
+
+
+def detect_format(filename: Optional[str], explicit: Optional[str] = None) -> str:
+    """Returns 'csv' or 'ofx' from an explicit format or the file extension."""
+    fmt = (explicit or "").lower()
+    if not fmt and filename:
+        ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+        fmt = "ofx" if ext in ("ofx", "qfx") else "csv" if ext in ("csv", "txt") else ""
+    if fmt not in ("csv", "ofx"):
+        raise ValueError("Unsupported statement format — use CSV or OFX.")
+    return fmt
+
+
+def iter_statement(text: TextIO, fmt: str) -> Iterator[Any]:
+    """Yields transaction dicts (or StatementRowError for rows that cannot be mapped)."""
+    rows = _iter_csv(text) if fmt == "csv" else _iter_ofx(text)
+    return _with_content_hash(rows)
+
+
+def iter_batches(items: Iterable[Any], size: int = IMPORT_BATCH_SIZE) -> Iterator[List[Any]]:
+    """Groups an iterator into lists of at most `size` items."""
+    batch: List[Any] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# ── CSV ─────────────────────────────────────────────────────────
+def _iter_csv(text: TextIO) -> Iterator[Any]:
+    reader = csv.reader(text)
+    header = next(reader, None)
+    if not header:
+        return
+    columns = _map_csv_columns([h.strip().lower() for h in header])
+
+    for row in reader:
+        line = reader.line_num
+        if not any(cell.strip() for cell in row):
+            continue
+        try:
+            yield _csv_row_to_transaction(row, columns, line)
+        except StatementRowError as e:
+            yield e
+
+
+def _map_csv_columns(header: List[str]) -> Dict[str, Optional[int]]:
+    def find(names: Tuple[str, ...]) -> Optional[int]:
+        for name in names:
+            if name in header:
+                return header.index(name)
+        return None
+
+    columns = {
+        "date": find(_DATE_HEADERS),
+        "description": find(_DESCRIPTION_HEADERS),
+        "amount": find(_AMOUNT_HEADERS),
+        "debit": find(_DEBIT_HEADERS),
+        "credit": find(_CREDIT_HEADERS),
+        "category_id": find(_CATEGORY_HEADERS),
+        "external_id": find(_ID_HEADERS),
+    }
+    if columns["date"] is None:
+        raise ValueError("CSV header has no date column.")
+    if columns["amount"] is None and columns["debit"] is None and columns["credit"] is None:
+        raise ValueError("CSV header has no amount (or debit/credit) column.")
+    return columns
+
+
+def _csv_row_to_transaction(row: List[str], columns: Dict[str, Optional[int]], line: int) -> Dict[str, Any]:
+    def cell(key: str) -> str:
+        idx = columns[key]
+        return row[idx].strip() if idx is not None and idx < len(row) else ""
+
+    if columns["amount"] is not None:
+        amount = _parse_amount(cell("amount"), line)
+    else:
+        debit, credit = cell("debit"), cell("credit")
+        amount = (_parse_amount(credit, line) if credit else Decimal(0)) - (abs(_parse_amount(debit, line)) if debit else Decimal(0))
+
+    return {
+        "amount": amount,
+        "description": cell("description") or "Imported transaction",
+        "transaction_date": _parse_date(cell("date"), line),
+        "category_id": cell("category_id") or None,
+        "external_id": cell("external_id") or None,
+        "line": line,
+    }
+
+
+# ── OFX (SGML 1.x and XML 2.x) ──────────────────────────────────
+def _iter_ofx(text: TextIO) -> Iterator[Any]:
+    current: Optional[Dict[str, str]] = None
+    start_line = 0
+    for line_no, line in enumerate(text, start=1):
+        for closing, tag, value in _OFX_TAG.findall(line):
+            tag = tag.upper()
+            if tag == "STMTTRN":
+                if current is not None:
+                    # SGML allows the closing tag to be omitted.
+                    yield _ofx_to_transaction(current, start_line)
+                current = None if closing else {}
+                start_line = line_no
+            elif current is not None and not closing and value.strip():
+                current[tag] = value.strip()
+    if current is not None:
+        yield _ofx_to_transaction(current, start_line)
+
+
+def _ofx_to_transaction(fields: Dict[str, str], line: int) -> Any:
+    try:
+        if "TRNAMT" not in fields or "DTPOSTED" not in fields:
+            raise StatementRowError(line, "STMTTRN without TRNAMT/DTPOSTED")
+        description = fields.get("NAME") or fields.get("MEMO") or "Imported transaction"
+        if fields.get("MEMO") and fields.get("NAME") and fields["MEMO"] != fields["NAME"]:
+            description = f"{fields['NAME']} — {fields['MEMO']}"
+        return {
+            "amount": _parse_amount(fields["TRNAMT"], line),
+            "description": description,
+            "transaction_date": _parse_ofx_date(fields["DTPOSTED"], line),
+            "category_id": None,
+            "external_id": fields.get("FITID"),
+            "line": line,
+        }
+    except StatementRowError as e:
+        return e
+
+
+# ── Field parsing ───────────────────────────────────────────────
+def _parse_amount(raw: str, line: int) -> Decimal:
+    cleaned = raw.replace(",", "").replace("$", "").replace("£", "").replace("€", "").strip()
+    negative = cleaned.startswith("(") and cleaned.endswith(")")
+    cleaned = cleaned.strip("()").strip()
+    if cleaned.endswith("-"):
+        negative, cleaned = True, cleaned[:-1]
+    try:
+        value = Decimal(cleaned)
+    except InvalidOperation:
+        raise StatementRowError(line, f"invalid amount {raw!r}")
+    return -abs(value) if negative else value
+
+
+def _parse_date(raw: str, line: int) -> date:
+    parsed = _cached_date(raw)
+    if parsed is None:
+        raise StatementRowError(line, f"unrecognised date {raw!r}")
+    return parsed
+
+
+def _parse_ofx_date(raw: str, line: int) -> date:
+    parsed = _cached_date(raw[:8], ("%Y%m%d",))
+    if parsed is None:
+        raise StatementRowError(line, f"unrecognised OFX date {raw!r}")
+    return parsed
+
+
+@lru_cache(maxsize=8192)
+def _cached_date(raw: str, formats: Tuple[str, ...] = _DATE_FORMATS) -> Optional[date]:
+    # A statement covers a few hundred distinct days, so strptime runs once per day, not per row.
+    for fmt in formats:
+        try:
+            return datetime.strptime(raw, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+# ── Deduplication hash ──────────────────────────────────────────
+def _with_content_hash(rows: Iterator[Any]) -> Iterator[Any]:
+    """
+    Adds `content_hash` to every parsed row. The bank's own id (FITID / reference)
+    is used when present; otherwise date, amount and normalised description, plus an
+    occurrence counter so two identical purchases on the same day both survive.
+    Counters are kept for the DEDUP_WINDOW_DAYS most recently seen dates only —
+    statements are date-ordered, and this keeps memory flat for huge files.
+    """
+    seen: "OrderedDict[date, Dict[str, int]]" = OrderedDict()
+    for row in rows:
+        if isinstance(row, StatementRowError):
+            yield row
+            continue
+        if row["external_id"]:
+            key = f"id|{row['external_id']}"
+        else:
+            day = row["transaction_date"]
+            counters = seen.get(day)
+            if counters is None:
+                counters = seen[day] = {}
+                if len(seen) > DEDUP_WINDOW_DAYS:
+                    seen.popitem(last=False)
+            else:
+                seen.move_to_end(day)
+            description = " ".join(row["description"].lower().split())
+            key = f"{day.isoformat()}|{row['amount']:.2f}|{description}"
+            occurrence = counters.get(key, 0)
+            counters[key] = occurrence + 1
+            key = f"{key}|{occurrence}"
+        row["content_hash"] = hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+        yield row
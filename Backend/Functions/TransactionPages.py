@@ -0,0 +1,146 @@
+import base64
+from datetime import date
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from Functions.Database import async_server_cursor
+from Functions.HotCache import lookup_user
+
+# ── Keyset pagination over a user's transactions ────────────────
+# Pages are ordered by (transaction_date DESC, id DESC) and continue from an
+# opaque cursor holding the last row's key, so page N costs the same as page 1
+# (no OFFSET). The NDJSON stream walks the same order through a server-side
+# cursor; Postgres renders each row as JSON, so Python only forwards bytes.
+# The email is resolved through the hot cache, so queries filter on user_id.
+
+PAGE_DEFAULT_LIMIT = 50
+PAGE_MAX_LIMIT = 500
+
+_COLUMNS_SQL = """
+    SELECT t.id, t.amount, t.description, t.transaction_date, COALESCE(c.name, 'Other') AS category_name
+    FROM Transactions t
+    LEFT JOIN Categories c ON t.category_id = c.id
+"""
+
+_JSON_COLUMNS_SQL = """
+    SELECT json_build_object(
+        'id', t.id,
+        'amount', t.amount::float8,
+        'description', t.description,
+        'transaction_date', t.transaction_date,
+        'category', COALESCE(c.name, 'Other')
+    )::text
+    FROM Transactions t
+    LEFT JOIN Categories c ON t.category_id = c.id
+"""
+
+
+async def init_transaction_indexes(cur):
+    """Index backing the per-user (transaction_date, id) keyset order."""
+    await cur.execute("""
+        CREATE INDEX IF NOT EXISTS transactions_user_date_id_idx
+        ON Transactions (user_id, transaction_date, id);
+    """)
+
+
+def encode_cursor(transaction_date: date, tx_id: str) -> str:
+    raw = f"{transaction_date.isoformat()}|{tx_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[date, str]:
+    """Raises ValueError for anything that is not a cursor we issued."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        day, tx_id = raw.split("|", 1)
+        return date.fromisoformat(day), tx_id
+    except Exception:
+        raise ValueError("Invalid cursor.")
+
+
+def _where(
+    user_id: str,
+    cursor: Optional[str],
+    start_date: Optional[date],
+    end_date: Optional[date],
+    category_id: Optional[str],
+) -> Tuple[str, Dict[str, Any]]:
+    # Only the filters actually given go into the SQL, so every shape gets its own tight plan.
+    clauses = ["t.user_id = %(user_id)s"]
+    params: Dict[str, Any] = {"user_id": user_id}
+    if cursor:
+        params["cursor_date"], params["cursor_id"] = decode_cursor(cursor)
+        clauses.append("(t.transaction_date, t.id) < (%(cursor_date)s, %(cursor_id)s)")
+        # Row comparisons don't prune partitions; this plain bound does.
+        clauses.append("t.transaction_date <= %(cursor_date)s")
+    if start_date:
+        clauses.append("t.transaction_date >= %(start_date)s")
+        params["start_date"] = start_date
+    if end_date:
+        clauses.append("t.transaction_date <= %(end_date)s")
+        params["end_date"] = end_date
+    if category_id:
+        clauses.append("t.category_id = %(category_id)s")
+        params["category_id"] = category_id
+    return "WHERE " + " AND ".join(clauses), params
+
+
+async def fetch_transaction_page(
+    cur,
+    email: str,
+    *,
+    limit: int = PAGE_DEFAULT_LIMIT,
+    cursor: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    category_id: Optional[str] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Returns (transactions, next_cursor); next_cursor is None on the last page (or for an unknown user)."""
+    user = await lookup_user(email, cur)
+    if user is None:
+        return [], None
+    where, params = _where(user[0], cursor, start_date, end_date, category_id)
+    params["limit"] = limit + 1  # one extra row tells us whether another page exists
+    await cur.execute(
+        f"{_COLUMNS_SQL} {where} ORDER BY t.transaction_date DESC, t.id DESC LIMIT %(limit)s;",
+        params,
+    )
+    rows = await cur.fetchall()
+    next_cursor = encode_cursor(rows[limit - 1][3], rows[limit - 1][0]) if len(rows) > limit else None
+    transactions = [
+        {
+            "id": r[0],
+            "amount": float(r[1]),
+            "description": r[2],
+            "transaction_date": r[3],
+            "category": r[4],
+        }
+        for r in rows[:limit]
+    ]
+    return transactions, next_cursor
+
+
+async def stream_transactions_ndjson(
+    email: str,
+    *,
+    batch_size: int = PAGE_MAX_LIMIT,
+    cursor: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    category_id: Optional[str] = None,
+) -> AsyncIterator[bytes]:
+    """
+    Yields the matching transactions as NDJSON, `batch_size` rows per fetch.
+    Holds one pooled connection until the stream finishes or the client goes away.
+    An unknown user gets an empty stream.
+    """
+    user = await lookup_user(email)
+    if user is None:
+        return
+    where, params = _where(user[0], cursor, start_date, end_date, category_id)
+    async with async_server_cursor("transactions_stream", itersize=batch_size) as cur:
+        await cur.execute(f"{_JSON_COLUMNS_SQL} {where} ORDER BY t.transaction_date DESC, t.id DESC;", params)
+        while True:
+            rows = await cur.fetchmany(batch_size)
+            if not rows:
+                break
+            yield ("\n".join(r[0] for r in rows) + "\n").encode("utf-8")
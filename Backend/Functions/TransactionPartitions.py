@@ -0,0 +1,519 @@
+"""
+Monthly partitions of Transactions and their Parquet archive.
+
+    python -m Functions.TransactionPartitions            # one maintenance run now
+    python -m Functions.TransactionPartitions status     # live partitions and archived months
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+from psycopg import errors
+
+from Functions.Database import async_autocommit, async_transaction, open_pool, close_pool
+from Functions.HotCache import lookup_user
+
+# ── Range partitions by month ───────────────────────────────────
+# Transactions is partitioned on transaction_date, one partition per month
+# (transactions_yYYYYmMM), so date-bounded reads prune to the months they
+# cover and vacuum / index upkeep works on one month's rows at a time.
+#   • The nightly maintenance run keeps partitions in place for the live window
+#     (TX_ARCHIVE_AFTER_MONTHS back, or from this month while archival is off,
+#     to TX_PARTITIONS_AHEAD ahead). Writers call
+#     ensure_partitions() for anything outside it before they open their own
+#     transaction or start staging rows. Months inside the window are
+#     cached per process once seen, so that is normally a set lookup; months
+#     before it are checked in the database every time, as another process's
+#     maintenance run may archive them at any point.
+#   • Once TX_ARCHIVE_DIR is set, partitions older than the window are exported
+#     to one Parquet file per month (sorted by user, date), recorded in
+#     TransactionArchive, then detached and dropped. Their totals stay in
+#     MonthlyRollups/UserAggregates, and archived months are read-only: writes
+#     dated in them are refused.
+#     Empty old partitions are simply dropped and recreated on demand.
+# The primary key is (id, transaction_date), as a partitioned table's unique
+# keys must include the partition column.
+
+# Where archived months go: an absolute path on storage every server reads (a shared
+# mount) or an object-store URI (s3://bucket/prefix, gs://bucket/prefix). Archival is
+# off until it is set, as the dropped rows would otherwise live on one machine's disk.
+TX_ARCHIVE_DIR = os.getenv("TX_ARCHIVE_DIR", "").strip().rstrip("/")
+TX_ARCHIVE_AFTER_MONTHS = int(os.getenv("TX_ARCHIVE_AFTER_MONTHS", "24"))  # 0 keeps everything live
+TX_PARTITIONS_AHEAD = int(os.getenv("TX_PARTITIONS_AHEAD", "3"))
+TX_MAINTENANCE_AT = os.getenv("TX_MAINTENANCE_AT", "04:00").strip()  # server-local HH:MM; empty disables
+ARCHIVE_BATCH_ROWS = int(os.getenv("TX_ARCHIVE_BATCH_ROWS", "100000"))  # rows per fetch and per row group
+# Detaching needs a brief ACCESS EXCLUSIVE lock on Transactions; rather than queue
+# every request behind a long-running reader, give up and retry on the next run.
+ARCHIVE_LOCK_TIMEOUT = "5s"
+_LOCK_ID = 720_024  # pg_advisory lock key held for a maintenance run
+_CREATE_LOCK_ID = 720_025  # pg_advisory xact lock key serializing partition creation
+
+ARCHIVE_COLUMNS = (
+    "id", "user_id", "account_id", "category_id", "category_source",
+    "amount", "description", "transaction_date", "content_hash",
+)
+ARCHIVE_SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("user_id", pa.string()),
+    ("account_id", pa.string()),
+    ("category_id", pa.string()),
+    ("category_source", pa.string()),
+    ("amount", pa.decimal128(12, 2)),
+    ("description", pa.string()),
+    ("transaction_date", pa.date32()),
+    ("content_hash", pa.string()),
+])
+
+_known_months = set()
+_scheduler: Optional[asyncio.Task] = None
+_stats: Dict[str, Any] = {
+    "partitions_created": 0,
+    "months_archived": 0,
+    "rows_archived": 0,
+    "bytes_archived": 0,
+    "runs": 0,
+    "skipped_locked": 0,
+    "failures": 0,
+    "last_run": None,
+}
+
+
+class ArchivedMonth(ValueError):
+    """Raised for writes dated in a month whose partition has been archived."""
+
+    def __init__(self, months: List[date]):
+        super().__init__(
+            f"Transactions for {', '.join(m.strftime('%Y-%m') for m in months)} are archived and read-only."
+        )
+        self.months = months
+
+
+def month_start(day: date, back: int = 0) -> date:
+    """First day of `day`'s month, `back` months earlier (negative: later)."""
+    months = day.year * 12 + day.month - 1 - back
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"transactions_y{month.year:04d}m{month.month:02d}"
+
+
+def archive_enabled() -> bool:
+    return bool(TX_ARCHIVE_DIR) and TX_ARCHIVE_AFTER_MONTHS > 0
+
+
+def archive_path(month: date) -> str:
+    return f"{TX_ARCHIVE_DIR}/{month:%Y-%m}.parquet"
+
+
+def live_window(today: Optional[date] = None) -> Tuple[date, date]:
+    """(first, last) month kept as live partitions."""
+    this_month = month_start(today or date.today())
+    first = month_start(this_month, TX_ARCHIVE_AFTER_MONTHS) if archive_enabled() else this_month
+    return first, month_start(this_month, -TX_PARTITIONS_AHEAD)
+
+
+def _months(first: date, last: date) -> List[date]:
+    months, month = [], first
+    while month <= last:
+        months.append(month)
+        month = month_start(month, -1)
+    return months
+
+
+# ── Schema ──────────────────────────────────────────────────────
+async def init_transaction_partitions(cur):
+    """
+    Creates TransactionArchive and, if Transactions is still a plain table,
+    rebuilds it as a partitioned one: rows are copied into monthly partitions,
+    then the keys, indexes and foreign keys are recreated on the new table.
+    """
+    await cur.execute("""
+        CREATE TABLE IF NOT EXISTS TransactionArchive (
+            month DATE PRIMARY KEY,
+            path TEXT,
+            row_count BIGINT NOT NULL,
+            bytes BIGINT NOT NULL DEFAULT 0,
+            archived_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+    """)
+    await cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass('Transactions');")
+    if (await cur.fetchone())[0] == "p":
+        return
+
+    await cur.execute("""
+        SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+        WHERE conrelid = 'Transactions'::regclass AND contype = 'f';
+    """)
+    foreign_keys = await cur.fetchall()
+    await cur.execute("SELECT min(transaction_date), max(transaction_date), count(*) FROM Transactions;")
+    oldest, newest, rows = await cur.fetchone()
+    print(f"🧱 Partitioning Transactions by month ({rows} row(s))...")
+
+    await cur.execute("ALTER TABLE Transactions RENAME TO transactions_unpartitioned;")
+    await cur.execute("""
+        CREATE TABLE Transactions (LIKE transactions_unpartitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+        PARTITION BY RANGE (transaction_date);
+    """)
+    first, last = live_window()
+    for month in _months(min(first, month_start(oldest or first)), max(last, month_start(newest or last))):
+        await _create_partition(cur, month)
+    await cur.execute("INSERT INTO Transactions SELECT * FROM transactions_unpartitioned;")
+    await cur.execute("DROP TABLE transactions_unpartitioned;")
+
+    # Built after the copy: one index build per partition instead of row-by-row upkeep.
+    await cur.execute("ALTER TABLE Transactions ADD CONSTRAINT transactions_pkey PRIMARY KEY (id, transaction_date);")
+    await cur.execute("""
+        CREATE INDEX transactions_user_date_id_idx ON Transactions (user_id, transaction_date, id);
+    """)
+    await cur.execute("""
+        CREATE UNIQUE INDEX transactions_user_content_hash_key
+        ON Transactions (user_id, content_hash, transaction_date) WHERE content_hash IS NOT NULL;
+    """)
+    for name, definition in foreign_keys:
+        await cur.execute(f"ALTER TABLE Transactions ADD CONSTRAINT {name} {definition};")
+    await cur.execute("ANALYZE Transactions;")
+
+
+async def _create_partition(cur, month: date):
+    """
+    Creates the month's table and attaches it, which (unlike CREATE TABLE ... PARTITION OF)
+    only takes a SHARE UPDATE EXCLUSIVE lock on Transactions, so reads and writes continue.
+    """
+    name = partition_name(month)
+    await cur.execute(f"CREATE TABLE {name} (LIKE Transactions INCLUDING DEFAULTS INCLUDING CONSTRAINTS);")
+    await cur.execute(
+        f"ALTER TABLE Transactions ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{month_start(month, -1).isoformat()}');"
+    )
+    _stats["partitions_created"] += 1
+
+
+async def archived_months(cur) -> List[date]:
+    """Months whose partitions have been archived (none before the partitioning migration)."""
+    await cur.execute("SELECT to_regclass('TransactionArchive') IS NOT NULL;")
+    if not (await cur.fetchone())[0]:
+        return []
+    await cur.execute("SELECT month FROM TransactionArchive ORDER BY month;")
+    return [r[0] for r in await cur.fetchall()]
+
+
+async def _create_missing(cur, months: Iterable[date]):
+    """Creates the months' partitions under the creation lock, refusing archived months."""
+    months = sorted(months)
+    async with cur.connection.transaction():
+        await cur.execute("SELECT pg_advisory_xact_lock(%s);", (_CREATE_LOCK_ID,))
+        await cur.execute("SELECT month FROM TransactionArchive WHERE month = ANY(%s);", (months,))
+        archived = sorted(r[0] for r in await cur.fetchall())
+        if archived:
+            raise ArchivedMonth(archived)
+        await cur.execute(
+            "SELECT n FROM unnest(%s::text[]) n WHERE to_regclass(n) IS NULL;",
+            ([partition_name(m) for m in months],),
+        )
+        absent = {r[0] for r in await cur.fetchall()}
+        for month in months:
+            if partition_name(month) in absent:
+                await _create_partition(cur, month)
+
+
+async def ensure_partitions(days: Iterable[date]):
+    """
+    Makes sure Transactions has a partition for the month of every date in `days`.
+    Runs on its own connection, so any partition is created (and its locks on
+    Transactions released) in a short transaction of its own, not the caller's.
+    Raises ArchivedMonth if any of those months has been archived.
+    """
+    first = live_window()[0]
+    missing = {m for m in map(month_start, days) if m < first or m not in _known_months}
+    if not missing:
+        return
+    async with async_autocommit() as cur:
+        await cur.execute(
+            "SELECT n FROM unnest(%s::text[]) n WHERE to_regclass(n) IS NULL;",
+            ([partition_name(m) for m in missing],),
+        )
+        if await cur.fetchone() is not None:
+            await _create_missing(cur, missing)
+    _known_months.update(m for m in missing if m >= first)
+
+
+@asynccontextmanager
+async def partition_guard(days: Iterable[date]):
+    """
+    Wraps the insert that follows ensure_partitions(). If another process archived
+    one of the months in between, Postgres finds no partition for the row; that is
+    raised as ArchivedMonth (checked on a fresh connection, as the failed
+    transaction cannot be queried) instead of a raw database error.
+    """
+    try:
+        yield
+    except errors.CheckViolation as e:
+        if "no partition" not in str(e):
+            raise
+        months = sorted(set(map(month_start, days)))
+        _known_months.difference_update(months)
+        async with async_autocommit() as cur:
+            await cur.execute("SELECT month FROM TransactionArchive WHERE month = ANY(%s) ORDER BY month;", (months,))
+            archived = [r[0] for r in await cur.fetchall()]
+        raise ArchivedMonth(archived or [m for m in months if m < live_window()[0]] or months) from e
+
+
+async def list_partitions(cur) -> List[date]:
+    """Months that currently have a live partition."""
+    await cur.execute("""
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'Transactions'::regclass
+        ORDER BY c.relname;
+    """)
+    return [date(int(r[0][14:18]), int(r[0][19:21]), 1) for r in await cur.fetchall()]
+
+
+# ── Archival ────────────────────────────────────────────────────
+def _to_arrow(rows: List[Tuple]) -> pa.Table:
+    columns = list(zip(*rows))
+    return pa.Table.from_arrays(
+        [pa.array(values, type=field.type) for values, field in zip(columns, ARCHIVE_SCHEMA)],
+        schema=ARCHIVE_SCHEMA,
+    )
+
+
+async def _export_partition(cur, month: date, fs: pafs.FileSystem, path: str) -> int:
+    """Streams the month's rows into a Parquet file at `path` on `fs`. Returns the row count."""
+    exported = 0
+    writer = None
+    tmp = path + ".tmp"
+    try:
+        async with cur.connection.cursor(name=f"archive_{partition_name(month)}") as src:
+            await src.execute(
+                f"SELECT {', '.join(ARCHIVE_COLUMNS)} FROM {partition_name(month)} ORDER BY user_id, transaction_date, id;"
+            )
+            while rows := await src.fetchmany(ARCHIVE_BATCH_ROWS):
+                table = await asyncio.to_thread(_to_arrow, rows)
+                if writer is None:
+                    fs.create_dir(path.rpartition("/")[0], recursive=True)
+                    writer = pq.ParquetWriter(tmp, ARCHIVE_SCHEMA, filesystem=fs, compression="zstd")
+                await asyncio.to_thread(writer.write_table, table, row_group_size=ARCHIVE_BATCH_ROWS)
+                exported += len(rows)
+        if writer is not None:
+            writer.close()
+            writer = None
+            with fs.open_input_file(tmp) as written:
+                if pq.ParquetFile(written).metadata.num_rows != exported:
+                    raise RuntimeError(f"Archive of {month:%Y-%m} does not hold the {exported} rows exported.")
+            fs.move(tmp, path)
+    finally:
+        if writer is not None:
+            writer.close()
+        if fs.get_file_info(tmp).type != pafs.FileType.NotFound:
+            fs.delete_file(tmp)
+    return exported
+
+
+async def archive_partition(month: date) -> Dict[str, Any]:
+    """
+    Exports one month to Parquet and drops its partition, in one transaction.
+    The partition is locked against writes (reads continue) for the export, so
+    the file holds exactly the rows that are dropped. An empty month is just
+    dropped: it leaves no file and is not recorded, so it stays writable.
+    Refuses to run (nothing is detached) while TX_ARCHIVE_DIR is not set.
+    """
+    if not TX_ARCHIVE_DIR:
+        raise RuntimeError(f"TX_ARCHIVE_DIR is not set: not detaching {partition_name(month)} without a durable archive.")
+    started = time.perf_counter()
+    path = archive_path(month)
+    fs, target = pafs.FileSystem.from_uri(path)
+    async with async_transaction() as cur:
+        await cur.execute(f"LOCK TABLE {partition_name(month)} IN SHARE MODE;")
+        rows = await _export_partition(cur, month, fs, target)
+        size = fs.get_file_info(target).size if rows else 0
+        await cur.execute("SELECT set_config('lock_timeout', %s, true);", (ARCHIVE_LOCK_TIMEOUT,))
+        await cur.execute(f"ALTER TABLE Transactions DETACH PARTITION {partition_name(month)};")
+        await cur.execute(f"DROP TABLE {partition_name(month)};")
+        if rows:
+            await cur.execute(
+                "INSERT INTO TransactionArchive (month, path, row_count, bytes) VALUES (%s, %s, %s, %s);",
+                (month, path, rows, size),
+            )
+    _known_months.discard(month)
+    _stats["months_archived"] += 1 if rows else 0
+    _stats["rows_archived"] += rows
+    _stats["bytes_archived"] += size
+    return {"month": f"{month:%Y-%m}", "rows": rows, "bytes": size, "ms": round((time.perf_counter() - started) * 1000, 1)}
+
+
+def _read_archive(path: str, user_id: str) -> pa.Table:
+    # Files are sorted by user, so row-group statistics skip everyone else's rows.
+    fs, path = pafs.FileSystem.from_uri(path)
+    return ds.dataset(path, filesystem=fs, format="parquet", schema=ARCHIVE_SCHEMA).to_table(
+        filter=ds.field("user_id") == user_id
+    )
+
+
+async def read_archived_transactions(email: str, month: date) -> Optional[Dict[str, Any]]:
+    """
+    The user's transactions for an archived month, newest first, in the same
+    shape as a transactions page. Returns None for an unknown user.
+    """
+    month = month_start(month)
+    async with async_autocommit() as cur:
+        user = await lookup_user(email, cur)
+        if user is None:
+            return None
+        user_id = user[0]
+        await cur.execute("SELECT path FROM TransactionArchive WHERE month = %s;", (month,))
+        row = await cur.fetchone()
+        archived, path = row is not None, row[0] if row else None
+        rows: List[Dict[str, Any]] = []
+        names: Dict[str, str] = {}
+        if path:
+            table = await asyncio.to_thread(_read_archive, path, user_id)
+            rows = table.sort_by([("transaction_date", "descending"), ("id", "descending")]).to_pylist()
+            await cur.execute(
+                "SELECT id, name FROM Categories WHERE id = ANY(%s);",
+                (list({r["category_id"] for r in rows if r["category_id"]}),),
+            )
+            names = dict(await cur.fetchall())
+    return {
+        "month": f"{month:%Y-%m}",
+        "archived": archived,
+        "transactions": [
+            {
+                "id": r["id"],
+                "amount": float(r["amount"]),
+                "description": r["description"],
+                "transaction_date": r["transaction_date"],
+                "category": names.get(r["category_id"], "Other"),
+            }
+            for r in rows
+        ],
+    }
+
+
+# ── Maintenance ─────────────────────────────────────────────────
+async def maintain_partitions(today: Optional[date] = None) -> Dict[str, Any]:
+    """
+    Creates the live window's missing partitions and archives the ones older
+    than it, unless another process is already doing so.
+    """
+    started = time.perf_counter()
+    first, last = live_window(today)
+    async with async_autocommit() as cur:
+        await cur.execute("SELECT pg_try_advisory_lock(%s);", (_LOCK_ID,))
+        if not (await cur.fetchone())[0]:
+            _stats["skipped_locked"] += 1
+            return {"skipped": "another maintenance run is in progress"}
+        try:
+            created_before = _stats["partitions_created"]
+            live = await list_partitions(cur)
+            window = _months(first, last)
+            if set(window) - set(live):
+                await _create_missing(cur, set(window) - set(live))
+            _known_months.update(window)
+            archived, dropped_empty = [], 0
+            if archive_enabled():
+                for month in (m for m in live if m < first):
+                    done = await archive_partition(month)
+                    if done["rows"]:
+                        archived.append(done)
+                    else:
+                        dropped_empty += 1
+        finally:
+            await cur.execute("SELECT pg_advisory_unlock(%s);", (_LOCK_ID,))
+
+    result = {
+        "window": [f"{first:%Y-%m}", f"{last:%Y-%m}"],
+        "created": _stats["partitions_created"] - created_before,
+        "archived": archived,
+        "dropped_empty": dropped_empty,
+        "ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+    _stats["runs"] += 1
+    _stats["last_run"] = {**result, "finished_at": datetime.now().isoformat(timespec="seconds")}
+    return result
+
+
+def _seconds_until(at: str) -> float:
+    hour, minute = (int(x) for x in at.split(":"))
+    now = datetime.now()
+    target = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if target <= now:
+        target += timedelta(days=1)
+    return (target - now).total_seconds()
+
+
+async def _scheduler_loop(at: str):
+    while True:
+        await asyncio.sleep(_seconds_until(at))
+        try:
+            print("🗂️ Partition maintenance:", await maintain_partitions())
+        except Exception as e:
+            _stats["failures"] += 1
+            print("⚠️ Partition maintenance failed:", e)
+
+
+def start_partition_maintenance(at: str = TX_MAINTENANCE_AT):
+    """Runs maintain_partitions() every day at `at` (HH:MM, server-local time)."""
+    global _scheduler
+    if _scheduler is not None or not at:
+        return
+    _seconds_until(at)  # fail fast on a malformed time
+    _scheduler = asyncio.create_task(_scheduler_loop(at), name="partition-maintenance")
+    print(f"🗂️ Partition maintenance scheduled for {at}."
+          + ("" if archive_enabled() else " Archival is off (TX_ARCHIVE_DIR not set)."))
+
+
+async def stop_partition_maintenance():
+    global _scheduler
+    if _scheduler is None:
+        return
+    _scheduler.cancel()
+    await asyncio.gather(_scheduler, return_exceptions=True)
+    _scheduler = None
+
+
+def get_partition_stats() -> Dict[str, Any]:
+    stats = dict(_stats)
+    stats["scheduled_at"] = TX_MAINTENANCE_AT or None
+    stats["archive_after_months"] = TX_ARCHIVE_AFTER_MONTHS if archive_enabled() else 0
+    stats["archive_dir"] = TX_ARCHIVE_DIR or None
+    return stats
+
+
+async def _main(command: str) -> int:
+    await open_pool()
+    try:
+        if command == "status":
+            async with async_autocommit() as cur:
+                live = await list_partitions(cur)
+                await cur.execute("SELECT month, row_count, bytes, path FROM TransactionArchive ORDER BY month;")
+                archive = await cur.fetchall()
+            print(f"🗂️ {len(live)} live partition(s): {live[0]:%Y-%m} … {live[-1]:%Y-%m}" if live else "🗂️ No live partitions.")
+            for month, rows, size, path in archive:
+                print(f"   📦 {month:%Y-%m}  {rows:>10,} rows  {size / 1e6:8.1f} MB  {path or '-'}")
+            return 0
+        print("🗂️", await maintain_partitions())
+        return 0
+    finally:
+        await close_pool()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", nargs="?", default="maintain", choices=("maintain", "status"))
+    args = parser.parse_args()
+    sys.exit(asyncio.run(_main(args.command)))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,102 @@
-from fastapi import FastAPI, HTTPException, Body, Request
+from fastapi import FastAPI, HTTPException, Body, Request, UploadFile, File, Form, Query
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Optional
-import psycopg2
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+from typing import List, Optional
+from contextlib import asynccontextmanager, aclosing
+import asyncio
+import time
 import bcrypt
 from uuid import uuid4
 from datetime import date
 import json
-from AI import generate_text
+import io
+from AI import chat_reply, stream_chat, summarize_conversation, get_chat_tool_stats
 from AI import ai_analyze_user
-
-
-
-app = FastAPI()
+from Functions.LLMClient import LLMUnavailable, get_llm_stats, init_llm_provider
+from Functions.AnalysisCache import analysis_generation, invalidate_analysis, get_analysis_cache_stats
+from Functions.SingleFlight import SingleFlight, FlightTimeout, get_singleflight_stats
+from Functions.ChatSessions import (
+    open_session,
+    append_turn,
+    history_contents,
+    schedule_compaction,
+    get_chat_session_stats,
+)
+from Functions.ChatAnswerCache import context_bucket, user_scope, lookup_answer, store_answer, get_chat_cache_stats
+from Functions.AnalysisJobs import (
+    start_analysis_workers,
+    stop_analysis_workers,
+    enqueue_analysis,
+    get_analysis_job,
+    wait_for_analysis_job,
+    schedule_precompute,
+    get_analysis_job_stats,
+)
+from Functions.NightlyRescore import start_rescore_scheduler, stop_rescore_scheduler, get_rescore_stats
+from Functions.TransactionPartitions import (
+    start_partition_maintenance,
+    stop_partition_maintenance,
+    read_archived_transactions,
+    get_partition_stats,
+)
+from Functions.ScoreHistory import BUCKETS, fetch_score_history
+from Functions.Categorizer import (
+    load_category_labels,
+    label_transaction,
+    recategorize_transactions,
+    list_categories,
+    get_categorizer_stats,
+)
+from Functions.MonthlyRollups import ANALYTICS_DEFAULT_MONTHS, ANALYTICS_MAX_MONTHS, fetch_analytics
+from Functions.ScoreSimulator import SIM_MAX_MONTHS, SIM_MAX_PATHS, load_monthly_history, simulate_scores
+from Functions.Migrations import require_current_schema
+from Functions.Database import async_transaction, async_autocommit, open_pool, close_pool, get_pool_stats
+from Functions.Aggregates import (
+    create_user_aggregates,
+    adjust_credit_limit,
+    get_aggregates_by_email,
+)
+from Functions.AddTransaction import insert_transaction
+from Functions.BulkIngest import (
+    UnknownUsers,
+    create_stage,
+    stage_records,
+    apply_stage,
+    iter_ndjson_chunks,
+)
+from Functions.TransactionPages import (
+    PAGE_DEFAULT_LIMIT,
+    PAGE_MAX_LIMIT,
+    decode_cursor,
+    fetch_transaction_page,
+    stream_transactions_ndjson,
+)
+from Functions.CreditTips import utilization_percent, build_personalized_tips, build_credit_insights
+from Functions.Dashboard import DASHBOARD_TX_LIMIT, parse_sections, load_dashboard
+from Functions.HotCache import lookup_user, remember_user, forget_user, sample_tips, get_hot_cache_stats
+from Functions.StatementImport import IMPORT_BATCH_SIZE, StatementRowError, detect_format, iter_statement, iter_batches
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_llm_provider()
+    await open_pool()
+    # Schema changes run once per deploy (python -m Functions.Migrations), not per worker.
+    await require_current_schema()
+    async with async_autocommit() as cur:
+        await load_category_labels(cur)
+    start_analysis_workers(ai_analyze_user)
+    start_rescore_scheduler()
+    start_partition_maintenance()
+    yield
+    await stop_partition_maintenance()
+    await stop_rescore_scheduler()
+    await stop_analysis_workers()
+    await close_pool()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # ─────────────────────────────────────────────────────────────
 # ✅ CORS Configuration
@@ -28,62 +112,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# ─────────────────────────────────────────────────────────────
-# ✅ Database Connection
-# ─────────────────────────────────────────────────────────────
-try:
-    conn = psycopg2.connect(
-        dbname="CrediWise",
-        user="postgres",
-        password="12345678@",  # ← update if needed
-        host="localhost",
-        port="5432",
-    )
-    conn.autocommit = True
-    print("✅ Connected to PostgreSQL database successfully!")
-except Exception as e:
-    print("❌ Error connecting to database:", e)
-
-# ─────────────────────────────────────────────────────────────
-# ✅ Auto-create FinancialTips table & seed data
-# ─────────────────────────────────────────────────────────────
-def init_financial_tips_table():
-    cur = conn.cursor()
-
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS FinancialTips (
-            id SERIAL PRIMARY KEY,
-            title TEXT NOT NULL,
-            content TEXT NOT NULL,
-            category TEXT
-        );
-    """)
-
-    cur.execute("SELECT COUNT(*) FROM FinancialTips;")
-    count = cur.fetchone()[0]
-
-    if count == 0:
-        print("💡 Seeding default FinancialTips...")
-        tips = [
-            ("Pay on Time", "Always make payments before the due date to build trust with lenders.", "Credit Score"),
-            ("Keep Utilization Low", "Use less than 30% of your available credit to maintain a healthy score.", "Credit Usage"),
-            ("Check Your Report Regularly", "Monitor your credit report to correct any mistakes early.", "Monitoring"),
-            ("Diversify Credit Types", "Having both credit cards and loans shows good credit management.", "Credit Mix"),
-            ("Avoid Frequent Applications", "Too many credit applications can lower your score temporarily.", "Inquiries"),
-            ("Build Long-Term Accounts", "Older credit accounts improve your score by showing stability.", "Account Age"),
-            ("Don’t Close Old Cards", "Keeping older accounts open improves your credit history length.", "Credit History"),
-            ("Track Spending", "Keeping track of where your money goes helps you avoid overutilization.", "Budgeting")
-        ]
-        cur.executemany("INSERT INTO FinancialTips (title, content, category) VALUES (%s, %s, %s);", tips)
-        conn.commit()
-        print("✅ Default financial tips inserted successfully!")
-    else:
-        print(f"ℹ️ FinancialTips already seeded ({count} records).")
-
-    cur.close()
-
-init_financial_tips_table()
-
 # ─────────────────────────────────────────────────────────────
 # ✅ Models
 # ─────────────────────────────────────────────────────────────
@@ -105,101 +133,156 @@ class AddTransaction(BaseModel):
     account_id: Optional[str] = None
     category_id: Optional[str] = None
 
+class CategoryCorrection(BaseModel):
+    email: str
+    category_id: str
+
+class OneOffTransaction(BaseModel):
+    month: int = Field(ge=1, le=SIM_MAX_MONTHS)
+    amount: float  # positive = income, negative = expense
+    description: str = ""
+
+class ScoreSimulation(BaseModel):
+    months: int = Field(12, ge=1, le=SIM_MAX_MONTHS)
+    paths: int = Field(10_000, ge=100, le=SIM_MAX_PATHS)
+    monthly_income_change: float = 0.0
+    monthly_expense_change: float = 0.0
+    expense_scale: float = Field(1.0, ge=0)
+    credit_limit_change: float = 0.0
+    one_off: List[OneOffTransaction] = []
+    seed: Optional[int] = None
+
+AddTransactionList = TypeAdapter(List[AddTransaction])
+BULK_CHUNK_SIZE = 5000
+
 # ─────────────────────────────────────────────────────────────
 # ✅ Helper Functions
 # ─────────────────────────────────────────────────────────────
-def get_user_by_email(cur, email: str):
-    cur.execute("SELECT id, username, email FROM Users WHERE email = %s;", (email,))
-    return cur.fetchone()
-
-def get_default_account_id(cur, user_id: str) -> str:
-    cur.execute("SELECT id FROM Accounts WHERE user_id = %s ORDER BY id LIMIT 1;", (user_id,))
-    row = cur.fetchone()
+async def get_default_account_id(cur, user_id: str) -> str:
+    await cur.execute("SELECT id FROM Accounts WHERE user_id = %s ORDER BY id LIMIT 1;", (user_id,))
+    row = await cur.fetchone()
     if row:
         return row[0]
     acc_id = f"acc_{uuid4().hex[:8]}"
-    cur.execute(
+    await cur.execute(
         "INSERT INTO Accounts (id, user_id, account_name, account_type, balance, credit_limit) VALUES (%s, %s, %s, %s, %s, %s);",
         (acc_id, user_id, "Main Account", "checking", 0.00, 1000.00),
     )
+    await adjust_credit_limit(cur, user_id, 1000.00)
     return acc_id
 
 # ─────────────────────────────────────────────────────────────
 # ✅ Routes
 # ─────────────────────────────────────────────────────────────
 @app.get("/")
-def root():
+async def root():
     return {"message": "Backend is working! 🚀"}
 
+@app.get("/metrics/db")
+async def db_metrics():
+    return {"pool": get_pool_stats()}
+
+@app.get("/metrics/llm")
+async def llm_metrics():
+    return {
+        "llm": get_llm_stats(),
+        "analysis_cache": get_analysis_cache_stats(),
+        "analysis_jobs": get_analysis_job_stats(),
+        "chat_tools": get_chat_tool_stats(),
+        "chat_sessions": get_chat_session_stats(),
+        "chat_cache": get_chat_cache_stats(),
+    }
+
+@app.get("/metrics/scoring")
+async def scoring_metrics():
+    return {"rescore": get_rescore_stats()}
+
+@app.get("/metrics/categorizer")
+async def categorizer_metrics():
+    return {"categorizer": get_categorizer_stats()}
+
+@app.get("/metrics/partitions")
+async def partition_metrics():
+    return {"partitions": get_partition_stats()}
+
+@app.get("/metrics/cache")
+async def cache_metrics():
+    return {"hot_cache": get_hot_cache_stats()}
+
+@app.get("/metrics/singleflight")
+async def singleflight_metrics():
+    return {"groups": get_singleflight_stats()}
+
 # ─────────── SIGNUP ───────────
 @app.post("/signup")
-def signup_user(user: SignupUser):
-    cur = conn.cursor()
-
-    cur.execute("SELECT 1 FROM Users WHERE email = %s;", (user.email,))
-    if cur.fetchone():
-        cur.close()
-        raise HTTPException(status_code=400, detail="⚠️ Email already in use.")
-    cur.execute("SELECT 1 FROM Users WHERE username = %s;", (user.name,))
-    if cur.fetchone():
-        cur.close()
-        raise HTTPException(status_code=400, detail="⚠️ Username already in use.")
-
-    hashed_pw = bcrypt.hashpw(user.password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
-    user_id = f"usr_{uuid4().hex[:8]}"
-
-    cur.execute(
-        "INSERT INTO Users (id, username, email, password_hash) VALUES (%s, %s, %s, %s);",
-        (user_id, user.name, user.email, hashed_pw),
-    )
+async def signup_user(user: SignupUser):
+    # Hash off the event loop and before checking out a connection, so bcrypt's
+    # ~250 ms never holds a pooled connection.
+    hashed_pw = (await asyncio.to_thread(bcrypt.hashpw, user.password.encode("utf-8"), bcrypt.gensalt())).decode("utf-8")
+
+    async with async_transaction() as cur:
+        await cur.execute("SELECT 1 FROM Users WHERE email = %s;", (user.email,))
+        if await cur.fetchone():
+            raise HTTPException(status_code=400, detail="⚠️ Email already in use.")
+        await cur.execute("SELECT 1 FROM Users WHERE username = %s;", (user.name,))
+        if await cur.fetchone():
+            raise HTTPException(status_code=400, detail="⚠️ Username already in use.")
+
+        user_id = f"usr_{uuid4().hex[:8]}"
+
+        await cur.execute(
+            "INSERT INTO Users (id, username, email, password_hash) VALUES (%s, %s, %s, %s);",
+            (user_id, user.name, user.email, hashed_pw),
+        )
 
-    account_id = f"acc_{uuid4().hex[:8]}"
-    cur.execute("""
-        INSERT INTO Accounts (id, user_id, account_name, account_type, balance, credit_limit)
-        VALUES (%s, %s, %s, %s, %s, %s);
-    """, (account_id, user_id, "Main Account", "checking", 0.00, 1000.00))
+        account_id = f"acc_{uuid4().hex[:8]}"
+        await cur.execute("""
+            INSERT INTO Accounts (id, user_id, account_name, account_type, balance, credit_limit)
+            VALUES (%s, %s, %s, %s, %s, %s);
+        """, (account_id, user_id, "Main Account", "checking", 0.00, 1000.00))
 
-    credit_id = f"cs_{uuid4().hex[:8]}"
-    cur.execute("""
-        INSERT INTO CreditScores (id, user_id, score, report_date, provider)
-        VALUES (%s, %s, %s, %s, %s);
-    """, (credit_id, user_id, 700, date.today(), "Experian"))
+        credit_id = f"cs_{uuid4().hex[:8]}"
+        await cur.execute("""
+            INSERT INTO CreditScores (id, user_id, score, report_date, provider)
+            VALUES (%s, %s, %s, %s, %s);
+        """, (credit_id, user_id, 700, date.today(), "Experian"))
+        await cur.execute(
+            "INSERT INTO CreditScoreHistory (user_id, score, source) VALUES (%s, %s, %s);",
+            (user_id, 700, "signup"),
+        )
+
+        await create_user_aggregates(cur, user_id, credit_limit=1000.00)
 
-    conn.commit()
-    cur.close()
     return {"message": "✅ Signup successful! Default account and credit score created."}
 
 # ─────────── LOGIN ───────────
 @app.post("/login")
-def login(user: LoginUser):
-    cur = conn.cursor()
-    cur.execute("SELECT id, username, email, password_hash FROM Users WHERE email = %s;", (user.email,))
-    row = cur.fetchone()
+async def login(user: LoginUser):
+    async with async_transaction() as cur:
+        await cur.execute("SELECT id, username, email, password_hash FROM Users WHERE email = %s;", (user.email,))
+        row = await cur.fetchone()
     if not row:
-        cur.close()
         raise HTTPException(status_code=404, detail="❌ User not found!")
 
     user_id, username, email, pw_hash = row
-    if not bcrypt.checkpw(user.password.encode("utf-8"), pw_hash.encode("utf-8")):
-        cur.close()
+    if not await asyncio.to_thread(bcrypt.checkpw, user.password.encode("utf-8"), pw_hash.encode("utf-8")):
         raise HTTPException(status_code=401, detail="❌ Invalid password!")
 
-    _ = get_default_account_id(cur, user_id)
-    cur.close()
+    remember_user(user_id, username, email)
+    async with async_transaction() as cur:
+        _ = await get_default_account_id(cur, user_id)
     return {"message": f"✅ Welcome back, {username}!", "user": {"id": user_id, "name": username, "email": email}}
 
 # ─────────── USER PROFILE ───────────
 @app.get("/user/{email}")
-def get_user(email: str):
-    cur = conn.cursor()
-    u = get_user_by_email(cur, email)
-    cur.close()
+async def get_user(email: str):
+    u = await lookup_user(email)
     if not u:
         raise HTTPException(status_code=404, detail="❌ User not found!")
     return {"user": {"id": u[0], "username": u[1], "email": u[2]}}
 
 @app.put("/update_user")
-def update_user(data: dict = Body(...)):
+async def update_user(data: dict = Body(...)):
     email = data.get("email")
     username = data.get("username")
     new_password = data.get("password")
@@ -207,283 +290,417 @@ def update_user(data: dict = Body(...)):
     if not email or not username:
         raise HTTPException(status_code=400, detail="⚠️ Missing required fields!")
 
-    cur = conn.cursor()
+    hashed = None
     if new_password:
-        hashed = bcrypt.hashpw(new_password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
-        cur.execute("UPDATE Users SET username=%s, password_hash=%s WHERE email=%s;", (username, hashed, email))
-    else:
-        cur.execute("UPDATE Users SET username=%s WHERE email=%s;", (username, email))
-    conn.commit()
-    cur.close()
+        hashed = (await asyncio.to_thread(bcrypt.hashpw, new_password.encode("utf-8"), bcrypt.gensalt())).decode("utf-8")
+
+    async with async_transaction() as cur:
+        if hashed:
+            await cur.execute("UPDATE Users SET username=%s, password_hash=%s WHERE email=%s;", (username, hashed, email))
+        else:
+            await cur.execute("UPDATE Users SET username=%s WHERE email=%s;", (username, email))
+    forget_user(email)
     return {"message": "✅ Profile updated successfully!"}
 
 # ─────────── TRANSACTIONS ───────────
 @app.get("/transactions/{email}")
-def list_transactions(email: str):
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT t.id, t.amount, t.description, t.transaction_date, COALESCE(c.name, 'Other') AS category_name
-        FROM Transactions t
-        JOIN Users u ON t.user_id = u.id
-        LEFT JOIN Categories c ON t.category_id = c.id
-        WHERE u.email = %s
-        ORDER BY t.transaction_date DESC, t.id DESC;
-    """, (email,))
-    rows = cur.fetchall()
-    cur.close()
-    return {
-        "transactions": [
+async def list_transactions(
+    email: str,
+    request: Request,
+    limit: int = Query(PAGE_DEFAULT_LIMIT, ge=1, le=PAGE_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    category_id: Optional[str] = None,
+    stream: bool = False,
+):
+    """
+    Newest-first page of the user's transactions. Pass `next_cursor` back as `cursor`
+    for the following page; the first page also carries running totals.
+    With ?stream=true (or Accept: application/x-ndjson) every matching row is streamed
+    as NDJSON instead, fetched from the database `limit` rows at a time.
+    """
+    filters = {"cursor": cursor, "start_date": start_date, "end_date": end_date, "category_id": category_id}
+    try:
+        if stream or "application/x-ndjson" in request.headers.get("accept", ""):
+            # Validate the cursor before the response starts — errors can't be sent mid-stream.
+            if cursor:
+                decode_cursor(cursor)
+            return StreamingResponse(
+                stream_transactions_ndjson(email, batch_size=limit, **filters),
+                media_type="application/x-ndjson",
+            )
+
+        async with async_autocommit() as cur:
+            transactions, next_cursor = await fetch_transaction_page(cur, email, limit=limit, **filters)
+            totals = await get_aggregates_by_email(cur, email) if not cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"⚠️ {e}")
+
+    response = {"transactions": transactions, "next_cursor": next_cursor}
+    if totals:
+        response["totals"] = {k: totals[k] for k in ("income", "expenses", "balance", "transaction_count")}
+    return response
+
+@app.get("/transactions/{email}/archive")
+async def get_archived_transactions(email: str, month: str = Query(..., pattern=r"^\d{4}-\d{2}$", description="YYYY-MM")):
+    """
+    The user's transactions for one month that has been archived out of the
+    database (read from its Parquet file). `archived` is false for live months.
+    """
+    try:
+        first_day = date.fromisoformat(f"{month}-01")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="⚠️ month must be YYYY-MM.")
+    result = await read_archived_transactions(email, first_day)
+    if result is None:
+        raise HTTPException(status_code=404, detail="❌ User not found!")
+    return result
+
+@app.post("/transactions/add")
+async def add_transaction(data: AddTransaction):
+    # One round trip: insert, balance, aggregates and re-score run as a single
+    # statement, which is atomic on its own — no BEGIN/COMMIT needed.
+    try:
+        async with async_autocommit() as cur:
+            result = await insert_transaction(
+                cur,
+                email=data.email,
+                amount=data.amount,
+                description=data.description,
+                transaction_date=data.transaction_date,
+                kind=data.kind,
+                account_id=data.account_id,
+                category_id=data.category_id,
+            )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"⚠️ {e}")
+    if result is None:
+        raise HTTPException(status_code=404, detail="❌ User not found!")
+    _, _, new_score = result
+    invalidate_analysis(data.email)
+    schedule_precompute(data.email)
+
+    return {"message": f"✅ Transaction added successfully! New credit score: {new_score}"}
+
+@app.get("/categories")
+async def categories():
+    return {"categories": list_categories()}
+
+@app.put("/transactions/{transaction_id}/category")
+async def correct_transaction_category(transaction_id: str, data: CategoryCorrection):
+    """Sets the category the user chose; the categorizer learns from it."""
+    try:
+        name = await label_transaction(data.email, transaction_id, data.category_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"⚠️ {e}")
+    if name is None:
+        raise HTTPException(status_code=404, detail="❌ Transaction not found!")
+    return {"message": f"✅ Category set to {name}.", "category_id": data.category_id, "category": name}
+
+@app.post("/transactions/recategorize")
+async def recategorize(email: str):
+    """
+    Re-runs the categorizer over the user's transactions it categorized (and
+    legacy rows left on the default categories). Everyone's at once is a CLI
+    run: `python -m Functions.Categorizer recategorize`.
+    """
+    return await recategorize_transactions(email)
+
+@app.post("/transactions/bulk")
+async def bulk_add_transactions(request: Request):
+    """
+    Imports many transactions in one request. Body is a JSON array of AddTransaction
+    records, or NDJSON (Content-Type: application/x-ndjson) which is validated and
+    COPY'd in chunks as it streams in. The batch is all-or-nothing, and each affected
+    user is re-scored once at the end.
+    Example NDJSON line:
+    {"email": "user@example.com", "amount": 42.5, "description": "Groceries", "transaction_date": "2025-01-31", "kind": "expense"}
+    """
+    is_ndjson = "ndjson" in request.headers.get("content-type", "")
+    try:
+        async with async_transaction() as cur:
+            await create_stage(cur)
+            staged = 0
+            if is_ndjson:
+                async for lines in iter_ndjson_chunks(request.stream(), BULK_CHUNK_SIZE):
+                    # One validation pass per chunk: the lines are joined into a JSON array.
+                    records = _validate_bulk(b"[" + b",".join(lines) + b"]", offset=staged)
+                    staged += await stage_records(cur, records)
+            else:
+                records = _validate_bulk(await request.body(), offset=0)
+                staged += await stage_records(cur, records)
+
+            if not staged:
+                raise HTTPException(status_code=400, detail="⚠️ No transactions provided.")
+            result = await apply_stage(cur)
+    except UnknownUsers as e:
+        raise HTTPException(status_code=404, detail=f"❌ User not found: {', '.join(e.emails)}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"⚠️ {e}")
+
+    for email in result["scores"]:
+        invalidate_analysis(email)
+    return {"message": f"✅ Imported {result['inserted']} transactions!", **result}
+
+def _validate_bulk(payload: bytes, offset: int) -> List[AddTransaction]:
+    try:
+        return AddTransactionList.validate_json(payload)
+    except ValidationError as e:
+        errors = [
             {
-                "id": r[0],
-                "amount": float(r[1]),
-                "description": r[2],
-                "transaction_date": r[3],
-                "category": r[4],
+                "row": offset + err["loc"][0] if err["loc"] and isinstance(err["loc"][0], int) else None,
+                "field": ".".join(str(p) for p in err["loc"][1:]),
+                "error": err["msg"],
             }
-            for r in rows
+            for err in e.errors(include_url=False)
         ]
-    }
+        raise HTTPException(status_code=422, detail=errors)
 
-@app.post("/transactions/add")
-def add_transaction(data: AddTransaction):
-    cur = conn.cursor()
-    u = get_user_by_email(cur, data.email)
-    if not u:
-        cur.close()
+@app.post("/transactions/import")
+async def import_statement(email: str = Form(...), file: UploadFile = File(...), format: Optional[str] = Form(None)):
+    """
+    Imports a bank statement (CSV or OFX, picked from `format` or the file extension).
+    The upload is parsed as a stream and COPY'd into staging in batches of
+    IMPORT_BATCH_SIZE rows, then applied at the end of the same DB transaction, so a
+    file that fails part-way writes nothing. Rows already imported (same content hash)
+    are skipped, so re-uploading a statement, or one that overlaps a previous one, is safe.
+    """
+    try:
+        fmt = detect_format(file.filename, format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"⚠️ {e}")
+
+    if not await lookup_user(email):
         raise HTTPException(status_code=404, detail="❌ User not found!")
-    user_id = u[0]
-
-    # Get or create default account
-    account_id = data.account_id or get_default_account_id(cur, user_id)
-
-    # Determine transaction type
-    kind = (data.kind or ("income" if data.amount >= 0 else "expense")).lower()
-    coerced_amount = abs(data.amount) if kind == "income" else -abs(data.amount)
-    category_id = data.category_id or ("cat_001" if kind == "income" else "cat_011")
-
-    # Ensure category exists
-    cur.execute("SELECT 1 FROM Categories WHERE id = %s;", (category_id,))
-    if not cur.fetchone():
-        cur.execute(
-            "INSERT INTO Categories (id, name) VALUES (%s, %s);",
-            (category_id, "Salary" if kind == "income" else "Other Expense"),
-        )
 
-    # Add transaction
-    tx_id = f"tx_{uuid4().hex[:8]}"
-    cur.execute(
-        """
-        INSERT INTO Transactions (id, user_id, account_id, category_id, amount, description, transaction_date)
-        VALUES (%s, %s, %s, %s, %s, %s, %s);
-        """,
-        (
-            tx_id,
-            user_id,
-            account_id,
-            category_id,
-            coerced_amount,
-            data.description,
-            data.transaction_date,
-        ),
-    )
+    # Starlette spools the upload to disk past 1 MB; we read it back line by line.
+    text = io.TextIOWrapper(file.file, encoding="utf-8-sig", errors="replace", newline="")
+    batches = iter_batches(iter_statement(text, fmt), IMPORT_BATCH_SIZE)
+    summary = {"inserted": 0, "duplicates": 0, "rejected": 0, "errors": [], "credit_score": None}
+    try:
+        async with async_transaction() as cur:
+            await create_stage(cur)
+            staged = 0
+            while True:
+                # Parsing and validation are CPU-bound, so they run off the event loop.
+                batch = await asyncio.to_thread(_next_import_batch, batches, email)
+                if batch is None:
+                    break
+                records, hashes, rejected = batch
+                summary["rejected"] += len(rejected)
+                summary["errors"].extend(rejected[:max(0, 20 - len(summary["errors"]))])
+                if records:
+                    staged += await stage_records(cur, records, hashes)
+            # Nothing is applied until the whole file is staged, so no row locks
+            # are held while the rest of the upload is still being parsed.
+            if staged:
+                result = await apply_stage(cur)
+                summary["inserted"] = result["inserted"]
+                summary["duplicates"] = result["duplicates"]
+                summary["credit_score"] = result["scores"].get(email)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"⚠️ {e}")
+    except UnknownUsers as e:
+        raise HTTPException(status_code=404, detail=f"❌ User not found: {', '.join(e.emails)}")
+
+    if summary["inserted"]:
+        invalidate_analysis(email)
+    return {
+        "message": f"✅ Imported {summary['inserted']} transactions ({summary['duplicates']} already present).",
+        **summary,
+    }
 
-    # ✅ Update account balance
-    cur.execute("UPDATE Accounts SET balance = balance + %s WHERE id = %s;", (coerced_amount, account_id))
-
-    # ✅ Totals for utilization/score
-    cur.execute("""
-        SELECT 
-            COALESCE(SUM(CASE WHEN amount > 0 THEN amount ELSE 0 END), 0),
-            COALESCE(SUM(CASE WHEN amount < 0 THEN ABS(amount) ELSE 0 END), 0)
-        FROM Transactions WHERE user_id = %s;
-    """, (user_id,))
-    income, expenses = cur.fetchone()
-
-    cur.execute("SELECT SUM(balance), SUM(credit_limit) FROM Accounts WHERE user_id = %s;", (user_id,))
-    balance, limit = cur.fetchone() or (0, 0)
-
-    # Convert to float
-    income, expenses, balance, limit = float(income or 0), float(expenses or 0), float(balance or 0), float(limit or 0)
-
-    # ✅ Correct utilization: percent of credit limit currently used
-    utilization = (expenses / limit * 100) if limit > 0 else 0
-
-    # ✅ Scoring logic (40% threshold)
-    new_score = 700
-    if utilization >= 80:
-        new_score -= 20
-    elif utilization >= 40:
-        new_score -= 10
-    else:
-        new_score += 10
-
-    if expenses > income:
-        new_score -= 10
-    elif income > 0 and expenses < income * 0.5:
-        new_score += 10
-
-    if balance > 0:
-        new_score += 5
-
-    new_score = max(300, min(850, int(new_score)))
-
-    # ✅ Update existing credit score (no duplicates)
-    cur.execute("SELECT 1 FROM CreditScores WHERE user_id = %s;", (user_id,))
-    if cur.fetchone():
-        cur.execute(
-            """
-            UPDATE CreditScores
-            SET score = %s, report_date = %s
-            WHERE user_id = %s;
-            """,
-            (new_score, date.today(), user_id),
-        )
-    else:
-        cs_id = f"cs_{uuid4().hex[:8]}"
-        cur.execute(
-            """
-            INSERT INTO CreditScores (id, user_id, score, report_date)
-            VALUES (%s, %s, %s, %s);
-            """,
-            (cs_id, user_id, new_score, date.today()),
-        )
+def _next_import_batch(batches, email: str):
+    """Pulls the next parsed batch and maps it onto AddTransaction. None when the file is done."""
+    rows = next(batches, None)
+    if rows is None:
+        return None
+    records, hashes, rejected = [], [], []
+    for row in rows:
+        if isinstance(row, StatementRowError):
+            rejected.append(str(row))
+            continue
+        try:
+            records.append(AddTransaction(
+                email=email,
+                amount=float(row["amount"]),
+                description=row["description"],
+                transaction_date=row["transaction_date"],
+                category_id=row["category_id"],
+            ))
+        except ValidationError as e:
+            rejected.append(f"line {row['line']}: {e.errors(include_url=False)[0]['msg']}")
+            continue
+        hashes.append(row["content_hash"])
+    return records, hashes, rejected
+
+# ─────────── DASHBOARD ───────────
+@app.get("/dashboard/{email}")
+async def dashboard(email: str, sections: Optional[str] = None, tx_limit: int = Query(DASHBOARD_TX_LIMIT, ge=1, le=PAGE_MAX_LIMIT)):
+    """
+    Everything a page needs on load in one request: user, summary, credit, insights,
+    tips, transactions (newest `tx_limit`, plus next_cursor) and challenges.
+    Pass e.g. ?sections=credit,tips,insights to get only those.
+    """
+    try:
+        wanted = parse_sections(sections)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"⚠️ {e}")
 
-    conn.commit()
-    cur.close()
-    return {"message": f"✅ Transaction added successfully! New credit score: {new_score}"}
+    async with async_autocommit() as cur:
+        result = await load_dashboard(cur, email, wanted, tx_limit=tx_limit)
+    if result is None:
+        raise HTTPException(status_code=404, detail="❌ User not found!")
+    return result
 
 # ─────────── CREDIT EDUCATION ───────────
 @app.get("/credit/{email}")
-def get_credit_score(email: str):
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT cs.score, cs.report_date
-        FROM CreditScores cs
-        JOIN Users u ON u.id = cs.user_id
-        WHERE u.email = %s
-        ORDER BY cs.report_date DESC
-        LIMIT 1;
-    """, (email,))
-    row = cur.fetchone()
-    cur.close()
+async def get_credit_score(email: str):
+    async with async_autocommit() as cur:
+        user = await lookup_user(email, cur)
+        row = None
+        if user is not None:
+            await cur.execute("""
+                SELECT score, report_date
+                FROM CreditScores
+                WHERE user_id = %s
+                ORDER BY report_date DESC
+                LIMIT 1;
+            """, (user[0],))
+            row = await cur.fetchone()
 
     if not row:
         raise HTTPException(status_code=404, detail="No credit score data found.")
     score, date_value = row
     return {"score": score, "date": date_value}
 
+@app.get("/credit/history/{email}")
+async def credit_score_history(
+    email: str,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    bucket: Optional[str] = Query(None, description=f"One of {', '.join(BUCKETS)}; picked from the range if omitted."),
+):
+    """
+    Credit score over time for charts, downsampled in the database: one point per
+    day/week/month with the closing score and its min/max, or the raw changes.
+    """
+    if bucket is not None and bucket not in BUCKETS:
+        raise HTTPException(status_code=400, detail=f"⚠️ bucket must be one of: {', '.join(BUCKETS)}.")
+    if start and end and start > end:
+        raise HTTPException(status_code=400, detail="⚠️ start must not be after end.")
+    history = await fetch_score_history(email, start, end, bucket)
+    if history is None:
+        raise HTTPException(status_code=404, detail="User not found.")
+    return history
+
+@app.post("/credit/simulate/{email}")
+async def simulate_credit_score(email: str, scenario: ScoreSimulation):
+    """
+    "What-if" projection: Monte Carlo paths built from the user's own monthly
+    income/spending, with the scenario's changes applied, scored month by month.
+    Returns percentile bands per month and the spread of the final score.
+    """
+    started = time.perf_counter()
+    async with async_autocommit() as cur:
+        totals = await get_aggregates_by_email(cur, email)
+        if not totals:
+            raise HTTPException(status_code=404, detail="User not found.")
+        history = await load_monthly_history(cur, totals["user_id"])
+    loaded = time.perf_counter()
+
+    result = await asyncio.to_thread(
+        simulate_scores,
+        totals,
+        history,
+        months=scenario.months,
+        paths=scenario.paths,
+        monthly_income_change=scenario.monthly_income_change,
+        monthly_expense_change=scenario.monthly_expense_change,
+        expense_scale=scenario.expense_scale,
+        credit_limit_change=scenario.credit_limit_change,
+        one_off=[(event.month, event.amount) for event in scenario.one_off],
+        seed=scenario.seed,
+    )
+    result["elapsed_ms"] = {
+        "load": round((loaded - started) * 1000, 1),
+        "simulate": round((time.perf_counter() - loaded) * 1000, 1),
+    }
+    return result
+
+# ─────────── ANALYTICS ───────────
+@app.get("/analytics/{email}")
+async def spending_analytics(email: str, months: int = Query(ANALYTICS_DEFAULT_MONTHS, ge=1, le=ANALYTICS_MAX_MONTHS)):
+    """
+    Income/spending per month and per category over the last `months` months,
+    with each category's monthly spending for trend charts. Served from
+    MonthlyRollups, so cost does not grow with the user's transaction count.
+    """
+    result = await fetch_analytics(email, months)
+    if result is None:
+        raise HTTPException(status_code=404, detail="User not found.")
+    return result
+
 # ─────────── CREDIT TIPS (PERSONALIZED) ───────────
+# Concurrent identical requests (several tabs, re-renders) share one computation.
+# Keys carry the user's write generation so nobody joins a pre-write read.
+_tips_flight = SingleFlight("credit_tips")
+_insights_flight = SingleFlight("credit_insights")
+
 @app.get("/credit/tips/{email}")
-def personalized_credit_tips(email: str):
-    cur = conn.cursor()
-    cur.execute("SELECT id FROM Users WHERE email = %s;", (email,))
-    user = cur.fetchone()
-    if not user:
-        cur.close()
+async def personalized_credit_tips(email: str):
+    tips = await _coalesced(_tips_flight, email, _load_personalized_tips)
+    if tips is None:
         raise HTTPException(status_code=404, detail="User not found.")
-    user_id = user[0]
-
-    cur.execute("""
-        SELECT 
-            COALESCE(SUM(CASE WHEN amount > 0 THEN amount ELSE 0 END), 0),
-            COALESCE(SUM(CASE WHEN amount < 0 THEN ABS(amount) ELSE 0 END), 0)
-        FROM Transactions WHERE user_id = %s;
-    """, (user_id,))
-    income, expenses = cur.fetchone()
-
-    cur.execute("SELECT SUM(credit_limit) FROM Accounts WHERE user_id = %s;", (user_id,))
-    limit = cur.fetchone()[0] or 0
-
-    income, expenses, limit = float(income or 0), float(expenses or 0), float(limit or 0)
-    utilization = (expenses / limit * 100) if limit > 0 else None
-
-    tips = []
-    if expenses > income:
-        tips.append({"title": "You're Overspending", "content": "Your expenses exceed your income — try to reduce non-essential costs."})
-    elif income > 0 and expenses < income * 0.5:
-        tips.append({"title": "Excellent Saving Habits", "content": "You're saving a good portion of your income — consider investing to grow your wealth."})
-
-    if utilization is not None:
-        if utilization > 40:
-            tips.append({
-                "title": "Higher Credit Usage",
-                "content": f"Your credit utilization is {utilization:.1f}%. Try to keep it below 40% to maintain a healthy score."
-            })
-        else:
-            tips.append({
-                "title": "Good Credit Usage",
-                "content": f"Your utilization is {utilization:.1f}% — great job keeping it under 40%!"
-            })
+    return {"personalized_tips": tips}
 
-    cur.execute("SELECT title, content, category FROM FinancialTips ORDER BY RANDOM() LIMIT 3;")
-    for r in cur.fetchall():
-        tips.append({"title": r[0], "content": r[1], "category": r[2]})
+async def _load_personalized_tips(email: str):
+    async with async_transaction() as cur:
+        totals = await get_aggregates_by_email(cur, email)
+        if not totals:
+            return None
 
-    cur.close()
-    return {"personalized_tips": tips}
+        income, expenses = totals["income"], totals["expenses"]
+        tips = build_personalized_tips(income, expenses, utilization_percent(expenses, totals["credit_limit"]))
+
+        tips += await sample_tips(cur)
+    return tips
 
 # ─────────── CREDIT INSIGHTS ───────────
 @app.get("/credit/insights/{email}")
-def credit_insights(email: str):
-    cur = conn.cursor()
-    cur.execute("SELECT id FROM Users WHERE email = %s;", (email,))
-    user = cur.fetchone()
-    if not user:
-        cur.close()
+async def credit_insights(email: str):
+    tips = await _coalesced(_insights_flight, email, _load_credit_insights)
+    if tips is None:
         raise HTTPException(status_code=404, detail="User not found.")
-    user_id = user[0]
-
-    cur.execute("""
-        SELECT 
-            COALESCE(SUM(CASE WHEN amount > 0 THEN amount ELSE 0 END), 0),
-            COALESCE(SUM(CASE WHEN amount < 0 THEN ABS(amount) ELSE 0 END), 0)
-        FROM Transactions WHERE user_id = %s;
-    """, (user_id,))
-    income, expenses = cur.fetchone()
-
-    cur.execute("SELECT SUM(credit_limit) FROM Accounts WHERE user_id = %s;", (user_id,))
-    limit = cur.fetchone()[0] or 0
-
-    income, expenses, limit = float(income or 0), float(expenses or 0), float(limit or 0)
-    utilization = (expenses / limit * 100) if limit > 0 else None
-
-    tips = []
-    if utilization is not None:
-        if utilization > 40:
-            tips.append({
-                "title": "High Credit Utilization",
-                "content": f"Your utilization is {utilization:.1f}%. Try to keep it below 40% to improve your score."
-            })
-        else:
-            tips.append({
-                "title": "Excellent Utilization",
-                "content": f"Your utilization is {utilization:.1f}% — staying under 40% is great!"
-            })
-    else:
-        tips.append({
-            "title": "Set Your Credit Limit",
-            "content": "We can give better insights once you set a credit limit for your account."
-        })
-
-    if expenses > income:
-        tips.append({
-            "title": "High Spending Alert",
-            "content": "Your expenses exceed your income — try reducing non-essential costs."
-        })
-    else:
-        tips.append({
-            "title": "Good Financial Balance",
-            "content": "You’re saving more than you spend — this strengthens your credit health."
-        })
-
-    cur.close()
     return {"insights": tips}
 
+async def _load_credit_insights(email: str):
+    async with async_autocommit() as cur:
+        totals = await get_aggregates_by_email(cur, email)
+    if not totals:
+        return None
+
+    income, expenses = totals["income"], totals["expenses"]
+    return build_credit_insights(income, expenses, utilization_percent(expenses, totals["credit_limit"]))
+
+async def _coalesced(flight: SingleFlight, email: str, load):
+    try:
+        return await flight.do((email, analysis_generation(email)), load, email)
+    except FlightTimeout as e:
+        raise HTTPException(status_code=504, detail=f"⚠️ {e}")
+
 @app.post("/ai/chat")
 async def ai_chat(request: Request):
     """
     Context-aware AI chat endpoint — gives concise, personalized financial advice
     using the user's data from the database.
+    Signed-in users get a server-side session: send back the returned `session_id`
+    to continue the conversation (omit it to start a new one).
+    Send {"stream": true} (or Accept: text/event-stream) to receive the reply as
+    Server-Sent Events: `token` events as text arrives, then `done` with timings.
+    Opening questions close enough to one answered before in the same context are
+    served from the answer cache; the reply then carries `cached` provenance.
     """
     data = await request.json()
     message = data.get("message", "")
@@ -493,41 +710,31 @@ async def ai_chat(request: Request):
         return {"error": "Message is required"}
 
     try:
-        # 🧩 Fetch financial context if available
-        context = {}
-        if email:
-            from Functions.GetDatabaseInfo import get_database_info
-            context = get_database_info(email)
-
-        # 🧠 Build optimized short-response prompt
-        prompt = (
-            "You are CrediWise AI — a smart, friendly credit and finance assistant. "
-            "You give short, clear, and personalized financial advice based on the user's data.\n\n"
-        )
-
-        if context:
-            prompt += (
-                f"User's latest financial data:\n"
-                f"{json.dumps(context, indent=2)}\n\n"
-            )
-
-        # Short-answer style instructions
-        prompt += (
-            f"User: {message}\n\n"
-            "Assistant: Reply in 1–3 short sentences, directly and to the point. "
-            "Use their financial data (income, expenses, balance, credit utilization, or credit score) if relevant. "
-            "Avoid long explanations, introductions, or generic information. "
-            "Keep it friendly, clear, and practical."
+        session, history = await _open_chat_session(email, data.get("session_id"))
+    except Exception as e:
+        print("⚠️ Chat session unavailable, answering without history:", str(e))
+        session, history = None, []
+
+    scopes = await _chat_cache_scopes(email, history)
+    cached = lookup_answer(message, [s for s in (scopes["user"], scopes["bucket"]) if s]) if scopes else None
+    if cached:
+        print(f"♻️ AI Chat answered from cache ({cached['provenance']['scope']}, similarity {cached['provenance']['similarity']})")
+        await _save_chat_turn(session, message, cached["reply"])
+
+    if data.get("stream") or "text/event-stream" in request.headers.get("accept", ""):
+        return StreamingResponse(
+            _cached_chat_events(cached, session) if cached else _ai_chat_events(request, message, email, session, history, scopes),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
         )
 
-        # 🧾 Generate Gemini response — shorter output cap
-        response = generate_text(prompt, temperature=0.4, max_output_tokens=150)
+    if cached:
+        return {"reply": cached["reply"], "session_id": session and session["id"], "cached": cached["provenance"]}
 
-        # 🔍 Debug logging (for testing)
-        print("\n🧠 --- Gemini Debug ---")
-        print("PROMPT SENT:\n", prompt)
-        print("RESPONSE:\n", response)
-        print("🧠 --- End Debug ---\n")
+    try:
+        # 🧾 Generate Gemini response — it fetches the user's data through tools only if needed
+        trace = {}
+        response = await chat_reply(message, email, history=history, trace=trace, temperature=0.4, max_output_tokens=150)
 
         # 🧩 Handle empty or invalid responses
         if not response.strip():
@@ -537,12 +744,118 @@ async def ai_chat(request: Request):
                 "reply": "Sorry, I couldn’t generate an answer right now. Please try again."
             }
 
-        return {"reply": response.strip()}
+        _remember_answer(scopes, message, response.strip(), trace)
+        await _save_chat_turn(session, message, response.strip())
+        return {"reply": response.strip(), "session_id": session and session["id"]}
 
+    except LLMUnavailable as e:
+        print("⚠️ AI Chat unavailable:", str(e))
+        return {"error": str(e), "reply": "The AI assistant is busy right now. Please try again in a moment."}
     except Exception as e:
         print("❌ AI Chat Error:", str(e))
         return {"error": str(e), "reply": "Something went wrong while generating a response."}
 
+async def _open_chat_session(email: Optional[str], session_id: Optional[str]):
+    # Guests (and unknown emails) chat statelessly; history is bounded by CHAT_HISTORY_TOKEN_BUDGET.
+    if not email:
+        return None, []
+    session = await open_session(email, session_id)
+    if session is None:
+        return None, []
+    history, _ = history_contents(session)
+    return session, history
+
+async def _save_chat_turn(session, message: str, reply: str):
+    if session is None:
+        return
+    try:
+        updated = await append_turn(session["id"], message, reply)
+    except Exception as e:
+        print("⚠️ Could not save chat turn:", str(e))
+        return
+    # Folding old turns into the summary costs a model call — keep it off the request path.
+    schedule_compaction(updated, summarize_conversation)
+
+async def _chat_cache_scopes(email: Optional[str], history):
+    """
+    Where this message may be answered from / cached to, or None mid-conversation
+    (a follow-up depends on what was said before, so it is never reused).
+    """
+    if history:
+        return None
+    if not email:
+        return {"user": None, "bucket": "bucket:anon"}
+    generation = analysis_generation(email)
+    # Only the bucket's inputs, in one indexed read: the full get_database_info
+    # snapshot is left to the tools, for the turns that actually need it.
+    async with async_autocommit() as cur:
+        user = await lookup_user(email, cur)
+        if user is None:
+            return None
+        await cur.execute("""
+            SELECT a.total_income, a.total_expenses, a.credit_limit,
+                   (SELECT cs.score FROM CreditScores cs WHERE cs.user_id = %(user_id)s
+                    ORDER BY cs.report_date DESC LIMIT 1)
+            FROM (SELECT 1) one LEFT JOIN UserAggregates a ON a.user_id = %(user_id)s;
+        """, {"user_id": user[0]})
+        row = await cur.fetchone()
+    income, expenses, limit = (float(v or 0) for v in row[:3])
+    snapshot = {
+        "income": income,
+        "expenses": expenses,
+        "credit_limit": limit,
+        "utilization_percent": utilization_percent(expenses, limit),
+        "credit_score": row[3],
+    }
+    return {"user": user_scope(email, generation), "bucket": context_bucket(snapshot)}
+
+def _remember_answer(scopes, message: str, reply: str, trace: dict):
+    # Answers built from the user's own data (tool calls) are only reused for that user.
+    if not scopes or not reply:
+        return
+    scope = scopes["user"] if trace.get("used_tools") else scopes["bucket"]
+    if scope:
+        store_answer(message, reply, scope, trace.get("prompt_tokens", 0) + trace.get("output_tokens", 0))
+
+def _sse(event: str, payload: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+async def _cached_chat_events(cached, session):
+    yield _sse("token", {"text": cached["reply"]})
+    yield _sse("done", {"ttft_ms": 0.0, "total_ms": 0.0, "session_id": session and session["id"], "cached": cached["provenance"]})
+
+async def _ai_chat_events(request: Request, message: str, email: Optional[str], session, history, scopes=None):
+    """
+    SSE body for streamed chat. If the client disconnects, Starlette cancels this
+    generator; closing the token stream then cancels the upstream Gemini call
+    (and the unfinished turn is not saved to the session).
+    """
+    started = time.perf_counter()
+    ttft_ms = None
+    reply = []
+    trace = {}
+    try:
+        async with aclosing(stream_chat(message, email, history=history, trace=trace, temperature=0.4, max_output_tokens=150)) as tokens:
+            async for text in tokens:
+                if ttft_ms is None:
+                    ttft_ms = round((time.perf_counter() - started) * 1000, 1)
+                reply.append(text)
+                yield _sse("token", {"text": text})
+                if await request.is_disconnected():
+                    print("⚠️ AI Chat client disconnected — generation cancelled.")
+                    return
+        total_ms = round((time.perf_counter() - started) * 1000, 1)
+        print(f"🧠 AI Chat streamed: ttft={ttft_ms} ms total={total_ms} ms")
+        if "".join(reply).strip():
+            _remember_answer(scopes, message, "".join(reply).strip(), trace)
+            await _save_chat_turn(session, message, "".join(reply).strip())
+        yield _sse("done", {"ttft_ms": ttft_ms, "total_ms": total_ms, "session_id": session and session["id"]})
+    except LLMUnavailable as e:
+        print("⚠️ AI Chat unavailable:", str(e))
+        yield _sse("error", {"error": str(e), "reply": "The AI assistant is busy right now. Please try again in a moment."})
+    except Exception as e:
+        print("❌ AI Chat Error:", str(e))
+        yield _sse("error", {"error": str(e), "reply": "Something went wrong while generating a response."})
 
 
 # ─────────── AI CREDIT ANALYSIS ───────────
@@ -553,27 +866,49 @@ async def ai_credit_analysis(email: str):
     Used by the CreditAnalysis page.
     """
     try:
-        result = ai_analyze_user(email)
+        result = await ai_analyze_user(email)
         return result
     except Exception as e:
         print("❌ AI Credit Analysis Error:", str(e))
         return {"error": str(e)}
 
+@app.post("/ai/credit_analysis/{email}/jobs", status_code=202)
+async def queue_ai_credit_analysis(email: str):
+    """
+    Queues the analysis in the background and returns its job id at once.
+    Poll GET /ai/jobs/{job_id} (with ?wait= to long-poll) for the result.
+    """
+    job = await enqueue_analysis(email)
+    if job is None:
+        raise HTTPException(status_code=404, detail="❌ User not found!")
+    return {"job_id": job["id"], "status": job["status"]}
+
+@app.get("/ai/jobs/{job_id}")
+async def get_ai_job(job_id: str, wait: float = Query(0, ge=0, le=30)):
+    """
+    Job status and, once done, its result. With ?wait=N the request is held
+    up to N seconds for the job to finish.
+    """
+    job = await wait_for_analysis_job(job_id, wait) if wait else await get_analysis_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="❌ Job not found!")
+    return job
+
 
 # ─────────── SAVINGS CHALLENGES ───────────
 @app.get("/challenges/{email}")
-def get_user_challenges(email: str):
+async def get_user_challenges(email: str):
     """
     Fetch all active and completed savings challenges for a user.
     """
     try:
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT id, user_email, title, goal_amount, progress, start_date, end_date, completed
-            FROM savings_challenges
-            WHERE user_email = %s;
-        """, (email,))
-        rows = cur.fetchall()
+        async with async_transaction() as cur:
+            await cur.execute("""
+                SELECT id, user_email, title, goal_amount, progress, start_date, end_date, completed
+                FROM savings_challenges
+                WHERE user_email = %s;
+            """, (email,))
+            rows = await cur.fetchall()
 
         challenges = [
             {
@@ -589,7 +924,6 @@ def get_user_challenges(email: str):
             for r in rows
         ]
 
-        cur.close()
         return {"challenges": challenges}
 
     except Exception as e:
@@ -598,7 +932,7 @@ def get_user_challenges(email: str):
 
 
 @app.post("/challenges/add")
-def add_challenge(data: dict = Body(...)):
+async def add_challenge(data: dict = Body(...)):
     """
     Add a new savings challenge for a user.
     Example body:
@@ -616,13 +950,12 @@ def add_challenge(data: dict = Body(...)):
         if not email or not title or goal_amount <= 0:
             raise HTTPException(status_code=400, detail="Invalid input")
 
-        cur = conn.cursor()
-        cur.execute("""
-            INSERT INTO savings_challenges (user_email, title, goal_amount, progress, completed)
-            VALUES (%s, %s, %s, %s, %s);
-        """, (email, title, goal_amount, 0, False))
-        conn.commit()
-        cur.close()
+        async with async_transaction() as cur:
+            await cur.execute("""
+                INSERT INTO savings_challenges (user_email, title, goal_amount, progress, completed)
+                VALUES (%s, %s, %s, %s, %s);
+            """, (email, title, goal_amount, 0, False))
+        invalidate_analysis(email)
 
         return {"message": "✅ Challenge added successfully!"}
 
@@ -632,12 +965,13 @@ def add_challenge(data: dict = Body(...)):
 
 
 @app.delete("/challenges/delete/{challenge_id}")
-def delete_challenge(challenge_id: str):
+async def delete_challenge(challenge_id: str):
     try:
-        cur = conn.cursor()
-        cur.execute("DELETE FROM savings_challenges WHERE id = %s;", (challenge_id,))
-        conn.commit()
-        cur.close()
+        async with async_transaction() as cur:
+            await cur.execute("DELETE FROM savings_challenges WHERE id = %s RETURNING user_email;", (challenge_id,))
+            row = await cur.fetchone()
+        if row:
+            invalidate_analysis(row[0])
         return {"message": "✅ Challenge deleted successfully!"}
     except Exception as e:
         print("❌ Error deleting challenge:", str(e))
@@ -645,7 +979,7 @@ def delete_challenge(challenge_id: str):
 
 
 @app.put("/challenges/update_progress")
-def update_challenge_progress(data: dict = Body(...)):
+async def update_challenge_progress(data: dict = Body(...)):
     """
     Update progress for a savings challenge.
     Example:
@@ -660,17 +994,18 @@ def update_challenge_progress(data: dict = Body(...)):
         if not challenge_id or amount <= 0:
             raise HTTPException(status_code=400, detail="Invalid input")
 
-        cur = conn.cursor()
-        cur.execute("""
-            UPDATE savings_challenges
-            SET progress = progress + %s,
-                completed = CASE WHEN progress + %s >= goal_amount THEN TRUE ELSE completed END
-            WHERE id = %s
-            RETURNING goal_amount, progress + %s >= goal_amount;
-        """, (amount, amount, challenge_id, amount))
-        row = cur.fetchone()
-        conn.commit()
-        cur.close()
+        async with async_transaction() as cur:
+            await cur.execute("""
+                UPDATE savings_challenges
+                SET progress = progress + %s,
+                    completed = CASE WHEN progress + %s >= goal_amount THEN TRUE ELSE completed END
+                WHERE id = %s
+                RETURNING goal_amount, progress + %s >= goal_amount, user_email;
+            """, (amount, amount, challenge_id, amount))
+            row = await cur.fetchone()
+
+        if row:
+            invalidate_analysis(row[2])
 
         if row and row[1]:
             return {"message": "🎉 Goal completed! You’ve reached your savings target!"}
@@ -0,0 +1,84 @@
+from itertools import count
+
+import pytest
+from cachetools import TTLCache
+
+from Functions import AnalysisCache as cache
+from Functions.AnalysisCache import (
+    ANALYSIS_GENERATION_TTL_S,
+    analysis_generation,
+    get_cached_analysis,
+    invalidate_all_analyses,
+    invalidate_analysis,
+    store_analysis,
+)
+from Functions.ChatAnswerCache import CHAT_CACHE_TTL_S
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch, clock):
+    monkeypatch.setattr(cache, "_cache", TTLCache(maxsize=8, ttl=60))
+    monkeypatch.setattr(cache, "_keys_by_email", {})
+    monkeypatch.setattr(cache, "_generation", cache._Generations(maxsize=2, ttl=60, timer=clock))
+    monkeypatch.setattr(cache, "_stamps", count(1))
+    monkeypatch.setattr(cache, "_epoch", 0)
+    monkeypatch.setattr(cache, "_stats", dict.fromkeys(cache._stats, 0))
+
+
+def test_store_then_invalidate():
+    store_analysis("a@x", "k1", {"score": 1}, analysis_generation("a@x"))
+    assert get_cached_analysis("k1") == {"score": 1}
+    invalidate_analysis("a@x")
+    assert get_cached_analysis("k1") is None
+
+
+def test_result_computed_before_a_write_is_not_stored():
+    generation = analysis_generation("a@x")
+    invalidate_analysis("a@x")
+    store_analysis("a@x", "k1", {"score": 1}, generation)
+    assert get_cached_analysis("k1") is None
+
+
+def test_invalidate_all_bumps_every_generation():
+    generation = analysis_generation("a@x")
+    invalidate_all_analyses()
+    store_analysis("a@x", "k1", {"score": 1}, generation)
+    assert get_cached_analysis("k1") is None
+
+
+def test_generations_are_never_reused(clock):
+    seen = [analysis_generation("a@x")]
+    invalidate_analysis("a@x")
+    seen.append(analysis_generation("a@x"))
+    clock.now += 61  # the stamp expires; the user falls back to the epoch
+    invalidate_analysis("a@x")
+    assert analysis_generation("a@x") not in seen
+
+
+def test_stamps_outlive_every_entry_keyed_on_them():
+    assert ANALYSIS_GENERATION_TTL_S >= max(cache.ANALYSIS_CACHE_TTL_S, CHAT_CACHE_TTL_S)
+
+
+def test_evicting_a_stamp_moves_everyone_forward():
+    before = {email: analysis_generation(email) for email in ("a@x", "idle@x")}
+    for email in ("a@x", "b@x", "c@x"):
+        invalidate_analysis(email)
+    assert len(cache._generation) == 2
+    assert cache._stats["generation_evictions"] == 1
+    assert analysis_generation("idle@x") > before["idle@x"]
+    # a@x's stamp was evicted: its generation still went forward, not back.
+    assert analysis_generation("a@x") > before["a@x"]
+    assert analysis_generation("a@x") >= analysis_generation("b@x")
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from Functions import Categorizer
+from Functions.Categorizer import CATEGORIES, FALLBACK, LABEL_WEIGHT, learn_labels, predict_categories, predict_category
+
+
+@pytest.fixture(autouse=True)
+def seed_model(monkeypatch):
+    """Every test starts from the seed phrases only, whatever earlier tests learned."""
+    monkeypatch.setattr(Categorizer, "_model", Categorizer._seed_model())
+
+
+@pytest.mark.parametrize("description, amount, expected", [
+    ("Starbucks coffee", -5.0, "cat_005"),
+    ("NETFLIX.COM 8841", -15.99, "cat_009"),
+    ("UBER *TRIP 8841", -12.0, "cat_008"),
+    ("monthly salary", 3000.0, "cat_001"),
+    ("tax refund", 250.0, "cat_003"),
+])
+def test_seed_predictions(description, amount, expected):
+    assert predict_category(description, amount) == (expected, CATEGORIES[expected][0])
+
+
+def test_only_categories_of_the_amounts_kind_are_considered():
+    ids, _ = predict_categories(["refund"] * 2, [30.0, -30.0])
+    assert CATEGORIES[ids[0]][1] == "income"
+    assert CATEGORIES[ids[1]][1] == "expense"
+
+
+@pytest.mark.parametrize("description", [None, "", "   ", "#### 8841"])
+def test_rows_without_words_get_the_fallback(description):
+    assert predict_categories([description, description], [-5.0, 5.0])[0] == [FALLBACK["expense"], FALLBACK["income"]]
+
+
+def test_low_confidence_gets_the_fallback(monkeypatch):
+    monkeypatch.setattr(Categorizer, "CATEGORIZER_MIN_CONFIDENCE", 1.01)
+    assert predict_categories(["Starbucks coffee"], [-5.0])[0] == [FALLBACK["expense"]]
+
+
+def test_batch_matches_single_predictions():
+    descriptions = ["Starbucks coffee", "rent", None, "Starbucks coffee", "paycheck"]
+    amounts = [-5.0, -1200.0, -3.0, -5.0, 2000.0]
+    ids, confidence = predict_categories(descriptions, amounts)
+    assert ids == [predict_category(d, a)[0] for d, a in zip(descriptions, amounts)]
+    assert confidence.shape == (5,) and np.all((confidence >= 0) & (confidence <= 1))
+
+
+def test_empty_batch():
+    ids, confidence = predict_categories([], [])
+    assert ids == [] and len(confidence) == 0
+
+
+def test_retrains_from_corrections():
+    assert predict_category("Zorblax Emporium", -40.0)[0] == FALLBACK["expense"]
+    assert learn_labels([("Zorblax Emporium", -40.0, "cat_010")]) == 1
+    assert predict_category("Zorblax Emporium", -40.0)[0] == "cat_010"
+    # Character trigrams carry the correction to other spellings of the merchant.
+    assert predict_category("ZORBLAX EMPORIUM #2291", -12.5)[0] == "cat_010"
+
+
+def test_a_negative_weight_takes_a_correction_back():
+    learn_labels([("Zorblax Emporium", -40.0, "cat_010")])
+    learn_labels([("Zorblax Emporium", -40.0, "cat_010")], weight=-LABEL_WEIGHT)
+    assert predict_category("Zorblax Emporium", -40.0)[0] == FALLBACK["expense"]
+
+
+def test_labels_outside_the_catalog_are_skipped():
+    assert learn_labels([("Zorblax Emporium", -40.0, "cat_999")]) == 0
+    assert predict_category("Zorblax Emporium", -40.0)[0] == FALLBACK["expense"]
@@ -0,0 +1,82 @@
+import pytest
+
+from Functions import ChatAnswerCache as cache
+from Functions.ChatAnswerCache import jaccard, lookup_answer, shingles, store_answer
+
+QUESTION = "How do I improve my credit score?"
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    monkeypatch.setattr(cache, "_entries", type(cache._entries)())
+    monkeypatch.setattr(cache, "_bands", {})
+    monkeypatch.setattr(cache, "_stats", dict.fromkeys(cache._stats, 0))
+
+
+def test_normalization_ignores_case_punctuation_and_stopwords():
+    assert shingles(QUESTION) == shingles("how can i improve my credit score")
+    assert shingles("Paying bills") == shingles("pay bill")
+
+
+def test_paraphrase_hits_and_unrelated_misses():
+    store_answer(QUESTION, "Pay on time.", "bucket:a", tokens=100)
+    hit = lookup_answer("how can I improve my credit score", ["bucket:a"])
+    assert hit["reply"] == "Pay on time."
+    assert hit["provenance"]["similarity"] == 1.0
+    assert lookup_answer("what is a good budget for groceries", ["bucket:a"]) is None
+
+
+def test_threshold_decides_near_misses(monkeypatch):
+    near = "how do i improve my credit score fast"
+    similarity = jaccard(shingles(QUESTION), shingles(near))
+    store_answer(QUESTION, "Pay on time.", "bucket:a", tokens=1)
+    monkeypatch.setattr(cache, "CHAT_CACHE_THRESHOLD", similarity + 0.01)
+    assert lookup_answer(near, ["bucket:a"]) is None
+    monkeypatch.setattr(cache, "CHAT_CACHE_THRESHOLD", similarity - 0.01)
+    assert lookup_answer(near, ["bucket:a"])["reply"] == "Pay on time."
+
+
+def test_scopes_are_isolated_and_tried_in_order():
+    store_answer(QUESTION, "generic", "bucket:a", tokens=1)
+    store_answer(QUESTION, "personal", "user:a@x.com:0", tokens=1)
+    assert lookup_answer(QUESTION, ["user:b@x.com:0"]) is None
+    assert lookup_answer(QUESTION, ["bucket:b"]) is None
+    assert lookup_answer(QUESTION, ["user:a@x.com:0", "bucket:a"])["reply"] == "personal"
+    assert lookup_answer(QUESTION, ["user:a@x.com:1", "bucket:a"])["reply"] == "generic"
+
+
+def test_only_user_scope_echoes_the_matched_question():
+    store_answer(QUESTION, "generic", "bucket:a", tokens=1)
+    store_answer(QUESTION, "personal", "user:a@x.com:0", tokens=1)
+    assert lookup_answer(QUESTION, ["bucket:a"])["provenance"]["matched_question"] is None
+    assert lookup_answer(QUESTION, ["user:a@x.com:0"])["provenance"]["matched_question"] == QUESTION
+
+
+def test_lru_eviction_keeps_recently_hit_entries(monkeypatch):
+    monkeypatch.setattr(cache, "CHAT_CACHE_SIZE", 2)
+    store_answer("how do I raise my credit limit", "limit", "bucket:a", tokens=1)
+    store_answer("should I close old cards", "cards", "bucket:a", tokens=1)
+    assert lookup_answer("how do I raise my credit limit", ["bucket:a"])  # now most recent
+    store_answer("what is utilization", "util", "bucket:a", tokens=1)
+
+    assert lookup_answer("should I close old cards", ["bucket:a"]) is None
+    assert lookup_answer("how do I raise my credit limit", ["bucket:a"])["reply"] == "limit"
+    assert lookup_answer("what is utilization", ["bucket:a"])["reply"] == "util"
+    assert cache.get_chat_cache_stats()["evictions"] == 1
+    # Evicted entries leave no ids behind in the LSH bands.
+    live = set(cache._entries)
+    assert all(members <= live for members in cache._bands.values())
+
+
+def test_expired_entries_are_dropped(monkeypatch):
+    store_answer(QUESTION, "old", "bucket:a", tokens=1)
+    monkeypatch.setattr(cache, "CHAT_CACHE_TTL_S", -1)
+    assert lookup_answer(QUESTION, ["bucket:a"]) is None
+    assert not cache._entries and not cache._bands
+
+
+def test_context_bucket_bands():
+    snapshot = {"credit_limit": 1000, "income": 2000, "expenses": 1800, "utilization_percent": 35, "credit_score": 700}
+    assert cache.context_bucket(snapshot) == "bucket:util-30-50/spend-80-100/score-good"
+    assert cache.context_bucket(None) == "bucket:anon"
+    assert cache.context_bucket({"error": "User not found"}) == "bucket:anon"
@@ -0,0 +1,114 @@
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from Functions.LLMClient import LLMUnavailable
+
+
+class FakeStream:
+    """Stands in for the model stream: yields `chunks`, then raises `error` if given."""
+
+    def __init__(self, chunks, error=None):
+        self.chunks = chunks
+        self.error = error
+        self.sent = 0
+        self.closed = False
+
+    def __call__(self, *args, **kwargs):
+        return self._tokens()
+
+    async def _tokens(self):
+        try:
+            for chunk in self.chunks:
+                self.sent += 1
+                yield chunk
+            if self.error is not None:
+                raise self.error
+        finally:
+            self.closed = True
+
+
+class FakeRequest:
+    """Reports a disconnect once `after` events have been sent."""
+
+    def __init__(self, after):
+        self.after = after
+        self.checks = 0
+
+    async def is_disconnected(self):
+        self.checks += 1
+        return self.checks >= self.after
+
+
+def parse_sse(body: str):
+    events = []
+    for block in body.split("\n\n"):
+        if not block:
+            continue
+        event, data = block.split("\n")
+        assert event.startswith("event: ") and data.startswith("data: ")
+        events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+@pytest.fixture
+def stream(monkeypatch):
+    def install(chunks, error=None):
+        fake = FakeStream(chunks, error)
+        monkeypatch.setattr(main, "stream_chat", fake)
+        return fake
+    return install
+
+
+@pytest.fixture(autouse=True)
+def empty_answer_cache(monkeypatch):
+    from Functions import ChatAnswerCache
+    monkeypatch.setattr(ChatAnswerCache, "_entries", type(ChatAnswerCache._entries)())
+    monkeypatch.setattr(ChatAnswerCache, "_bands", {})
+
+
+def test_stream_frames_tokens_then_done(stream):
+    stream(["Pay ", "on ", "time."])
+    # No lifespan and no email: the guest path never touches the database.
+    response = TestClient(main.app).post("/ai/chat", json={"message": "how do I build credit?", "stream": True})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.headers["cache-control"] == "no-cache"
+    events = parse_sse(response.text)
+    assert [e for e, _ in events] == ["token", "token", "token", "done"]
+    assert "".join(data["text"] for e, data in events if e == "token") == "Pay on time."
+    done = events[-1][1]
+    assert done["session_id"] is None
+    assert done["ttft_ms"] <= done["total_ms"]
+
+
+def test_accept_header_selects_streaming(stream):
+    stream(["ok"])
+    response = TestClient(main.app).post(
+        "/ai/chat", json={"message": "hello there"}, headers={"Accept": "text/event-stream"},
+    )
+    assert [e for e, _ in parse_sse(response.text)] == ["token", "done"]
+
+
+def test_unavailable_model_ends_with_error_event(stream):
+    stream(["partial"], error=LLMUnavailable("circuit open"))
+    response = TestClient(main.app).post("/ai/chat", json={"message": "am I overspending?", "stream": True})
+    events = parse_sse(response.text)
+    assert [e for e, _ in events] == ["token", "error"]
+    assert events[-1][1]["error"] == "circuit open"
+    assert "busy" in events[-1][1]["reply"]
+
+
+def test_disconnect_stops_generation(stream):
+    fake = stream(["one", "two", "three", "four"])
+
+    async def consume():
+        return [event async for event in main._ai_chat_events(FakeRequest(after=2), "hi", None, None, [])]
+
+    events = asyncio.run(consume())
+    assert [e for e, _ in parse_sse("".join(events))] == ["token", "token"]
+    assert fake.sent == 2
+    assert fake.closed
@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+from cachetools import TTLCache
+
+from Functions import HotCache
+from Functions.HotCache import cached_user, forget_user, lookup_user, remember_user, sample_tips
+
+ROW = ("usr_1", "ada", "ada@x.com")
+
+
+class FakeCursor:
+    """Answers SELECTs from a fixed list of rows and counts the round trips."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.executed = 0
+
+    async def execute(self, sql, params=None):
+        self.executed += 1
+
+    async def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    async def fetchall(self):
+        return self.rows
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(HotCache, "HOT_CACHE_ENABLED", True)
+    monkeypatch.setattr(HotCache, "_users", TTLCache(maxsize=8, ttl=60))
+    monkeypatch.setattr(HotCache, "_user_epoch", 0)
+    monkeypatch.setattr(HotCache, "_tips", [])
+    monkeypatch.setattr(HotCache, "_tips_loaded_at", None)
+    monkeypatch.setattr(HotCache, "_stats", dict.fromkeys(HotCache._stats, 0))
+
+
+def test_lookup_reads_once_then_hits():
+    cur = FakeCursor([ROW])
+    assert asyncio.run(lookup_user("ada@x.com", cur)) == ROW
+    assert asyncio.run(lookup_user("ada@x.com", cur)) == ROW
+    assert cur.executed == 1
+    stats = HotCache.get_hot_cache_stats()["users"]
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 1, 1)
+
+
+def test_unknown_email_is_not_cached():
+    cur = FakeCursor([])
+    assert asyncio.run(lookup_user("new@x.com", cur)) is None
+    cur.rows = [("usr_2", "new", "new@x.com")]
+    # The signup is visible on the very next lookup.
+    assert asyncio.run(lookup_user("new@x.com", cur)) == ("usr_2", "new", "new@x.com")
+
+
+def test_forget_drops_the_row():
+    remember_user(*ROW)
+    forget_user("ada@x.com")
+    assert cached_user("ada@x.com") is None
+    assert HotCache.get_hot_cache_stats()["users"]["invalidations"] == 1
+
+
+def test_read_from_before_an_update_is_not_stored():
+    epoch = HotCache._user_epoch
+    forget_user("ada@x.com")  # an update commits while the old row is in flight
+    remember_user(*ROW, epoch=epoch)
+    assert cached_user("ada@x.com") is None
+    remember_user(*ROW, epoch=HotCache._user_epoch)
+    assert cached_user("ada@x.com") == ROW
+
+
+def test_disabled_cache_always_reads(monkeypatch):
+    monkeypatch.setattr(HotCache, "HOT_CACHE_ENABLED", False)
+    cur = FakeCursor([ROW])
+    asyncio.run(lookup_user("ada@x.com", cur))
+    asyncio.run(lookup_user("ada@x.com", cur))
+    assert cur.executed == 2
+    assert len(HotCache._users) == 0
+
+
+def test_tips_reload_after_their_interval(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(HotCache, "time", clock)
+    cur = FakeCursor([(f"tip {i}", "content", "budgeting") for i in range(5)])
+    tips = asyncio.run(sample_tips(cur, 3))
+    assert len(tips) == 3 and len({t["title"] for t in tips}) == 3
+    asyncio.run(sample_tips(cur, 3))
+    assert cur.executed == 1
+    clock.now += HotCache.TIPS_RELOAD_S + 1
+    assert len(asyncio.run(sample_tips(cur, 10))) == 5
+    assert cur.executed == 2
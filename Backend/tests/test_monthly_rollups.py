@@ -0,0 +1,115 @@
+import asyncio
+from datetime import date
+from uuid import uuid4
+
+import psycopg
+import pytest
+
+from Functions.AddTransaction import insert_transaction
+from Functions.Database import CONNINFO, async_transaction, close_pool, open_pool
+from Functions.MonthlyRollups import fetch_analytics, month_start, rebuild_monthly_rollups
+
+# These run against the database configured in .env and skip when it is not reachable.
+
+THIS_MONTH = month_start(date.today())
+LAST_MONTH = month_start(THIS_MONTH, 1)
+
+
+@pytest.fixture(scope="module", autouse=True)
+def database():
+    try:
+        psycopg.connect(CONNINFO, connect_timeout=2).close()
+    except psycopg.OperationalError as e:
+        pytest.skip(f"database not reachable: {e}")
+
+
+def run(scenario):
+    async def wrapped():
+        await open_pool()
+        try:
+            return await scenario()
+        finally:
+            await close_pool()
+    return asyncio.run(wrapped())
+
+
+@pytest.fixture
+def user():
+    user_id = f"usr_test_{uuid4().hex[:8]}"
+    email = f"{user_id}@test.local"
+
+    async def create():
+        async with async_transaction() as cur:
+            await cur.execute("INSERT INTO Users (id, username, email, password_hash) VALUES (%s, %s, %s, 'x');",
+                              (user_id, user_id, email))
+            for amount, category_id, day in (
+                (3000.0, "cat_001", LAST_MONTH),
+                (-120.5, "cat_004", LAST_MONTH),
+                (-80.0, "cat_004", THIS_MONTH),
+                (-45.25, "cat_005", THIS_MONTH),
+            ):
+                await insert_transaction(cur, email=email, amount=amount, description="test",
+                                         transaction_date=day, category_id=category_id)
+
+    async def drop():
+        async with async_transaction() as cur:
+            for table in ("MonthlyRollups", "Transactions", "CreditScoreHistory", "CreditScores",
+                          "UserAggregates", "Accounts"):
+                await cur.execute(f"DELETE FROM {table} WHERE user_id = %s;", (user_id,))
+            await cur.execute("DELETE FROM Users WHERE id = %s;", (user_id,))
+
+    run(create)
+    yield user_id, email
+    run(drop)
+
+
+async def _rollups(user_id):
+    async with async_transaction() as cur:
+        await cur.execute("""
+            SELECT month, category_id, income::float8, expenses::float8, tx_count
+            FROM MonthlyRollups WHERE user_id = %s AND tx_count > 0 ORDER BY 1, 2;
+        """, (user_id,))
+        return await cur.fetchall()
+
+
+EXPECTED = [
+    (LAST_MONTH, "cat_001", 3000.0, 0.0, 1),
+    (LAST_MONTH, "cat_004", 0.0, 120.5, 1),
+    (THIS_MONTH, "cat_004", 0.0, 80.0, 1),
+    (THIS_MONTH, "cat_005", 0.0, 45.25, 1),
+]
+
+
+def test_writes_keep_rollups_current(user):
+    user_id, _ = user
+    assert run(lambda: _rollups(user_id)) == EXPECTED
+
+
+def test_rebuild_restores_drifted_rollups(user):
+    user_id, _ = user
+
+    async def scenario():
+        async with async_transaction() as cur:
+            await cur.execute("UPDATE MonthlyRollups SET income = 1, expenses = 1, tx_count = 9 WHERE user_id = %s;",
+                              (user_id,))
+            await rebuild_monthly_rollups(cur, [user_id])
+        return await _rollups(user_id)
+
+    assert run(scenario) == EXPECTED
+
+
+def test_analytics_reads_the_rollups(user):
+    _, email = user
+    result = run(lambda: fetch_analytics(email, months=2))
+    assert [(m["month"], m["income"], m["expenses"], m["transactions"]) for m in result["months"]] == [
+        (LAST_MONTH, 3000.0, 120.5, 2),
+        (THIS_MONTH, 0.0, 125.25, 2),
+    ]
+    assert result["totals"] == {"income": 3000.0, "expenses": 245.75, "transactions": 4}
+    groceries = result["categories"][0]
+    assert (groceries["category_id"], groceries["expenses"], groceries["monthly_expenses"]) == ("cat_004", 200.5, [120.5, 80.0])
+    assert groceries["share_of_expenses"] == round(200.5 / 245.75, 4)
+
+
+def test_analytics_unknown_user():
+    assert run(lambda: fetch_analytics(f"nobody_{uuid4().hex[:8]}@test.local")) is None
@@ -0,0 +1,77 @@
+import asyncio
+from datetime import date, datetime, timezone
+from uuid import uuid4
+
+import psycopg
+import pytest
+
+from Functions.Database import CONNINFO, async_transaction, close_pool, open_pool
+from Functions.ScoreHistory import fetch_score_history
+
+# These run against the database configured in .env and skip when it is not reachable.
+
+
+@pytest.fixture(scope="module", autouse=True)
+def database():
+    try:
+        psycopg.connect(CONNINFO, connect_timeout=2).close()
+    except psycopg.OperationalError as e:
+        pytest.skip(f"database not reachable: {e}")
+
+
+async def west_coast(conn):
+    # Far enough from UTC that a late-evening UTC change is still "yesterday" locally.
+    await conn.execute("SET TIME ZONE 'America/Los_Angeles';")
+
+
+def run(scenario):
+    async def wrapped():
+        await open_pool(configure=west_coast)
+        try:
+            return await scenario()
+        finally:
+            await close_pool()
+    return asyncio.run(wrapped())
+
+
+@pytest.fixture
+def user():
+    user_id = f"usr_test_{uuid4().hex[:8]}"
+    email = f"{user_id}@test.local"
+
+    async def create():
+        async with async_transaction() as cur:
+            await cur.execute("INSERT INTO Users (id, username, email, password_hash) VALUES (%s, %s, %s, 'x');",
+                              (user_id, user_id, email))
+            await cur.executemany(
+                "INSERT INTO CreditScoreHistory (user_id, recorded_at, score, source) VALUES (%s, %s, %s, 'test');",
+                [
+                    (user_id, datetime(2026, 3, 10, 9, 0, tzinfo=timezone.utc), 700),
+                    (user_id, datetime(2026, 3, 10, 23, 30, tzinfo=timezone.utc), 710),
+                    (user_id, datetime(2026, 3, 31, 23, 30, tzinfo=timezone.utc), 705),
+                ],
+            )
+
+    async def drop():
+        async with async_transaction() as cur:
+            await cur.execute("DELETE FROM CreditScoreHistory WHERE user_id = %s;", (user_id,))
+            await cur.execute("DELETE FROM Users WHERE id = %s;", (user_id,))
+
+    run(create)
+    yield email
+    run(drop)
+
+
+def test_day_buckets_are_labelled_in_utc(user):
+    result = run(lambda: fetch_score_history(user, date(2026, 3, 1), date(2026, 3, 31), "day"))
+    assert [(p["date"], p["score"], p["changes"]) for p in result["points"]] == [
+        (date(2026, 3, 10), 710, 2),
+        (date(2026, 3, 31), 705, 1),
+    ]
+
+
+def test_month_buckets_are_labelled_in_utc(user):
+    result = run(lambda: fetch_score_history(user, date(2026, 3, 1), date(2026, 3, 31), "month"))
+    assert [(p["date"], p["score"], p["min"], p["max"]) for p in result["points"]] == [
+        (date(2026, 3, 1), 705, 700, 710),
+    ]
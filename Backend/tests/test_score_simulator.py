@@ -0,0 +1,59 @@
+import numpy as np
+
+from Functions.CreditScoring import score_batch
+from Functions.ScoreSimulator import PERCENTILES, simulate_scores
+
+TOTALS = {"income": 5000.0, "expenses": 1000.0, "balance": 4000.0, "credit_limit": 10000.0}
+HISTORY = np.array([[3000.0, 2500.0], [3200.0, 3900.0], [2800.0, 1200.0], [0.0, 800.0]])
+
+
+def final_scores(result):
+    return result["final"]["distribution"]
+
+
+def test_same_seed_same_projection():
+    first = simulate_scores(TOTALS, HISTORY, months=6, paths=500, seed=3)
+    assert first == simulate_scores(TOTALS, HISTORY, months=6, paths=500, seed=3)
+    assert first["current_score"] == int(score_batch([5000], [1000], [4000], [10000])[0])
+
+
+def test_bands_are_ordered_and_distribution_sums_to_one():
+    result = simulate_scores(TOTALS, HISTORY, months=12, paths=2000, seed=1)
+    assert [b["month"] for b in result["bands"]] == list(range(1, 13))
+    for band in result["bands"]:
+        values = [band[f"p{p}"] for p in PERCENTILES]
+        assert values == sorted(values)
+    assert abs(sum(final_scores(result).values()) - 1.0) < 1e-3
+    assert result["baseline"] == {"monthly_income_mean": 2250.0, "monthly_expense_mean": 2100.0}
+
+
+def test_single_month_history_matches_rule_scoring():
+    # Every path draws the same month, so each month's score is known exactly.
+    history = np.array([[1000.0, 1500.0]])
+    result = simulate_scores(TOTALS, history, months=4, paths=50, seed=0)
+    months = np.arange(1, 5)
+    expected = score_batch(5000 + 1000 * months, 1000 + 1500 * months, 4000 - 500 * months, [10000] * 4)
+    assert [b["p50"] for b in result["bands"]] == expected.tolist()
+    assert all(b["p5"] == b["p95"] for b in result["bands"])
+    assert final_scores(result) == {int(expected[-1]): 1.0}
+
+
+def test_what_if_changes_apply():
+    # Unchanged, the user is overspending and in the red by month 3.
+    history = np.array([[1000.0, 3000.0]])
+    base = simulate_scores(TOTALS, history, months=3, paths=10, seed=0)
+    raised = simulate_scores(TOTALS, history, months=3, paths=10, seed=0, monthly_income_change=2500)
+    cut = simulate_scores(TOTALS, history, months=3, paths=10, seed=0, expense_scale=0.3)
+    assert raised["bands"][-1]["p50"] > base["bands"][-1]["p50"]
+    assert cut["bands"][-1]["p50"] > base["bands"][-1]["p50"]
+
+
+def test_one_off_hits_from_its_month_on():
+    quiet = np.zeros((0, 2))
+    result = simulate_scores(TOTALS, quiet, months=4, paths=10, seed=0, one_off=[(2, -20000.0), (9, 50000.0)])
+    scores = [b["p50"] for b in result["bands"]]
+    assert scores[0] == result["current_score"]
+    assert scores[1] < scores[0]
+    assert scores[1:] == [scores[1]] * 3
+    assert result["history_months"] == 0
+    assert result["baseline"] == {"monthly_income_mean": 0.0, "monthly_expense_mean": 0.0}
@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+
+from Functions.SingleFlight import FlightTimeout, SingleFlight
+
+
+class Upstream:
+    """A call that blocks until released, counting how often it actually runs."""
+
+    def __init__(self):
+        self.calls = 0
+        self.release = asyncio.Event()
+        self.cancelled = False
+
+    async def __call__(self, value="result", error=None):
+        self.calls += 1
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if error is not None:
+            raise error
+        return value
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_concurrent_calls_share_one_execution():
+    async def scenario():
+        group, upstream = SingleFlight("test-share"), Upstream()
+        waiters = [asyncio.create_task(group.do("k", upstream)) for _ in range(5)]
+        await asyncio.sleep(0)
+        upstream.release.set()
+        return await asyncio.gather(*waiters), upstream.calls, group.stats()
+
+    results, calls, stats = run(scenario())
+    assert results == ["result"] * 5
+    assert calls == 1
+    assert (stats["executions"], stats["coalesced"], stats["max_waiters"], stats["in_flight"]) == (1, 4, 5, 0)
+
+
+def test_different_keys_run_separately():
+    async def scenario():
+        group, upstream = SingleFlight("test-keys"), Upstream()
+        upstream.release.set()
+        return await asyncio.gather(group.do("a", upstream, "A"), group.do("b", upstream, "B")), upstream.calls
+
+    assert run(scenario()) == (["A", "B"], 2)
+
+
+def test_finished_call_is_not_reused():
+    async def scenario():
+        group, upstream = SingleFlight("test-fresh"), Upstream()
+        upstream.release.set()
+        await group.do("k", upstream)
+        await group.do("k", upstream)
+        return upstream.calls
+
+    assert run(scenario()) == 2
+
+
+def test_error_reaches_every_follower():
+    async def scenario():
+        group, upstream = SingleFlight("test-error"), Upstream()
+        waiters = [asyncio.create_task(group.do("k", upstream, error=ValueError("boom"))) for _ in range(3)]
+        await asyncio.sleep(0)
+        upstream.release.set()
+        return await asyncio.gather(*waiters, return_exceptions=True), group.stats()
+
+    results, stats = run(scenario())
+    assert [type(r) for r in results] == [ValueError] * 3
+    assert stats["errors"] == 1
+
+
+def test_follower_timeout_leaves_the_leader_running():
+    async def scenario():
+        group, upstream = SingleFlight("test-timeout"), Upstream()
+        leader = asyncio.create_task(group.do("k", upstream, timeout=5))
+        await asyncio.sleep(0)
+        with pytest.raises(FlightTimeout):
+            await group.do("k", upstream, timeout=0.01)
+        upstream.release.set()
+        return await leader, upstream.cancelled, group.stats()["timeouts"]
+
+    assert run(scenario()) == ("result", False, 1)
+
+
+def test_cancelled_leader_keeps_the_call_for_followers():
+    async def scenario():
+        group, upstream = SingleFlight("test-cancel-one"), Upstream()
+        leader = asyncio.create_task(group.do("k", upstream))
+        follower = asyncio.create_task(group.do("k", upstream))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0)
+        upstream.release.set()
+        return await follower, leader.cancelled(), upstream.cancelled
+
+    assert run(scenario()) == ("result", True, False)
+
+
+def test_call_is_cancelled_once_nobody_waits():
+    async def scenario():
+        group, upstream = SingleFlight("test-cancel-all"), Upstream()
+        waiters = [asyncio.create_task(group.do("k", upstream)) for _ in range(2)]
+        await asyncio.sleep(0)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.sleep(0)
+        return upstream.cancelled, group.stats()["in_flight"]
+
+    assert run(scenario()) == (True, 0)
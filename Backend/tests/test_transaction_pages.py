@@ -0,0 +1,33 @@
+import base64
+from datetime import date
+
+import pytest
+
+from Functions.TransactionPages import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(date(2026, 3, 31), "tx_1a2b3c4d")
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (date(2026, 3, 31), "tx_1a2b3c4d")
+
+
+def test_cursor_keeps_separator_inside_id():
+    assert decode_cursor(encode_cursor(date(2025, 1, 1), "tx|odd|id")) == (date(2025, 1, 1), "tx|odd|id")
+
+
+def test_cursor_is_url_safe():
+    cursor = encode_cursor(date(2026, 12, 31), "tx_??>>~~")
+    assert set(cursor) <= set("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_")
+
+
+@pytest.mark.parametrize("cursor", [
+    "",
+    "not a cursor!",
+    base64.urlsafe_b64encode(b"2026-01-01").decode(),         # no id part
+    base64.urlsafe_b64encode(b"2026-13-01|tx_1").decode(),    # not a date
+    base64.urlsafe_b64encode(b"\xff\xfe|tx_1").decode(),      # not UTF-8
+])
+def test_decode_rejects_foreign_cursors(cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(cursor)
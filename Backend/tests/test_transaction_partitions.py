@@ -0,0 +1,29 @@
+import asyncio
+from datetime import date
+
+import pytest
+
+from Functions import TransactionPartitions as partitions
+from Functions.TransactionPartitions import archive_partition, get_partition_stats, live_window
+
+
+def test_archival_is_off_without_a_location(monkeypatch):
+    monkeypatch.setattr(partitions, "TX_ARCHIVE_DIR", "")
+    monkeypatch.setattr(partitions, "TX_ARCHIVE_AFTER_MONTHS", 24)
+    # Nothing is ever archived, so every month stays live.
+    assert live_window(date(2026, 10, 18)) == (date(2026, 10, 1), date(2027, 1, 1))
+    assert get_partition_stats()["archive_after_months"] == 0
+
+
+def test_no_detach_without_a_location(monkeypatch):
+    monkeypatch.setattr(partitions, "TX_ARCHIVE_DIR", "")
+    # Refused before any connection is taken: there is no pool open here.
+    with pytest.raises(RuntimeError, match="TX_ARCHIVE_DIR"):
+        asyncio.run(archive_partition(date(2020, 1, 1)))
+
+
+def test_window_with_a_location(monkeypatch):
+    monkeypatch.setattr(partitions, "TX_ARCHIVE_DIR", "s3://bucket/transactions")
+    monkeypatch.setattr(partitions, "TX_ARCHIVE_AFTER_MONTHS", 24)
+    assert live_window(date(2026, 10, 18))[0] == date(2024, 10, 1)
+    assert partitions.archive_path(date(2024, 9, 1)) == "s3://bucket/transactions/2024-09.parquet"
@@ -12,6 +12,8 @@ export default function CreditAnalysis() {
   const [input, setInput] = useState("");
   const [sending, setSending] = useState(false);
   const messagesEndRef = useRef(null);
+  // Server-side chat session: the backend keeps the conversation and returns its id.
+  const sessionIdRef = useRef(null);
 
   // Auto-scroll to latest message
   useEffect(() => {
@@ -30,13 +32,36 @@ export default function CreditAnalysis() {
       const res = await fetch("http://localhost:8000/ai/chat", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ message: input, email }),
+        body: JSON.stringify({ message: input, email, session_id: sessionIdRef.current, stream: true }),
       });
-      const data = await res.json();
-      setMessages((prev) => [
-        ...prev,
-        { sender: "ai", text: data.reply || "Hmm, something went wrong." },
-      ]);
+
+      // 📡 Server-Sent Events: grow the AI bubble as tokens arrive
+      setMessages((prev) => [...prev, { sender: "ai", text: "" }]);
+      const setReply = (update) =>
+        setMessages((prev) => {
+          const next = [...prev];
+          next[next.length - 1] = { sender: "ai", text: update(next[next.length - 1].text) };
+          return next;
+        });
+
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split("\n\n");
+        buffer = events.pop();
+        for (const raw of events) {
+          const event = raw.match(/^event: (.*)$/m)?.[1];
+          const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] || "{}");
+          if (event === "token") setReply((text) => text + data.text);
+          if (event === "error") setReply(() => data.reply || "Hmm, something went wrong.");
+          if (event === "done" && data.session_id) sessionIdRef.current = data.session_id;
+        }
+      }
+      setReply((text) => text.trim() || "Hmm, something went wrong.");
     } catch (err) {
       console.error(err);
       setMessages((prev) => [
@@ -11,17 +11,14 @@ export default function CreditEducation() {
   useEffect(() => {
     const fetchData = async () => {
       try {
-        const [scoreRes, tipsRes, insightsRes] = await Promise.all([
-          fetch(`http://localhost:8000/credit/${email}`),
-          fetch(`http://localhost:8000/credit/tips/${email}`), // ✅ fixed here
-          fetch(`http://localhost:8000/credit/insights/${email}`),
-        ]);
-
-        if (scoreRes.ok) setCreditScore(await scoreRes.json());
-        if (tipsRes.ok) setTips(await tipsRes.json());
-        if (insightsRes.ok) {
-          const insightsData = await insightsRes.json();
-          setInsights(insightsData.insights || []);
+        const res = await fetch(
+          `http://localhost:8000/dashboard/${email}?sections=credit,tips,insights`
+        );
+        if (res.ok) {
+          const data = await res.json();
+          if (data.credit) setCreditScore(data.credit);
+          setTips(data.tips || []);
+          setInsights(data.insights || []);
         }
       } catch (err) {
         console.error("❌ Error loading credit education data:", err);
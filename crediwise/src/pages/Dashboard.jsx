@@ -31,28 +31,21 @@ export default function Dashboard() {
 
     const fetchDashboardData = async () => {
       try {
-        const userRes = await fetch(`http://localhost:8000/user/${email}`);
-        const userData = await userRes.json();
-        if (!userRes.ok) throw new Error(userData.detail || "User not found");
-        setUser(userData.user);
-
-        const txRes = await fetch(`http://localhost:8000/transactions/${email}`);
-        const txData = await txRes.json();
-        if (!txRes.ok) throw new Error(txData.detail || "Failed to fetch transactions");
-        const txs = txData.transactions || [];
-        setTransactions(txs);
-
-        const income = txs.filter(t => t.amount > 0).reduce((a, b) => a + Number(b.amount), 0);
-        const expenses = txs.filter(t => t.amount < 0).reduce((a, b) => a + Math.abs(Number(b.amount)), 0);
+        // One request for everything the page shows, read from a single snapshot.
+        const res = await fetch(
+          `http://localhost:8000/dashboard/${email}?sections=user,summary,transactions,challenges`
+        );
+        const data = await res.json();
+        if (!res.ok) throw new Error(data.detail || "Failed to load dashboard");
+        setUser(data.user);
+        setTransactions(data.transactions || []);
+        setChallenges(data.challenges || []);
+
+        const income = Number(data.summary?.income || 0);
+        const expenses = Number(data.summary?.expenses || 0);
         const balance = income - expenses;
         setSummary({ income, expenses, balance });
 
-        const chRes = await fetch(`http://localhost:8000/challenges/${email}`);
-        if (chRes.ok) {
-          const chData = await chRes.json();
-          setChallenges(chData.challenges || []);
-        }
-
         // 🧠 Get motivation from AI (safe fallback)
         const motRes = await fetch(`http://localhost:8000/challenges/motivate/${email}`);
         if (motRes.ok) {
@@ -3,6 +3,8 @@ import Navbar from "../components/Navbar";
 
 export default function Transactions() {
   const [transactions, setTransactions] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [description, setDescription] = useState("");
   const [amount, setAmount] = useState("");
   const [type, setType] = useState("income");
@@ -20,6 +22,7 @@ export default function Transactions() {
       const data = await res.json();
       if (!res.ok) throw new Error(data.detail || "Failed to load transactions");
       setTransactions(data.transactions || []);
+      setNextCursor(data.next_cursor || null);
       setMessage("");
     } catch (err) {
       console.error(err);
@@ -29,6 +32,26 @@ export default function Transactions() {
     }
   };
 
+  // 📄 Next page, continuing from the last row we have
+  const loadMore = async () => {
+    if (!email || !nextCursor) return;
+    try {
+      setLoadingMore(true);
+      const res = await fetch(
+        `${API_BASE}/transactions/${email}?cursor=${encodeURIComponent(nextCursor)}`
+      );
+      const data = await res.json();
+      if (!res.ok) throw new Error(data.detail || "Failed to load transactions");
+      setTransactions((prev) => [...prev, ...(data.transactions || [])]);
+      setNextCursor(data.next_cursor || null);
+    } catch (err) {
+      console.error(err);
+      setMessage("⚠️ Unable to load more transactions.");
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     fetchTransactions();
   }, []);
@@ -182,6 +205,17 @@ export default function Transactions() {
                   ))}
                 </tbody>
               </table>
+              {nextCursor && (
+                <div className="flex justify-center mt-4">
+                  <button
+                    onClick={loadMore}
+                    disabled={loadingMore}
+                    className="px-6 py-2 rounded-lg bg-white/10 border border-white/20 text-gray-200 hover:bg-white/20 transition-all duration-200 disabled:opacity-50"
+                  >
+                    {loadingMore ? "Loading..." : "Load more"}
+                  </button>
+                </div>
+              )}
             </div>
           )}
         </div>